@@ -2,12 +2,19 @@ from typing import Callable, List, Union
 
 from .. import pygame_gui as ui
 from ..utils import imgproc
+from ..utils.evaluation import readErrors
+from ..utils.uncertainty import readScores
 from .line import DesertedFileLine, FileLine, ImageFileLine
 
 BAR_WIDTH = 20
 BAR_PAD = 15
 LINE_HEIGHT = 50
 
+# Image orders
+SORT_NAME = 'name'
+SORT_UNCERTAINTY = 'uncertainty' # most informative first
+SORT_ERROR = 'error' # worst model results first
+
 class FileBox(ui.components.RectContainer):
     '''
     FileBox(
@@ -112,9 +119,15 @@ class ImageFileBox(FileBox):
         w, h, x, y,
         folder,
         on_file_selected,
-        on_file_deserted
+        on_file_deserted,
+        sort_by
     )
 
+    Images are sorted by filename, by uncertainty scores of
+    `utils.uncertainty` if `sort_by` is SORT_UNCERTAINTY, or by errors of
+    the last `tools.evaluate` if SORT_ERROR. Images not scored yet come
+    last.
+
     Methods:
     * getSelected() -> FileLine | None
     * reload() -> None
@@ -123,9 +136,11 @@ class ImageFileBox(FileBox):
         w: int, h: int, x: int, y: int,
         folder: str,
         on_file_selected: Callable[[str], None] = None,
-        on_file_deserted: Callable[[str], None] = None
+        on_file_deserted: Callable[[str], None] = None,
+        sort_by: str = SORT_NAME
     ):
         self.on_file_deserted = ui.utils.getCallable(on_file_deserted)
+        self.sort_by = sort_by
         super().__init__(
             w, h, x, y,
             folder=folder,
@@ -144,6 +159,13 @@ class ImageFileBox(FileBox):
             ) for filename in imgproc.getImageFiles(folder)
         ]
         lines.sort(key=lambda l: l.filename)
+        if self.sort_by == SORT_UNCERTAINTY:
+            # Stable sort, equal scores keep filename order.
+            scores = readScores(folder)
+            lines.sort(key=lambda l: -scores.get(l.filename, -1.0))
+        elif self.sort_by == SORT_ERROR:
+            errors = readErrors(folder)
+            lines.sort(key=lambda l: -errors.get(l.filename, -1.0))
         return lines
 
     def __onDeserted(self, line: ImageFileLine):
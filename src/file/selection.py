@@ -3,7 +3,7 @@ from typing import Callable, Union
 
 from .. import pygame_gui as ui
 from ..components.stacked_page import StackedPage, StackedPageView
-from .box import DesertedFileBox, FileBox, ImageFileBox
+from .box import SORT_NAME, DesertedFileBox, FileBox, ImageFileBox
 from .navigator import Navigator
 from .page_header import PageHeader
 
@@ -59,14 +59,16 @@ class StackedImageFileBox(_StackedFileBox):
         w: int, h: int,
         folder: str,
         on_file_selected: Callable[[str], None] = None,
-        on_file_deserted: Callable[[str], None] = None
+        on_file_deserted: Callable[[str], None] = None,
+        sort_by: str = SORT_NAME
     ):
         super().__init__(
             w, h, ImageFileBox(
                 w, h, 0, 0,
                 folder,
                 on_file_selected,
-                on_file_deserted
+                on_file_deserted,
+                sort_by
             )
         )
 
@@ -92,9 +94,11 @@ class SelectionBox(ui.components.RectContainer):
         w, h, x, y,
         image_folder,
         deserted_folder,
-        on_selected
+        on_selected,
+        sort_by
     )
     * on_selected(folder, filename, is_deserted) -> None
+    * sort_by: order of images, see `box.SORT_NAME`
 
     Methods:
     * getSelected() -> str | None
@@ -109,7 +113,8 @@ class SelectionBox(ui.components.RectContainer):
         w: int, h: int, x: int, y: int,
         image_folder: str,
         deserted_folder: str,
-        on_selected: Callable[[str, Union[str, None], bool], None] = None
+        on_selected: Callable[[str, Union[str, None], bool], None] = None,
+        sort_by: str = SORT_NAME
     ):
         super().__init__(w, h, x, y)
         self.image_folder = image_folder
@@ -153,7 +158,8 @@ class SelectionBox(ui.components.RectContainer):
         self.image_box = StackedImageFileBox(
             w, h-navigator_h-header_h, image_folder,
             on_file_selected=on_image_selected,
-            on_file_deserted=on_image_deserted
+            on_file_deserted=on_image_deserted,
+            sort_by=sort_by
         )
 
         def on_deserted_selected(filename: str):
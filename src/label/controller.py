@@ -1,6 +1,7 @@
 from typing import Callable
 
 from .. import pygame_gui as ui
+from ..utils.snapping import SnapIndex
 from .image import Image
 from .labels import Labels
 
@@ -27,6 +28,8 @@ class LabelController:
     * relabel() -> None
     * correct() -> None
     * setLight(gamma) -> None
+    * setSnap(enabled) -> None
+    * setLoadNetwork(enabled) -> None
     * save() -> None
 
     ---------- class & selection ----------
@@ -52,6 +55,11 @@ class LabelController:
         self.image: Image = None
         self.labels: Labels = None
         self.image_gamma: float = 0.0
+        # Light bar ends of current image, only in snap mode.
+        self.snap_enabled = False
+        self.snap_index: SnapIndex = None
+        # Relabel starts loading the model, `load_network` of user config.
+        self.load_network = False
 
         self.image_path: str = None
         self.label_path: str = None
@@ -69,9 +77,9 @@ class LabelController:
         if self.labels is not None:
             self.labels.deleteSelectedLabels()
 
-    def relable(self) -> None:
+    def relabel(self) -> None:
         if self.labels is not None:
-            self.labels.relabel(self.image.orig_image)
+            self.labels.relabel(self.image.orig_image, load_model=self.load_network)
 
     def correct(self) -> None:
         if self.labels is not None:
@@ -86,6 +94,22 @@ class LabelController:
         self.image.setLight(gamma)
         self.image.redraw()
 
+    def setSnap(self, enabled: bool) -> None:
+        ''' Snap dragged keypoints to light bar ends. '''
+        self.snap_enabled = enabled
+        self._updateSnap()
+
+    def setLoadNetwork(self, enabled: bool) -> None:
+        ''' Whether relabel may start loading the model. '''
+        self.load_network = enabled
+
+    def _updateSnap(self) -> None:
+        if self.snap_enabled and self.image_path is not None and self.snap_index is None:
+            # Extracted in background since the image is loaded.
+            self.snap_index = SnapIndex(self.image_path)
+        if self.labels is not None:
+            self.labels.setSnapIndex(self.snap_index if self.snap_enabled else None)
+
     def save(self) -> None:
         if self.labels is None:
             return
@@ -113,12 +137,14 @@ class LabelController:
             self.image.kill()
             self.image = None
             self.image_path = None
+            self.snap_index = None
 
         if path is None:
             return
 
         self.image_path = path
         self.image = Image(path)
+        self._updateSnap()
         self.image.setLight(self.image_gamma)
 
         self.canvas.addChild(self.image)
@@ -147,6 +173,7 @@ class LabelController:
         )
         self.labels.load(path, self.image.getOrigSize())
         self.canvas.addChild(self.labels)
+        self._updateSnap()
 
     def reload(self,
         image_path: str = None,
@@ -160,7 +187,7 @@ class LabelController:
         if self.image is None or self.labels is None:
             return
         if relabel:
-            self.labels.relabel(self.image.orig_image)
+            self.labels.relabel(self.image.orig_image, load_model=self.load_network)
 
     def undo(self) -> None:
         if self.labels is not None:
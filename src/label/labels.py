@@ -5,10 +5,14 @@ import pygame
 from .. import pygame_gui as ui
 from ..utils import imgproc, lbformat
 from ..utils.lbformat import LabelIO
+from ..utils.snapping import SnapIndex
 from .icon import Icon
 from .keypoint import Keypoint
 from .label import Label
 
+# Distance on screen a dragged keypoint snaps to a light bar end from
+SNAP_RADIUS = 12
+
 
 class Labels(ui.components.CanvasComponent):
     '''
@@ -28,8 +32,9 @@ class Labels(ui.components.CanvasComponent):
     * cancelAdd() -> None
     * deleteSelectedLabels() -> None
     * setSelectedClass(cls_id) -> None
-    * relabel(img) -> None
+    * relabel(img, refine, load_model) -> None
     * correctSelectedLabels(img) -> None
+    * setSnapIndex(snap_index) -> None
 
     ---------- select ----------
     * selectAll() -> None
@@ -54,6 +59,9 @@ class Labels(ui.components.CanvasComponent):
         self.on_select = ui.utils.getCallable(on_select)
 
         self.dragging_point: Keypoint = None
+        # Mouse position of the dragged keypoint, which may be snapped away.
+        self.drag_pos: Tuple[float, float] = None
+        self.snap_index: SnapIndex = None
         self.adding_label: Label = None
         self.adding_point: Keypoint = None
         self.labels: List[Label] = []
@@ -65,6 +73,10 @@ class Labels(ui.components.CanvasComponent):
         self.snapshot_index = 0
         self.snapshots: List[dict] = []
 
+        # Contours of the image being corrected, until the image changes.
+        self._contour_image: pygame.Surface = None
+        self._contour_index: imgproc.ContourIndex = None
+
     def _getLabelsIO(self,
         labels: List[Label],
         orig_img_size: Tuple[int, int]
@@ -131,6 +143,7 @@ class Labels(ui.components.CanvasComponent):
         # You can not move a keypoint while adding a new label.
         if self.dragging_point is None and self.adding_point is None:
             self.dragging_point = kpt
+            self.drag_pos = kpt.getCenter()
 
     def _onAddPoint(self, kpt: Keypoint) -> None:
         if kpt is not self.adding_point:
@@ -196,23 +209,31 @@ class Labels(ui.components.CanvasComponent):
         self._snapshot()
         self.redraw()
 
-    def relabel(self, img: pygame.Surface) -> None:
+    def relabel(self, img: pygame.Surface, refine: bool = False, load_model: bool = False) -> None:
         cv_img = imgproc.surface2mat(img)
         labels_io = self._getLabelsIO(self.labels, img.get_size())
-        labels_io = imgproc.relabel(cv_img, labels_io)
+        labels_io = imgproc.relabel(cv_img, labels_io, refine, load_model=load_model)
+        if not refine and len(labels_io) == len(self.labels):
+            return # no new plate
 
         self._deleteLabels(self.labels)
-        self._addLabelsIO(labels_io)
+        self._addLabelsIO(labels_io, img.get_size())
         self._snapshot()
         self.redraw()
 
+    def setSnapIndex(self, snap_index: SnapIndex = None) -> None:
+        ''' Snap dragged keypoints to light bar ends of the index, None to stop. '''
+        self.snap_index = snap_index
+
     def correctSelectedLabels(self, img: pygame.Surface) -> None:
         if len(self.selected_labels) == 0:
             return
 
-        cv_img = imgproc.surface2mat(img)
+        if self._contour_image is not img:
+            self._contour_image = img
+            self._contour_index = imgproc.ContourIndex(imgproc.surface2mat(img))
         labels_io = self._getLabelsIO(self.selected_labels, img.get_size())
-        labels_io = imgproc.correctLabels(cv_img, labels_io)
+        labels_io = imgproc.correctLabels(self._contour_index.img, labels_io, self._contour_index)
 
         self._deleteLabels(self.selected_labels)
         self._addLabelsIO(labels_io, img.get_size())
@@ -327,13 +348,27 @@ class Labels(ui.components.CanvasComponent):
             return
 
         if self.dragging_point is not None:
-            self.dragging_point.move(vx, vy)
+            self._dragPoint(vx, vy)
             self.redraw()
 
         # TODO: Is all the icons need to update when dragging?
         for label in self.labels:
             label.icon.setPosToKeypoint(label.points[2])
 
+    def _dragPoint(self, vx: int, vy: int) -> None:
+        ''' Move the dragged keypoint, to the nearest light bar end if snapping. '''
+        if self.snap_index is None:
+            self.dragging_point.move(vx, vy)
+            return
+
+        x, y = self.drag_pos
+        x, y = self.drag_pos = (x + vx / self.scale, y + vy / self.scale)
+        # Endpoints are in image pixels, keypoints are relative to self.
+        snapped = self.snap_index.nearest((x + self._x, y + self._y), SNAP_RADIUS / self.scale)
+        if snapped is not None:
+            x, y = snapped[0] - self._x, snapped[1] - self._y
+        self.dragging_point.setCenter(x, y)
+
     def onLeftRelease(self):
         if self.dragging_point is not None:
             self.dragging_point = None
@@ -3,11 +3,14 @@ from .components.stacked_page import StackedPageView
 from .menu import MainMenu
 from .tasks.armor24 import ArmorPage
 from .tasks.armor_video import ArmorVideoPage
+from .utils.config import ConfigManager
+from .utils.model_registry import setupModelRegistry
 
 
 class Main(ui.Main):
     def __init__(self):
         super().__init__((1280, 800), caption='PyLabelRoboMaster')
+        setupModelRegistry(ConfigManager('./user_data.json'))
 
         page_incidies = {
             'main_menu': 0,
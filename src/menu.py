@@ -5,6 +5,7 @@ from .components.clock import Clock
 from .components.stacked_page import StackedPage
 from .components.switch import NTextSwitch
 from .utils.config import ConfigManager
+from .utils.model_registry import ModelRegistry
 
 
 class MainMenu(StackedPage):
@@ -15,6 +16,8 @@ class MainMenu(StackedPage):
 
         # initialize basic variables
         self.config_manager = ConfigManager('./user_data.json')
+        self.model_registry = ModelRegistry()
+        self.model_ids = self.model_registry.getIds()
         color_theme = ui.color.LightColorTheme()
         font = pygame.font.SysFont('microsoftyaheibold', 40)
         font_small = pygame.font.SysFont('microsoftyaheibold', 30)
@@ -58,6 +61,19 @@ class MainMenu(StackedPage):
             on_turn=self._onLoadNetworkSwitch,
             cursor_change=True
         )
+        model_switch = NTextSwitch(
+            w=settings_w - 2 * settings_pad,
+            h=45,
+            x=0,
+            y=settings_pad + 2 * settings_h // 10,
+            num_states=max(len(self.model_ids), 1),
+            texts=[f'Model: {model_id}' for model_id in self.model_ids] or ['Model: None'],
+            font=font_small,
+            text_color=color_theme.Primary,
+            background_color=color_theme.OnPrimary,
+            on_turn=self._onModelSwitch,
+            cursor_change=True
+        )
         self.button_armor = ui.components.TextButton(
             w=button_w,
             h=button_h,
@@ -88,6 +104,10 @@ class MainMenu(StackedPage):
         )
         self.settings_container.alignHorizontalCenter(settings_label)
         self.settings_container.alignHorizontalCenter(load_network_switch)
+        load_network_switch.turnTo(int(bool(self.config_manager['load_network'])))
+        self.settings_container.alignHorizontalCenter(model_switch)
+        if self.config_manager['active_model'] in self.model_ids:
+            model_switch.turnTo(self.model_ids.index(self.config_manager['active_model']))
 
         # manage component hierarchy
         self.addChild(clock)
@@ -96,10 +116,21 @@ class MainMenu(StackedPage):
         self.addChild(self.button_video)
         self.settings_container.addChild(settings_label)
         self.settings_container.addChild(load_network_switch)
+        self.settings_container.addChild(model_switch)
 
     def _onLoadNetworkSwitch(self, state: int) -> None:
         self.config_manager['load_network'] = bool(state)
 
+    def _onModelSwitch(self, state: int) -> None:
+        if len(self.model_ids) == 0:
+            return
+        model_id = self.model_ids[state]
+        self.config_manager['active_model'] = model_id
+        # Loaded in background, pages switch to it once it is ready.
+        self.model_registry.setActive(model_id)
+        if self.config_manager['load_network']:
+            self.model_registry.getActiveLoader().load()
+
     def onHide(self):
         self.button_armor.resetState()
         self.button_video.resetState()
\ No newline at end of file
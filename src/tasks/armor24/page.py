@@ -8,9 +8,12 @@ from ...components.navigator import Navigator
 from ...components.stacked_page import StackedPage
 from ...components.toolbar import ToolbarButtons
 from ...file import SelectionBox
+from ...file.box import SORT_ERROR, SORT_NAME, SORT_UNCERTAINTY
 from ...label import LabelController, Labels
 from ...utils import imgproc
 from ...utils.config import ConfigManager, openDir
+from ...utils.model_registry import ModelRegistry
+from ...utils.uncertainty import UncertaintyScorer
 from .armor_type_select import ArmorClassSelection
 from .icon import getIcon
 
@@ -23,6 +26,8 @@ class ArmorPage(StackedPage):
 
     def onShow(self):
         if self.initialized:
+            # Changed in the main menu.
+            self.label_controller.setLoadNetwork(self.config_manager['load_network'])
             self._reloadSelectionBox()
             return
         self.initialized = True
@@ -34,6 +39,8 @@ class ArmorPage(StackedPage):
         self.deserted_folder = os.path.join(self.images_folder, 'deserted')
 
         self.config_manager = ConfigManager('./user_data.json')
+        self.image_sort = self.config_manager['image_sort']
+        self.uncertainty_scorer: UncertaintyScorer = None
 
         # ----- initialize basic constants -----
         color_theme = ui.color.LightColorTheme()
@@ -65,6 +72,8 @@ class ArmorPage(StackedPage):
             labels_getter,
             on_selected=self._canvas_onLabelSelected
         )
+        self.label_controller.setSnap(self.config_manager['snap_mode'])
+        self.label_controller.setLoadNetwork(self.config_manager['load_network'])
         navigator = Navigator(
             w=w,
             h=navigator_h,
@@ -101,7 +110,7 @@ class ArmorPage(StackedPage):
             on_add=self.label_controller.startAdd,
             on_delete=self.label_controller.delete,
             on_save=self.label_controller.save,
-            # on_search=self.label_controller.relable,
+            on_search=self.label_controller.relabel,
             on_correct=self.label_controller.correct,
             on_light_change=on_light_change
         )
@@ -119,7 +128,8 @@ class ArmorPage(StackedPage):
             y=toolbar_h-scroll_h-20,
             image_folder=self.images_folder,
             deserted_folder=self.deserted_folder,
-            on_selected=self._toolbar_onFileSelection
+            on_selected=self._toolbar_onFileSelection,
+            sort_by=self.image_sort
         )
 
         # ----- configure components -----
@@ -134,6 +144,7 @@ class ArmorPage(StackedPage):
         self.toolbar_scroll_files = toolbar_scroll_files
 
         self._loadPathByConfigManager()
+        self._updateScorer()
 
         # ----- manage component hierarchy -----
         self.addChild(canvas)
@@ -147,6 +158,7 @@ class ArmorPage(StackedPage):
         # ----- keyboard events -----
         self.addKeyDownEvent(pygame.K_a, self.label_controller.startAdd)
         self.addKeyDownEvent(pygame.K_c, self.label_controller.correct)
+        self.addKeyDownEvent(pygame.K_f, self.label_controller.relabel)
         self.addKeyDownEvent(pygame.K_d, self.label_controller.delete)
         self.addKeyDownEvent(pygame.K_DELETE, self.label_controller.delete)
         self.addKeyCtrlEvent(pygame.K_z, self.label_controller.undo)
@@ -154,6 +166,8 @@ class ArmorPage(StackedPage):
         self.addKeyDownEvent(pygame.K_ESCAPE, self.label_controller.cancelAdd)
         self.addKeyDownEvent(pygame.K_ESCAPE, self.label_controller.unselectAll)
         self.addKeyCtrlEvent(pygame.K_a, self.label_controller.selectAll)
+        self.addKeyCtrlEvent(pygame.K_u, self._toggleImageSort)
+        self.addKeyDownEvent(pygame.K_s, self._toggleSnap)
 
         def on_prev() -> None:
             self.toolbar_scroll_files.selectPrev()
@@ -258,7 +272,8 @@ class ArmorPage(StackedPage):
             y=toolbar_h-scroll_h-20,
             image_folder=self.images_folder,
             deserted_folder=self.deserted_folder,
-            on_selected=self._toolbar_onFileSelection
+            on_selected=self._toolbar_onFileSelection,
+            sort_by=self.image_sort
         )
 
         if selected_idx is not None:
@@ -288,8 +303,53 @@ class ArmorPage(StackedPage):
 
         self.navigator.setFolder(self.images_folder)
         self._reloadSelectionBox()
+        self._updateScorer()
         self.redraw()
 
+    def _toggleImageSort(self) -> None:
+        '''
+        Sort images by filename, most informative first, or worst model
+        results of the last evaluation first. Scores are read again on each
+        switch, scoring continues in background.
+        '''
+        orders = [SORT_NAME, SORT_UNCERTAINTY, SORT_ERROR]
+        if self.image_sort in orders:
+            self.image_sort = orders[(orders.index(self.image_sort) + 1) % len(orders)]
+        else:
+            self.image_sort = SORT_NAME
+        self.config_manager['image_sort'] = self.image_sort
+        self._updateScorer()
+        self._reloadSelectionBox(0)
+        self.redraw()
+
+    def _toggleSnap(self) -> None:
+        ''' Snap dragged keypoints to light bar ends, or move them freely. '''
+        snap = not self.label_controller.snap_enabled
+        self.label_controller.setSnap(snap)
+        self.config_manager['snap_mode'] = snap
+
+    def _updateScorer(self) -> None:
+        ''' Score images of current folder in background if sorted by uncertainty. '''
+        scorer = self.uncertainty_scorer
+        if scorer is not None and (
+            self.image_sort != SORT_UNCERTAINTY
+            or scorer.images_folder != self.images_folder
+            or scorer.labels_folder != self.labels_folder
+        ):
+            scorer.stop()
+            scorer = None
+        self.uncertainty_scorer = scorer
+
+        if self.image_sort != SORT_UNCERTAINTY or (scorer is not None and scorer.isRunning()):
+            return
+        loader = ModelRegistry().getActiveLoader()
+        if loader is None:
+            ui.logger.warning('No model is selected, images are not scored.')
+            return
+        # Started again so new images and edited labels are scored.
+        self.uncertainty_scorer = UncertaintyScorer(self.images_folder, self.labels_folder, loader)
+        self.uncertainty_scorer.start()
+
     def _loadPathByConfigManager(self) -> None:
         images_folder = self.config_manager['last_images_folder']
         labels_folder = self.config_manager['last_labels_folder']
@@ -310,6 +370,8 @@ class ArmorPage(StackedPage):
 
     def kill(self):
         if self.initialized:
+            if self.uncertainty_scorer is not None:
+                self.uncertainty_scorer.stop()
             self.label_controller.save()
             selected_idx = self.toolbar_scroll_files.getSelectedIndex()
             if selected_idx == -1:
@@ -1,6 +1,7 @@
 import os
 
 import cv2
+import numpy as np
 import pygame
 
 from ... import pygame_gui as ui
@@ -9,10 +10,16 @@ from ...components.stacked_page import StackedPage
 from ...components.switch import Switch
 from ...label import Image
 from ...utils.config import ConfigManager, openVideo
-from ...utils.imgproc import mat2surface, surface2mat
-from ...utils.inference import PoseModel
+from ...utils.detection_cache import DetectionCache, getCachePath
+from ...utils.imgproc import detectArmors, mat2surface
+from ...utils.model_loader import (STATE_FAILED, STATE_LOADING, STATE_READY,
+                                   ModelLoader)
+from ...utils.model_registry import ModelRegistry
+from ...utils.tracking import KeypointTracker
 from .info import InfoButton
+from .threshold_bar import ThresholdBar
 from .video_bar import VideoBar
+from .worker import InferenceWorker
 
 
 def light_to_gamma(light: float) -> float:
@@ -31,6 +38,7 @@ class ArmorVideoPage(StackedPage):
 
     def onShow(self):
         if self.initialized:
+            self._loadModelByConfig()
             return
         self.initialized = True
 
@@ -53,13 +61,28 @@ class ArmorVideoPage(StackedPage):
         self.image_size = (0, 0)
 
         self.current_frame_idx = -1
+        self.current_frame_mat: np.ndarray = None
         self.current_frame: Image = None
         self.current_labeled_frame: Image = None
+        self.last_labels = None
 
         self.image_light = 0.0
         self.playing = False
         self.label = False
-        self.model = PoseModel('resources/armor.onnx', (416, 416))
+        self.confidence_thresh = 0.2
+        self.nms_thresh = 0.2
+        self.model_state = None
+        self.detection_cache = DetectionCache()
+        self.model_registry = ModelRegistry()
+        # Model in use, kept until the newly selected one is loaded.
+        self.model_loader: ModelLoader = self.model_registry.getActiveLoader()
+        self.tiled = False
+        self.tracking = False
+        self.tracker = KeypointTracker(
+            self.config_manager['track_keyframe_interval'],
+            self.config_manager['track_drift_thresh']
+        )
+        self.inference_worker = InferenceWorker(self._inference)
 
         # components
         color_theme = ui.color.LightColorTheme()
@@ -149,6 +172,53 @@ class ArmorVideoPage(StackedPage):
             on_press=lambda : self.setPage(self.page_incides['main_menu'], True)
         )
 
+        def on_confidence_change(value: float) -> None:
+            self.confidence_thresh = value
+            self._relabel()
+        confidence_bar = ThresholdBar(
+            w=300,
+            h=40,
+            x=300,
+            y=0,
+            name='conf',
+            value=self.confidence_thresh,
+            on_change=on_confidence_change
+        )
+
+        def on_nms_change(value: float) -> None:
+            self.nms_thresh = value
+            self._relabel()
+        nms_bar = ThresholdBar(
+            w=300,
+            h=40,
+            x=640,
+            y=0,
+            name='nms',
+            value=self.nms_thresh,
+            on_change=on_nms_change
+        )
+
+        track_text = ui.components.Label(60, 40, 960, 0, 'track:')
+        track_text.setAlignment(ui.constants.ALIGN_LEFT)
+
+        def on_track_switch_turn(state: bool):
+            self.tracking = state
+            self.tracker.reset()
+            self.tracker.resetStats()
+            self._updateTrackStats()
+        track_switch = Switch(
+            w=36,
+            h=36,
+            x=1020,
+            y=2,
+            image_on='resources/icons/check_box_ok.png',
+            image_off='resources/icons/check_box.png',
+            on_turn=on_track_switch_turn
+        )
+
+        self.track_stats_text = ui.components.Label(150, 40, 1062, 0, '')
+        self.track_stats_text.setAlignment(ui.constants.ALIGN_LEFT)
+
         self.canvas = ui.components.Canvas(w, h-40-40-80, 0, 40)
 
         btn_size = 36
@@ -214,6 +284,8 @@ class ArmorVideoPage(StackedPage):
 
         def on_show_label_switch_turn(state: bool):
             self.label = state
+            if not state:
+                self.inference_worker.cancel()
             self._updateImage(state)
 
         show_label_switch = Switch(
@@ -226,6 +298,25 @@ class ArmorVideoPage(StackedPage):
             on_turn=on_show_label_switch_turn
         )
 
+        self.model_state_text = ui.components.Label(200, btn_size, 910, btn_y, 'model: off')
+        self.model_state_text.setAlignment(ui.constants.ALIGN_LEFT)
+
+        tiled_text = ui.components.Label(60, btn_size, 1115, btn_y, 'tiled:')
+        tiled_text.setAlignment(ui.constants.ALIGN_LEFT)
+
+        def on_tiled_switch_turn(state: bool):
+            self.tiled = state
+            self._relabel()
+        tiled_switch = Switch(
+            w=btn_size,
+            h=btn_size,
+            x=1180,
+            y=btn_y,
+            image_on='resources/icons/check_box_ok.png',
+            image_off='resources/icons/check_box.png',
+            on_turn=on_tiled_switch_turn
+        )
+
         # configure
         self._loadVideoInfo(self.video_path)
         self._setFrame(0)
@@ -236,6 +327,11 @@ class ArmorVideoPage(StackedPage):
         self.addChild(button_info)
         self.addChild(button_save)
         self.addChild(self.button_back)
+        self.addChild(confidence_bar)
+        self.addChild(nms_bar)
+        self.addChild(track_text)
+        self.addChild(track_switch)
+        self.addChild(self.track_stats_text)
         self.addChild(self.canvas)
         self.addChild(self.p_bar)
         self.addChild(self.switch_pause)
@@ -244,6 +340,11 @@ class ArmorVideoPage(StackedPage):
         self.addChild(light_bar)
         self.addChild(show_label_text)
         self.addChild(show_label_switch)
+        self.addChild(self.model_state_text)
+        self.addChild(tiled_text)
+        self.addChild(tiled_switch)
+
+        self._loadModelByConfig()
 
     def _clearImage(self) -> None:
         if self.current_frame is not None:
@@ -255,6 +356,8 @@ class ArmorVideoPage(StackedPage):
 
     def _loadVideoInfo(self, video_path) -> None:
         self._clearImage()
+        self.tracker.reset()
+        self.detection_cache.open(getCachePath(video_path))
 
         self.cap = cv2.VideoCapture(video_path)
         self.fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.get(cv2.CAP_PROP_FPS) else 30
@@ -303,17 +406,102 @@ class ArmorVideoPage(StackedPage):
 
         self.addChild(self.p_bar)
 
-    def _labelImage(self) -> None:
-        if self.current_frame is None:
+    def _loadModelByConfig(self) -> None:
+        ''' Load model in background if "Load Network" is on. '''
+        loader = self.model_registry.getActiveLoader()
+        if self.config_manager['load_network'] and loader is not None:
+            loader.load()
+        self._updateModelState()
+
+    def _swapModel(self) -> None:
+        '''
+        Switch to the active model of registry once it is loaded, the
+        current one keeps labeling meanwhile.
+        '''
+        loader = self.model_registry.getActiveLoader()
+        if loader is self.model_loader:
+            return
+        if self.config_manager['load_network'] and loader is not None:
+            loader.load()
+        if self.model_loader is not None and self.model_loader.isReady() \
+            and (loader is None or not loader.isReady()):
+            return
+
+        self.model_loader = loader
+        self.model_state = -1 # refresh
+        self.inference_worker.cancel()
+        self.tracker.reset()
+
+    def _updateModelState(self) -> None:
+        self._swapModel()
+        if self.model_loader is None:
+            state = None
+        elif not self.config_manager['load_network'] and not self.model_loader.isReady():
+            state = None
+        else:
+            state = self.model_loader.getState()
+        if state == self.model_state:
+            return
+        self.model_state = state
+
+        texts = {
+            None: 'model: off',
+            STATE_LOADING: 'model: loading...',
+            STATE_READY: f'model: {self.model_registry.getActive()}',
+            STATE_FAILED: 'model: load failed'
+        }
+        self.model_state_text.setText(texts.get(state, ''))
+        self.model_state_text.redraw()
+
+        if state == STATE_READY:
+            self._relabel()
+
+    def _inference(self, frame_idx: int, img: np.ndarray):
+        ''' Called by the inference worker. '''
+        model = None if self.model_loader is None else self.model_loader.get()
+        # Models are shared with other pages, thresholds and the detection
+        # cache of this video are passed per call.
+        thresholds = {'confidence_thresh': self.confidence_thresh, 'nms_thresh': self.nms_thresh}
+        if model is None:
+            # No network, or swapped meanwhile.
+            infer = detectArmors
+        elif self.tiled:
+            infer = lambda img: model.inferenceTiled(img, **thresholds)
+        else:
+            infer = lambda img: model.inference(img, cache=self.detection_cache, **thresholds)
+        if self.tracking:
+            # The network only runs on keyframes.
+            return self.tracker.process(frame_idx, img, infer)
+        return infer(img)
+
+    def _updateTrackStats(self) -> None:
+        text = ''
+        if self.tracking:
+            total = self.tracker.forwards + self.tracker.tracked
+            text = f'skipped: {self.tracker.tracked}/{total}'
+        if text != self.track_stats_text.text:
+            self.track_stats_text.setText(text)
+            self.track_stats_text.redraw()
+
+    def _requestLabel(self) -> None:
+        ''' Ask the inference worker to label current frame. '''
+        if self.current_frame_mat is None:
             return
+        # Light bars are paired without a network, see `_inference`.
+        self.inference_worker.request(self.current_frame_idx, self.current_frame_mat)
+
+    def _relabel(self) -> None:
+        ''' Label current frame again after thresholds changed. '''
+        if self.label:
+            # Recent frames keep their candidates, no forward pass is needed.
+            self._requestLabel()
 
-        frame = surface2mat(self.current_frame.image)
-        labels = self.model.inference(frame)
+    def _setLabeledFrame(self, frame: np.ndarray, labels) -> None:
         labeled_frame = frame.copy()
         for l in labels:
             for i, p in enumerate(l.kpts):
                 p1 = [int(p[0]), int(p[1])]
-                p = l.kpts[(i + 1) % 4]
+                p = l.kpts[(i + 1) % len(l.kpts)]
                 p2 = [int(p[0]), int(p[1])]
                 cv2.line(labeled_frame, p1, p2, (0, 255, 0), 2)
 
@@ -325,14 +513,34 @@ class ArmorVideoPage(StackedPage):
         self.current_labeled_frame = Image(mat2surface(labeled_frame))
         self.current_labeled_frame.setLight(light_to_gamma(self.image_light))
 
+    def _receiveLabels(self) -> None:
+        ''' Swap in detections finished by the inference worker. '''
+        result = self.inference_worker.poll()
+        if result is None:
+            return
+
+        # Results are of the latest finished request, stale ones are decided here.
+        frame_idx, frame, labels = result
+        if frame_idx == self.current_frame_idx:
+            self._setLabeledFrame(frame, labels)
+        elif self.playing and self.current_frame_mat is not None:
+            # Keep labels on screen while playing, they lag a few frames.
+            self._setLabeledFrame(self.current_frame_mat, labels)
+        else: # stale
+            return
+        self.last_labels = labels
+
+        self._updateImage(self.label)
+        self._updateTrackStats()
+        self.canvas.redraw()
+
     def _updateImage(self, show_label: bool) -> None:
         if show_label and self.current_labeled_frame is None:
-            self._labelImage()
+            self._requestLabel()
 
         if show_label and self.current_labeled_frame is not None:
             self.canvas.setChildren([self.current_labeled_frame])
-        
-        if not show_label and self.current_frame is not None:
+        elif self.current_frame is not None:
             self.canvas.setChildren([self.current_frame])
 
     def _setFrame(self, frame_idx: int) -> None:
@@ -349,10 +557,13 @@ class ArmorVideoPage(StackedPage):
 
         self._clearImage()
 
+        self.current_frame_mat = frame
         self.current_frame = Image(mat2surface(frame))
         self.current_frame.setLight(light_to_gamma(self.image_light))
         if self.label:
-            self._labelImage()
+            self._requestLabel()
+            if self.playing and self.last_labels is not None:
+                self._setLabeledFrame(frame, self.last_labels)
 
         self._updateImage(self.label)
         self.p_bar.set(self.current_frame_idx / self.total_frames * self.video_duration)
@@ -367,7 +578,17 @@ class ArmorVideoPage(StackedPage):
     def onHide(self):
         self.button_back.resetState()
 
+    def kill(self) -> None:
+        if self.initialized:
+            self.inference_worker.stop()
+            self.detection_cache.close()
+        super().kill()
+
     def update(self, x: int, y: int, wheel: int) -> None:
+        self._updateModelState()
+        if self.label:
+            self._receiveLabels()
+
         if self.playing:
             if self.current_frame_idx <= self.total_frames:
                 self._setFrame(self.current_frame_idx + 1)
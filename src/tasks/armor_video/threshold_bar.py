@@ -0,0 +1,61 @@
+from typing import Callable
+
+from ... import pygame_gui as ui
+
+
+class ThresholdBar(ui.components.Base):
+    '''
+    A slider of a threshold from 0 to 1, with steps of 0.01.
+
+    ThresholdBar(w, h, x, y, name, value, on_change)
+    * on_change(value) -> None
+
+    Methods:
+    * get() -> float
+    '''
+    def __init__(self,
+        w: int, h: int, x: int, y: int,
+        name: str,
+        value: float,
+        on_change: Callable[[float], None] = None
+    ):
+        super().__init__(w, h, x, y)
+        self.on_change = ui.utils.getCallable(on_change)
+
+        self.name = name
+        self.value = round(value, 2)
+
+        text_width = 100
+
+        def _on_change(value: float) -> None:
+            value = round(value, 2)
+            if value == self.value:
+                return
+            self.value = value
+            self.text_obj.setText(self._getText())
+            self.on_change(self.value)
+        self.text_obj = ui.components.Label(
+            text_width, h, 0, 0,
+            text=self._getText()
+        )
+        self.bar = ui.components.ProgressBar(
+            w - text_width, h, text_width, 0, on_change=_on_change
+        )
+
+        self.text_obj.setAlignment(ui.constants.ALIGN_LEFT)
+        self.bar.set(self.value)
+
+        self.addChild(self.text_obj)
+        self.addChild(self.bar)
+
+    def _getText(self) -> str:
+        return f'{self.name}: {self.value:.2f}'
+
+    def get(self) -> float:
+        return self.value
+
+    def kill(self) -> None:
+        self.on_change = None
+        self.text_obj = None
+        self.bar = None
+        super().kill()
@@ -0,0 +1,85 @@
+import threading
+from typing import Any, Callable, List, Tuple, Union
+
+import numpy as np
+
+from ... import pygame_gui as ui
+from ...utils.lbformat import LabelIO
+
+
+class InferenceWorker:
+    '''
+    Runs inference on a dedicated thread. Only the latest request is
+    kept, a new request replaces the pending one (latest frame wins).
+    The latest finished result is collected by the UI thread through
+    `poll`, tagged with its key, the caller decides whether it is stale.
+    A failed inference is logged and gives no labels, the worker keeps
+    running.
+
+    InferenceWorker(infer)
+    * infer(key, img) -> List[LabelIO]
+
+    Methods:
+    * request(key, img) -> None
+    * cancel() -> None
+    * poll() -> Tuple[key, img, labels] | None
+    * stop() -> None
+    '''
+    def __init__(self, infer: Callable[[Any, np.ndarray], List[LabelIO]]):
+        self.infer = infer
+
+        self._cond = threading.Condition()
+        self._pending: Tuple[Any, np.ndarray] = None
+        self._result: Tuple[Any, np.ndarray, List[LabelIO]] = None
+        # Increased by cancel, results of earlier requests are dropped.
+        self._generation = 0
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key, img = self._pending
+                self._pending = None
+                generation = self._generation
+
+            try:
+                labels = self.infer(key, img)
+            except Exception as e:
+                ui.logger.warning(f'Inference of frame {key} failed: {e!r}', self)
+                labels = []
+
+            with self._cond:
+                if generation == self._generation:
+                    self._result = (key, img, labels)
+
+    def request(self, key: Any, img: np.ndarray) -> None:
+        ''' Request inference of `img`, dropping any older pending request. '''
+        with self._cond:
+            self._pending = (key, img)
+            self._cond.notify()
+
+    def cancel(self) -> None:
+        ''' Drop pending request, running inference and unread result. '''
+        with self._cond:
+            self._pending = None
+            self._result = None
+            self._generation += 1
+
+    def poll(self) -> Union[Tuple[Any, np.ndarray, List[LabelIO]], None]:
+        ''' Returns the latest finished result once, or None. '''
+        with self._cond:
+            result = self._result
+            self._result = None
+        return result
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify()
@@ -0,0 +1,5 @@
+'''
+Command line tools, run as modules from the repository root, e.g.
+
+    python -m src.tools.autolabel IMAGES_FOLDER LABELS_FOLDER
+'''
@@ -0,0 +1,158 @@
+'''
+Pre-label every image of a folder with PoseModel, without display.
+
+    python -m src.tools.autolabel IMAGES_FOLDER LABELS_FOLDER
+        [--model resources/armor.onnx] [--workers N] [--overwrite] [--server ADDRESS]
+
+Images that already have a label file are skipped unless `--overwrite`
+is given, so an interrupted run can be resumed. Images without any
+detection have no label file and will be labeled again.
+
+With `--server`, workers send images to a running `src.tools.server`
+of the same model, which batches requests of all workers.
+'''
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Tuple
+
+import cv2
+
+from .. import pygame_gui as ui
+from ..utils import imgproc, lbformat
+from ..utils.backend import BACKENDS
+from ..utils.inference import PoseModel
+from .progress import Progress
+
+# Model of a worker process
+_model: PoseModel = None
+# Arguments of PoseModel.inferenceTiled, None if not tiled
+_tile_kwargs: dict = None
+
+def _initWorker(model_kwargs: dict, num_threads: int, tile_kwargs: dict = None) -> None:
+    global _model, _tile_kwargs
+    cv2.setNumThreads(num_threads)
+    _model = PoseModel(**model_kwargs)
+    _tile_kwargs = tile_kwargs
+
+def _labelImages(tasks: List[Tuple[str, str]]) -> int:
+    ''' Label a chunk of (image_path, label_path), returns number of images. '''
+    images = []
+    label_paths = []
+    for image_path, label_path in tasks:
+        img = cv2.imread(image_path)
+        if img is None:
+            ui.logger.warning(f'Can not read image {image_path}.')
+            continue
+        images.append(img)
+        label_paths.append(label_path)
+
+    if _tile_kwargs is None:
+        results = _model.inferenceBatch(images)
+    else:
+        results = [_model.inferenceTiled(img, **_tile_kwargs) for img in images]
+    for img, label_path, labels in zip(images, label_paths, results):
+        h, w = img.shape[:2]
+        lbformat.saveLabel(label_path, lbformat.normalizeLabels(labels, w, h))
+
+    return len(tasks)
+
+def collectTasks(
+    images_folder: str,
+    labels_folder: str,
+    overwrite: bool = False
+) -> List[Tuple[str, str]]:
+    ''' (image_path, label_path) of images to label, sorted by filename. '''
+    tasks = []
+    for filename in sorted(imgproc.getImageFiles(images_folder)):
+        label_path = imgproc.getLabelPath(filename, labels_folder)
+        if not overwrite and os.path.exists(label_path):
+            continue
+        tasks.append((os.path.join(images_folder, filename), label_path))
+    return tasks
+
+def run(
+    images_folder: str,
+    labels_folder: str,
+    model_kwargs: dict,
+    workers: int = None,
+    threads: int = 1,
+    batch_size: int = 4,
+    overwrite: bool = False,
+    tile_kwargs: dict = None
+) -> None:
+    imgproc.makeFolder(labels_folder)
+    tasks = collectTasks(images_folder, labels_folder, overwrite)
+    chunks = [tasks[i:i+batch_size] for i in range(0, len(tasks), batch_size)]
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    progress = Progress(len(tasks))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initWorker,
+        initargs=(model_kwargs, threads, tile_kwargs)
+    ) as pool:
+        pending = set()
+        for chunk in chunks:
+            # Bounded in-flight work, do not queue the whole folder.
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    progress.update(future.result())
+            pending.add(pool.submit(_labelImages, chunk))
+
+        for future in wait(pending).done:
+            progress.update(future.result())
+
+    progress.finish()
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Pre-label images with PoseModel.')
+    parser.add_argument('images_folder')
+    parser.add_argument('labels_folder')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--rect', action='store_true', help='rectangular letterbox')
+    parser.add_argument('--workers', type=int, default=None, help='default: cpu count')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker')
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--overwrite', action='store_true', help='overwrite existing labels')
+    parser.add_argument('--tile', type=int, default=None, metavar='SIZE',
+                        help='tiled inference with tiles of SIZE pixels, for high resolution images')
+    parser.add_argument('--tile-overlap', type=float, default=0.2)
+    parser.add_argument('--server', default=None, metavar='ADDRESS',
+                        help='use a running inference server, host:port or unix:PATH')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+
+    model_kwargs = {
+        'model_path': args.model,
+        'img_size': (args.img_size, args.img_size),
+        'confidence_thresh': args.conf,
+        'nms_thresh': args.nms,
+        'candidate_capacity': 0,
+        'rect': args.rect,
+        'backend': args.backend,
+        'num_threads': args.threads,
+        'server': args.server
+    }
+    tile_kwargs = None
+    if args.tile is not None:
+        tile_kwargs = {'tile_size': args.tile, 'overlap': args.tile_overlap}
+    run(
+        args.images_folder, args.labels_folder, model_kwargs,
+        workers=args.workers,
+        threads=args.threads,
+        batch_size=args.batch_size,
+        overwrite=args.overwrite,
+        tile_kwargs=tile_kwargs
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+'''
+Measure PoseModel latency on a fixed image set, stage by stage.
+
+    python -m src.tools.benchmark [--images resources/test_dataset/images]
+        [--backends opencv onnxruntime] [--img-sizes 416 640] [--threads 1 4]
+        [--conf 0.2 0.5] [--nms 0.2] [--output benchmark.json]
+
+Every combination of backend, image size and thread count is measured,
+reporting p50/p95/p99 latency of letterbox, blob, forward, decode and
+NMS. Thresholds only affect NMS, they are swept on the same candidates.
+Results are written as JSON to compare machines and model versions.
+'''
+import argparse
+import json
+import os
+import platform
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from ..utils import imgproc
+from ..utils.backend import BACKENDS
+from ..utils.detection_cache import hashFile
+from ..utils.inference import Candidates, PoseModel
+
+STAGES = ['letterbox', 'blob', 'forward', 'decode', 'nms']
+
+def percentiles(times: List[float]) -> Dict[str, float]:
+    ''' Latency percentiles in milliseconds. '''
+    if len(times) == 0:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(times) * 1000, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+def loadImages(folder: str, limit: int = None) -> List[np.ndarray]:
+    files = sorted(imgproc.getImageFiles(folder))[:limit]
+    images = [cv2.imread(os.path.join(folder, f)) for f in files]
+    return [img for img in images if img is not None]
+
+def _runStages(
+    model: PoseModel,
+    img: np.ndarray,
+    times: Dict[str, List[float]],
+    score_thresh: float
+) -> Candidates:
+    ''' Run one image step by step like PoseModel._forwardBatch. '''
+    t0 = time.perf_counter()
+    input_size = model._inputSize([img])
+    letterbox_img, scale = model._letterbox(img, input_size)
+    t1 = time.perf_counter()
+    blob = model._getBlobBuffer((1, 3, input_size[1], input_size[0]))
+    model._fillBlob(blob[0], letterbox_img)
+    t2 = time.perf_counter()
+    output_buffer = model._forwardBlob(blob)
+    t3 = time.perf_counter()
+    if output_buffer is None:
+        # Fixed input shape, let PoseModel fall back to square letterbox
+        # and measure the image again.
+        model._forward([img], input_size)
+        return _runStages(model, img, times, score_thresh)
+    candidates = Candidates(
+        *model._read_from_output_buffer(output_buffer[0], scale, score_thresh),
+        img.shape[1], img.shape[0]
+    )
+    t4 = time.perf_counter()
+
+    times['letterbox'].append(t1 - t0)
+    times['blob'].append(t2 - t1)
+    times['forward'].append(t3 - t2)
+    times['decode'].append(t4 - t3)
+    return candidates
+
+def benchmark(
+    model_path: str,
+    images: List[np.ndarray],
+    img_size: int,
+    threads: int,
+    thresholds: List[List[float]],
+    repeat: int = 3,
+    rect: bool = False,
+    backend: str = 'opencv'
+) -> dict:
+    cv2.setNumThreads(threads)
+    model = PoseModel(
+        model_path, (img_size, img_size),
+        candidate_capacity=0,
+        rect=rect,
+        backend=backend,
+        num_threads=threads
+    )
+    model.warmup()
+
+    score_thresh = min(model.candidate_thresh, *(conf for conf, _ in thresholds))
+    times = {stage: [] for stage in STAGES[:-1]}
+    nms_times = [[] for _ in thresholds]
+    detections = [[] for _ in thresholds]
+    for _ in range(repeat):
+        for i, img in enumerate(images):
+            candidates = _runStages(model, img, times, score_thresh)
+            for j, (conf, nms) in enumerate(thresholds):
+                t = time.perf_counter()
+                labels = model.applyThresholds(candidates, conf, nms)
+                nms_times[j].append(time.perf_counter() - t)
+                if len(detections[j]) < len(images):
+                    detections[j].append(len(labels))
+
+    stages = {stage: percentiles(t) for stage, t in times.items()}
+    stages['nms'] = percentiles(sum(nms_times, []))
+    return {
+        'backend': model.backend.name,
+        'img_size': img_size,
+        'threads': threads,
+        'rect': model.rect,
+        'stages': stages,
+        'thresholds': [
+            {
+                'conf': conf,
+                'nms': nms,
+                'nms_ms': percentiles(nms_times[j]),
+                'detections_per_image': float(np.mean(detections[j])) if images else 0.0,
+                'detections': detections[j]
+            } for j, (conf, nms) in enumerate(thresholds)
+        ]
+    }
+
+def printResult(result: dict) -> None:
+    print(f"backend {result['backend']}, img_size {result['img_size']}, threads {result['threads']}, rect {result['rect']}")
+    print(f"  {'stage':<10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for stage in STAGES:
+        p = result['stages'][stage]
+        print(f"  {stage:<10}{p['p50']:>10.3f}{p['p95']:>10.3f}{p['p99']:>10.3f}")
+    for th in result['thresholds']:
+        print(f"  conf {th['conf']:.2f} nms {th['nms']:.2f}: "
+              f"nms p50 {th['nms_ms']['p50']:.3f} ms, "
+              f"{th['detections_per_image']:.2f} detections/image {th['detections']}")
+
+def machineInfo() -> dict:
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__
+    }
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark PoseModel.')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--images', default='resources/test_dataset/images')
+    parser.add_argument('--limit', type=int, default=None, help='max number of images')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--img-sizes', type=int, nargs='+', default=[416])
+    parser.add_argument('--backends', nargs='+', default=['opencv'], choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, nargs='+', default=[cv2.getNumThreads()])
+    parser.add_argument('--conf', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--nms', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--rect', action='store_true', help='rectangular letterbox')
+    parser.add_argument('--output', default='benchmark.json')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+
+    images = loadImages(args.images, args.limit)
+    thresholds = [[conf, nms] for conf in args.conf for nms in args.nms]
+
+    report = {
+        'machine': machineInfo(),
+        'model': args.model,
+        'model_hash': hashFile(args.model),
+        'images': args.images,
+        'num_images': len(images),
+        'repeat': args.repeat,
+        'runs': []
+    }
+    for backend in args.backends:
+        for img_size in args.img_sizes:
+            for threads in args.threads:
+                result = benchmark(
+                    args.model, images, img_size, threads, thresholds,
+                    repeat=args.repeat,
+                    rect=args.rect,
+                    backend=backend
+                )
+                printResult(result)
+                report['runs'].append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'Results saved to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+'''
+Evaluate PoseModel against the labels of a folder.
+
+    python -m src.tools.evaluate IMAGES_FOLDER LABELS_FOLDER
+        [--model resources/armor.onnx] [--workers N] [--output summary.json]
+
+Predictions are matched to labels of the same class by OKS (object
+keypoint similarity). Reports AP50 and AP (OKS 0.5:0.95) per class and
+their mean, precision and recall at the confidence threshold, keypoint
+error in pixels and OKS of matched plates. Images without a label file
+have no plates.
+
+Errors of every image are written to `.evaluation.jsonl` of the images
+folder, worst images come first in the image list with ctrl+u. Results
+are accumulated in fixed size histograms, memory does not grow with the
+number of images.
+'''
+import argparse
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from .. import pygame_gui as ui
+from ..utils import imgproc
+from ..utils import lbformat as fmt
+from ..utils.backend import BACKENDS
+from ..utils.evaluation import ERROR_INDEX_FILE, Evaluator, evaluateImage
+from ..utils.inference import PoseModel
+from ..utils.nms import nms
+from .progress import Progress
+
+# Model of a worker process
+_model: PoseModel = None
+_sigma: float = 0.05
+
+def _initWorker(model_kwargs: dict, num_threads: int, sigma: float) -> None:
+    global _model, _sigma
+    cv2.setNumThreads(num_threads)
+    _model = PoseModel(**model_kwargs)
+    _sigma = sigma
+
+def _evaluateImages(tasks: List[Tuple[str, str]]) -> List[dict]:
+    ''' Evaluate a chunk of (image_path, label_path), label_path may be None. '''
+    images = []
+    label_paths = []
+    for image_path, label_path in tasks:
+        img = cv2.imread(image_path)
+        if img is None:
+            ui.logger.warning(f'Can not read image {image_path}.')
+            continue
+        images.append((os.path.basename(image_path), img))
+        label_paths.append(label_path)
+
+    results = []
+    all_candidates = _model._forwardBatch([img for _, img in images])
+    for (filename, img), label_path, candidates in zip(images, label_paths, all_candidates):
+        h, w = img.shape[:2]
+        # Candidates down to `candidate_thresh`, for precision at every score.
+        indices = nms(
+            candidates.boxes, candidates.scores, _model.nms_thresh,
+            class_ids=candidates.class_ids if _model.class_aware_nms else None
+        )
+        pred_kpts = _model._clip_keypoints(candidates.keypoints[indices], w, h)
+
+        labels = []
+        if label_path is not None:
+            labels = fmt.denormalizeLabels(fmt.loadLabel(label_path), w, h)
+        gt_kpts = np.array([label.kpts for label in labels], np.float64).reshape(len(labels), _model.num_keypoints, 2)
+
+        result = evaluateImage(
+            candidates.class_ids[indices], candidates.scores[indices], pred_kpts,
+            [label.cls_id for label in labels], gt_kpts,
+            _model.confidence_thresh, _sigma
+        )
+        result['file'] = filename
+        results.append(result)
+    return results
+
+def _indexEntry(result: dict) -> str:
+    errors = [m[1] for m in result['matches']]
+    entry = {
+        'file': result['file'],
+        'error': result['error'],
+        'tp': len(result['matches']),
+        'fp': result['fp'],
+        'fn': result['fn'],
+        'keypoint_error': float(np.mean(errors)) if len(errors) > 0 else None
+    }
+    return json.dumps(entry) + '\n'
+
+def run(
+    images_folder: str,
+    labels_folder: str,
+    model_kwargs: dict,
+    workers: int = None,
+    threads: int = 1,
+    batch_size: int = 4,
+    sigma: float = 0.05
+) -> dict:
+    '''
+    Evaluate all images of a folder, write the error index and return
+    `Evaluator.summary()`.
+    '''
+    pairs = imgproc.getPairedPath(images_folder, labels_folder)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    progress = Progress(len(pairs))
+    evaluator = Evaluator(
+        num_classes=model_kwargs.get('num_classes', 16),
+        confidence_thresh=model_kwargs.get('confidence_thresh', 0.2)
+    )
+
+    # Complete index replaces the last one, an interrupted run keeps it.
+    index_path = os.path.join(images_folder, ERROR_INDEX_FILE)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as index, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initWorker,
+        initargs=(model_kwargs, threads, sigma)
+    ) as pool:
+        def collect(futures) -> None:
+            for future in futures:
+                results = future.result()
+                for result in results:
+                    evaluator.add(result)
+                    index.write(_indexEntry(result))
+                progress.update(len(results))
+
+        pending = set()
+        for i in range(0, len(pairs), batch_size):
+            # Bounded in-flight work, do not queue the whole folder.
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(_evaluateImages, [tuple(pair) for pair in pairs[i:i+batch_size]]))
+        collect(wait(pending).done)
+    os.replace(tmp_path, index_path)
+
+    progress.finish()
+    return evaluator.summary()
+
+def _formatMetric(value) -> str:
+    return '-' if value is None else f'{value:.3f}'
+
+def printSummary(summary: dict) -> None:
+    print(f'{"class":>6} {"gt":>7} {"AP50":>6} {"AP":>6} {"P":>6} {"R":>6} {"kpt px":>7} {"OKS":>6}')
+    rows = [(str(cls_id), c) for cls_id, c in summary['classes'].items()]
+    rows.append(('all', dict(summary, gt=sum(c['gt'] for c in summary['classes'].values()),
+                             ap50=summary['map50'], ap=summary['map'])))
+    for name, c in rows:
+        print(
+            f'{name:>6} {c["gt"]:>7} {c["ap50"]:>6.3f} {c["ap"]:>6.3f} {c["precision"]:>6.3f} '
+            f'{c["recall"]:>6.3f} {_formatMetric(c["keypoint_error"]):>7} {_formatMetric(c["oks"]):>6}'
+        )
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Evaluate PoseModel against labels.')
+    parser.add_argument('images_folder')
+    parser.add_argument('labels_folder')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold of precision and recall')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--min-score', type=float, default=0.05, help='lowest score of AP')
+    parser.add_argument('--sigma', type=float, default=0.05, help='OKS keypoint sigma')
+    parser.add_argument('--workers', type=int, default=None, help='default: cpu count')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker')
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--server', default=None, metavar='ADDRESS',
+                        help='use a running inference server, host:port or unix:PATH')
+    parser.add_argument('--output', default=None, metavar='FILE', help='save summary as json')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+
+    model_kwargs = {
+        'model_path': args.model,
+        'img_size': (args.img_size, args.img_size),
+        'confidence_thresh': args.conf,
+        'nms_thresh': args.nms,
+        'candidate_thresh': args.min_score,
+        'candidate_capacity': 0,
+        'backend': args.backend,
+        'num_threads': args.threads,
+        'server': args.server
+    }
+    summary = run(
+        args.images_folder, args.labels_folder, model_kwargs,
+        workers=args.workers,
+        threads=args.threads,
+        batch_size=args.batch_size,
+        sigma=args.sigma
+    )
+    printSummary(summary)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+'''
+Label frames of a whole match video with pipelined PoseModel inference.
+
+    python -m src.tools.labelvideo VIDEO LABELS_FOLDER
+        [--model resources/armor.onnx] [--step 1] [--images IMAGES_FOLDER] [--roi N]
+
+Labels of frame i are saved as `<video name>_<i>.txt`, the same name as
+frames saved by the video page. With `--images`, labeled frames are
+saved as images too, so both folders can be opened for annotation.
+Frames without any detection have no label file.
+
+With `--roi N`, frames are labeled one by one, only regions around the
+last detections are searched and the whole frame every N frames. Regions
+are packed into one network input at native resolution, so a frame
+usually costs one forward pass of at most `--img-size`, with `--rect`
+only as large as the packed regions. Regions larger than the network
+input cost a whole frame pass each.
+'''
+import argparse
+import os
+from typing import Iterator, List
+
+import cv2
+import numpy as np
+
+from ..utils import imgproc, lbformat
+from ..utils.backend import BACKENDS
+from ..utils.inference import PoseModel
+from ..utils.roi import ROIInference
+from .progress import Progress
+
+
+def sampleFrames(
+    cap: cv2.VideoCapture,
+    step: int = 1,
+    images_folder: str = None,
+    video_name: str = ''
+) -> Iterator[np.ndarray]:
+    '''
+    Every `step`-th frame of a video, skipped frames are not decoded.
+    Frames are also saved to `images_folder` if given.
+    '''
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        if images_folder is not None:
+            cv2.imwrite(os.path.join(images_folder, f'{video_name}_{frame_idx}.jpg'), frame)
+        yield frame
+
+        for _ in range(step - 1):
+            if not cap.grab():
+                return
+        frame_idx += step
+
+def run(
+    video_path: str,
+    labels_folder: str,
+    model_kwargs: dict,
+    step: int = 1,
+    batch_size: int = 1,
+    images_folder: str = None,
+    roi_interval: int = None
+) -> None:
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f'Can not open video {video_path}.')
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    imgproc.makeFolder(labels_folder)
+    if images_folder is not None:
+        imgproc.makeFolder(images_folder)
+
+    model = PoseModel(**model_kwargs)
+    frames = sampleFrames(cap, step, images_folder, video_name)
+    progress = Progress(-(-total_frames // step), name='frames')
+    if roi_interval is None:
+        results = model.inferenceStream(frames, batch_size=batch_size)
+    else:
+        roi = ROIInference(model, roi_interval)
+        results = ((i, roi.process(i, frame)) for i, frame in enumerate(frames))
+    try:
+        for i, labels in results:
+            label_path = os.path.join(labels_folder, f'{video_name}_{i * step}.txt')
+            lbformat.saveLabel(label_path, lbformat.normalizeLabels(labels, w, h))
+            progress.update()
+    finally:
+        cap.release()
+    progress.finish()
+    if roi_interval is not None:
+        print(f'whole frames: {roi.full_passes}, regions only: {roi.roi_passes}, '
+              f'fallbacks: {roi.fallbacks}')
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Label video frames with PoseModel.')
+    parser.add_argument('video')
+    parser.add_argument('labels_folder')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--rect', action='store_true', help='rectangular letterbox')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=None, help='inference threads')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--step', type=int, default=1, help='label every STEP-th frame')
+    parser.add_argument('--images', default=None, metavar='IMAGES_FOLDER',
+                        help='also save labeled frames to this folder')
+    parser.add_argument('--roi', type=int, default=None, metavar='N',
+                        help='search around last detections, whole frame every N frames; '
+                             'regions are packed into one network input')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+    if args.step < 1:
+        parser.error('step should be at least 1')
+    if args.roi is not None and args.roi < 1:
+        parser.error('roi interval should be at least 1')
+
+    model_kwargs = {
+        'model_path': args.model,
+        'img_size': (args.img_size, args.img_size),
+        'confidence_thresh': args.conf,
+        'nms_thresh': args.nms,
+        'candidate_capacity': 0,
+        'rect': args.rect,
+        'backend': args.backend,
+        'num_threads': args.threads
+    }
+    run(
+        args.video, args.labels_folder, model_kwargs,
+        step=args.step,
+        batch_size=args.batch_size,
+        images_folder=args.images,
+        roi_interval=args.roi
+    )
+
+if __name__ == '__main__':
+    main()
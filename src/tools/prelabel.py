@@ -0,0 +1,80 @@
+'''
+Watch an images folder and pre-label new or changed images in background.
+
+    python -m src.tools.prelabel IMAGES_FOLDER LABELS_FOLDER
+        [--model resources/armor.onnx] [--output FOLDER] [--interval 5] [--max-rate N]
+
+Labels are written before anyone opens the images, so annotation becomes
+review. Existing label files are never overwritten unless they were
+written by this tool and nobody modified them since. With `--output`,
+pre-labels go to a side folder, and images that have labels in
+LABELS_FOLDER are skipped.
+
+The process runs at low priority with one inference thread by default,
+`--max-rate` limits images per second. Processed images are recorded in
+`.prelabel.json` of the output folder, so it can be stopped and run again.
+'''
+import argparse
+import os
+from typing import List
+
+import cv2
+
+from ..utils.backend import BACKENDS
+from ..utils.inference import PoseModel
+from ..utils.prelabel import Prelabeler
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Pre-label new images of a folder with PoseModel.')
+    parser.add_argument('images_folder')
+    parser.add_argument('labels_folder')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=1, help='inference threads')
+    parser.add_argument('--server', default=None, metavar='ADDRESS',
+                        help='use a running inference server, host:port or unix:PATH')
+    parser.add_argument('--output', default=None, metavar='FOLDER',
+                        help='write pre-labels to this folder instead of LABELS_FOLDER')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between folder scans')
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--max-rate', type=float, default=None, help='images per second')
+    parser.add_argument('--nice', type=int, default=10, help='process niceness increment')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+    if args.max_rate is not None and args.max_rate <= 0:
+        parser.error('max rate should be positive')
+
+    if hasattr(os, 'nice'):
+        os.nice(args.nice)
+    cv2.setNumThreads(args.threads)
+
+    model = PoseModel(
+        args.model,
+        img_size=(args.img_size, args.img_size),
+        confidence_thresh=args.conf,
+        nms_thresh=args.nms,
+        candidate_capacity=0,
+        backend=args.backend,
+        num_threads=args.threads,
+        server=args.server
+    )
+    prelabeler = Prelabeler(
+        args.images_folder, args.labels_folder, model.inferenceBatch,
+        output_folder=args.output,
+        batch_size=args.batch_size,
+        max_rate=args.max_rate
+    )
+    print(f'Watching {args.images_folder}, Ctrl+C to stop.')
+    try:
+        prelabeler.runForever(args.interval)
+    except KeyboardInterrupt:
+        pass
+    print(f'{prelabeler.labeled} images labeled, {prelabeler.skipped} skipped with human labels.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import time
+
+
+def formatSeconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:d}:{minutes:02d}:{seconds:02d}'
+
+class Progress:
+    '''
+    Print throughput and ETA of a long running job every `interval`
+    seconds.
+
+    Progress(total, interval, name)
+
+    Methods:
+    * update(n) -> None
+    * finish() -> None
+    '''
+    def __init__(self, total: int, interval: float = 5.0, name: str = 'images'):
+        self.total = total
+        self.interval = interval
+        self.name = name
+
+        self.done = 0
+        self.start_time = time.time()
+        self.last_print_time = self.start_time
+
+    def _print(self) -> None:
+        elapsed = time.time() - self.start_time
+        speed = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / speed if speed > 0 else 0.0
+        print(f'{self.done}/{self.total} {self.name}, '
+              f'{speed:.1f} {self.name}/s, '
+              f'elapsed {formatSeconds(elapsed)}, '
+              f'ETA {formatSeconds(eta)}', flush=True)
+
+    def update(self, n: int = 1) -> None:
+        self.done += n
+        if time.time() - self.last_print_time >= self.interval:
+            self.last_print_time = time.time()
+            self._print()
+
+    def finish(self) -> None:
+        self._print()
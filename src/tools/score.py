@@ -0,0 +1,61 @@
+'''
+Score how informative labeling each image of a folder is, for the
+"most informative first" order of the image list (ctrl+u).
+
+    python -m src.tools.score IMAGES_FOLDER LABELS_FOLDER [--model resources/armor.onnx]
+
+Scores are saved to `.uncertainty.jsonl` of the images folder. Only new
+or changed images and labels are scored, an interrupted run resumes
+where it stopped.
+'''
+import argparse
+import os
+from typing import List
+
+from ..utils.backend import BACKENDS
+from ..utils.inference import PoseModel
+from ..utils.uncertainty import scoreFolder
+from .progress import Progress
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Score images by PoseModel uncertainty.')
+    parser.add_argument('images_folder')
+    parser.add_argument('labels_folder')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=None, help='inference threads')
+    parser.add_argument('--server', default=None, metavar='ADDRESS',
+                        help='use a running inference server, host:port or unix:PATH')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+
+    model = PoseModel(
+        args.model,
+        img_size=(args.img_size, args.img_size),
+        confidence_thresh=args.conf,
+        nms_thresh=args.nms,
+        candidate_capacity=0,
+        backend=args.backend,
+        num_threads=args.threads,
+        server=args.server
+    )
+
+    progress = None
+    def on_progress(done: int, total: int) -> None:
+        nonlocal progress
+        if progress is None:
+            progress = Progress(total)
+        progress.update(done - progress.done)
+
+    scored = scoreFolder(args.images_folder, args.labels_folder, model, on_progress=on_progress)
+    if progress is not None:
+        progress.finish()
+    print(f'{scored} images scored.')
+
+if __name__ == '__main__':
+    main()
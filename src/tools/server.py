@@ -0,0 +1,62 @@
+'''
+Run a local inference server, shared by the GUI and labeling tools.
+
+    python -m src.tools.server [--model resources/armor.onnx]
+        [--address 127.0.0.1:50751] [--window-ms 5] [--max-batch 8]
+
+`--address` is `host:port` or `unix:/path/to/socket`. Requests arriving
+within `--window-ms` are run in one forward pass. Clients use the server
+if it runs the same model file with the same input size and letterbox
+(`--rect`), see the `server` argument of PoseModel.
+'''
+import argparse
+import os
+from typing import List
+
+from ..utils.backend import BACKENDS
+from ..utils.inference import PoseModel
+from ..utils.inference_server import DEFAULT_ADDRESS, InferenceServer
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Serve PoseModel inference to local clients.')
+    parser.add_argument('--model', default='resources/armor.onnx')
+    parser.add_argument('--img-size', type=int, default=416)
+    parser.add_argument('--conf', type=float, default=0.2, help='confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.2, help='NMS threshold')
+    parser.add_argument('--rect', action='store_true', help='rectangular letterbox')
+    parser.add_argument('--backend', default='opencv', choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=None, help='inference threads')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help='host:port or unix:PATH')
+    parser.add_argument('--window-ms', type=float, default=5.0, help='batching window')
+    parser.add_argument('--max-batch', type=int, default=8)
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.model):
+        parser.error(f'model {args.model} does not exist')
+    if args.max_batch < 1:
+        parser.error('max batch should be at least 1')
+
+    model = PoseModel(
+        args.model,
+        img_size=(args.img_size, args.img_size),
+        confidence_thresh=args.conf,
+        nms_thresh=args.nms,
+        candidate_capacity=0,
+        rect=args.rect,
+        backend=args.backend,
+        num_threads=args.threads
+    )
+    model.warmup()
+
+    server = InferenceServer(model, args.address, args.window_ms / 1000, args.max_batch)
+    print(f'Serving {args.model} at {args.address}, Ctrl+C to stop.')
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    print(f'{server.batcher.images} images in {server.batcher.batches} batches.')
+
+if __name__ == '__main__':
+    main()
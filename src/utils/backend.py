@@ -0,0 +1,110 @@
+__all__ = [
+    'BACKENDS',
+    'Backend',
+    'OpenCVBackend',
+    'OnnxRuntimeBackend',
+    'availableBackends',
+    'createBackend',
+]
+
+from typing import List
+
+import cv2
+import numpy as np
+
+from .. import pygame_gui as ui
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+class Backend:
+    '''
+    Runs the network of a PoseModel. Preprocessing and decoding are done
+    by PoseModel, so every backend gets the same NCHW float32 blob and
+    returns the raw output buffer.
+
+    Methods:
+    * forward(blob) -> np.ndarray
+    '''
+    name = ''
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        ui.logger.error(f'{type(self).__name__} does not implement forward.', NotImplementedError, self)
+
+class OpenCVBackend(Backend):
+    '''
+    OpenCVBackend(model_path, num_threads)
+
+    `num_threads` is applied by `cv2.setNumThreads` which affects the
+    whole process.
+    '''
+    name = 'opencv'
+
+    def __init__(self, model_path: str, num_threads: int = None, **kwargs):
+        if num_threads is not None:
+            cv2.setNumThreads(num_threads)
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        self.net.setInput(blob)
+        return self.net.forward()
+
+class OnnxRuntimeBackend(Backend):
+    '''
+    OnnxRuntimeBackend(model_path, num_threads, inter_op_threads)
+
+    CPU execution provider of onnxruntime, only available if the
+    package is installed.
+    '''
+    name = 'onnxruntime'
+
+    def __init__(self,
+        model_path: str,
+        num_threads: int = None,
+        inter_op_threads: int = None,
+        **kwargs
+    ):
+        if ort is None:
+            ui.logger.error('onnxruntime is not installed.', ImportError, self)
+
+        options = ort.SessionOptions()
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        if inter_op_threads is not None:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(
+            model_path, options,
+            providers=['CPUExecutionProvider']
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Models exported with batch size 1 run a batch image by image.
+        self.fixed_batch = model_input.shape[0] == 1
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        if self.fixed_batch and blob.shape[0] > 1:
+            return np.concatenate([self.forward(blob[i:i+1]) for i in range(blob.shape[0])])
+        return self.session.run(None, {self.input_name: blob})[0]
+
+BACKENDS = {
+    OpenCVBackend.name: OpenCVBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+def availableBackends() -> List[str]:
+    return [name for name in BACKENDS if name != OnnxRuntimeBackend.name or ort is not None]
+
+def createBackend(name: str, model_path: str, **kwargs) -> Backend:
+    '''
+    createBackend(name, model_path, num_threads, inter_op_threads)
+
+    Falls back to OpenCV if the backend is not available.
+    '''
+    if name not in availableBackends():
+        ui.logger.warning(f'Backend {name} is not available, use {OpenCVBackend.name}.')
+        name = OpenCVBackend.name
+    return BACKENDS[name](model_path, **kwargs)
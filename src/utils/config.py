@@ -15,6 +15,25 @@ except tk.TclError:
 
 @ui.utils.singleton
 class ConfigManager:
+    DEFAULT = {
+        'load_network': False,
+        'last_images_folder': None,
+        'last_labels_folder': None,
+        'last_image_index': None,
+        'last_video_path': None,
+        'inference_backend': 'opencv',
+        'inference_threads': None,
+        'inference_inter_op_threads': None,
+        'inference_server': None,
+        'track_keyframe_interval': 5,
+        'track_drift_thresh': 2.0,
+        'models': {'armor': 'resources/armor.onnx'},
+        'active_model': 'armor',
+        'model_cache_size': 2,
+        'image_sort': 'name',
+        'snap_mode': False
+    }
+
     def __init__(self, path: str):
         self.path = path
 
@@ -24,21 +43,17 @@ class ConfigManager:
         with open(path, 'r') as f:
             self.data = json.load(f)
 
+        # Config files written by older versions miss new keys.
+        for key, value in self.DEFAULT.items():
+            self.data.setdefault(key, value)
+
     def _createJsonFile(self, path) -> None:
         folder, _ = os.path.split(path)
-        if not os.path.exists(folder):
+        if folder and not os.path.exists(folder):
             os.makedirs(folder)
 
-        default = {
-            'load_network': False,
-            'last_images_folder': None,
-            'last_labels_folder': None,
-            'last_image_index': None,
-            'last_video_path': None
-        }
-
         with open(path, 'w') as f:
-            json.dump(default, f, indent=4)
+            json.dump(self.DEFAULT, f, indent=4)
 
     def __setitem__(self, key: str, value: Any):
         self.data[key] = value
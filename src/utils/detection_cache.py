@@ -0,0 +1,153 @@
+__all__ = [
+    'DetectionCache',
+    'getCachePath',
+    'hashFile',
+]
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+
+from . import lbformat as fmt
+
+# Folder of on-disk cache files
+CACHE_FOLDER = './cache/detections'
+
+# (cls_id, kpts) of one detection
+_Entry = List[Tuple[int, List[Tuple[float, float]]]]
+
+def hashFile(path: str) -> str:
+    ''' Content hash of a file, e.g. an onnx model. '''
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def getCachePath(source_path: str) -> str:
+    ''' Cache file of a video or an images folder. '''
+    source_path = os.path.abspath(source_path)
+    name = os.path.basename(os.path.normpath(source_path))
+    digest = hashlib.blake2b(source_path.encode(), digest_size=4).hexdigest()
+    return os.path.join(CACHE_FOLDER, f'{name}-{digest}.cache')
+
+def _entry2line(key: str, entry: _Entry) -> str:
+    lines = [
+        fmt.ixy2line(cls_id, [p[0] for p in kpts], [p[1] for p in kpts])
+        for cls_id, kpts in entry
+    ]
+    return key + '\t' + '|'.join(lines) + '\n'
+
+def _line2entry(line: str) -> Tuple[str, _Entry]:
+    key, labels = line.rstrip('\n').split('\t')
+    entry = []
+    for label in filter(None, labels.split('|')):
+        cls_id, xs, ys = fmt.line2ixy(label)
+        entry.append((cls_id, list(zip(xs, ys))))
+    return key, entry
+
+class DetectionCache:
+    '''
+    Two-tier detection cache: an in-memory LRU and an optional
+    append-only file, usually one file per video or images folder.
+
+    DetectionCache(capacity, path)
+
+    Methods:
+    * open(path) -> None
+    * close() -> None
+    * get(key, label_type) -> List[LabelIO] | None
+    * put(key, labels) -> None
+    '''
+    def __init__(self, capacity: int = 4096, path: str = None):
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._disk: Dict[str, _Entry] = {}
+        self._file = None
+        self.path: str = None
+
+        if path is not None:
+            self.open(path)
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def open(self, path: str) -> None:
+        ''' Load entries of a cache file and append new entries to it. '''
+        with self._lock:
+            self._closeFile()
+            self._disk = {}
+
+            if os.path.exists(path):
+                complete = 0 # bytes of complete lines
+                with open(path, 'rb') as f:
+                    for line in f:
+                        # The last line may be incomplete if we were killed.
+                        if not line.endswith(b'\n'):
+                            break
+                        complete += len(line)
+                        try:
+                            key, entry = _line2entry(line.decode())
+                        except (ValueError, IndexError):
+                            continue # malformed, e.g. written by a killed process
+                        self._disk[key] = entry
+                if complete < os.path.getsize(path):
+                    # New entries must not be glued to an incomplete line.
+                    os.truncate(path, complete)
+            else:
+                folder = os.path.dirname(path)
+                if folder and not os.path.exists(folder):
+                    os.makedirs(folder)
+
+            self._file = open(path, 'a')
+            self.path = path
+
+    def _closeFile(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.path = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._closeFile()
+            self._disk = {}
+
+    def _remember(self, key: str, entry: _Entry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def get(self,
+        key: str,
+        label_type: type = fmt.LabelIO
+    ) -> Union[List[fmt.LabelIO], None]:
+        ''' Returns new label objects, or None if missed. '''
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                entry = self._disk.get(key)
+                if entry is None:
+                    return None
+                self._remember(key, entry)
+
+        return [label_type(cls_id, list(kpts)) for cls_id, kpts in entry]
+
+    def put(self, key: str, labels: List[fmt.LabelIO]) -> None:
+        entry = [
+            (lb.cls_id, [(float(x), float(y)) for x, y in lb.kpts])
+            for lb in labels
+        ]
+        with self._lock:
+            self._remember(key, entry)
+            if self._file is not None and key not in self._disk:
+                self._disk[key] = entry
+                self._file.write(_entry2line(key, entry))
+                self._file.flush()
@@ -0,0 +1,212 @@
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Per-image errors of the last evaluation, in the images folder.
+ERROR_INDEX_FILE = '.evaluation.jsonl'
+
+# OKS thresholds of mAP, as COCO keypoints
+OKS_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+def oksMatrix(pred_kpts: np.ndarray, gt_kpts: np.ndarray, sigma: float = 0.05) -> np.ndarray:
+    '''
+    Object keypoint similarity of (P, K, 2) predictions and (G, K, 2)
+    ground truth in pixels, scaled by the bbox area of ground truth.
+
+    Returns:
+        (P, G) OKS in [0, 1].
+    '''
+    pred_kpts = np.asarray(pred_kpts, np.float64).reshape(len(pred_kpts), -1, 2)
+    gt_kpts = np.asarray(gt_kpts, np.float64).reshape(len(gt_kpts), -1, 2)
+    sizes = gt_kpts.max(axis=1) - gt_kpts.min(axis=1)
+    areas = np.maximum(sizes[:, 0] * sizes[:, 1], 1.0)
+
+    d2 = ((pred_kpts[:, None] - gt_kpts[None]) ** 2).sum(axis=-1) # (P, G, K)
+    e = d2 / (2 * areas[None, :, None] * (2 * sigma) ** 2)
+    return np.exp(-e).mean(axis=-1)
+
+def greedyMatch(oks: np.ndarray, scores: np.ndarray, thresh: float) -> List[Tuple[int, int]]:
+    '''
+    COCO matching, predictions by descending score take the unmatched
+    ground truth of highest OKS above `thresh`.
+
+    Returns:
+        [(prediction index, ground truth index), ...]
+    '''
+    matches = []
+    used = np.zeros((oks.shape[1],), bool)
+    for i in np.argsort(-np.asarray(scores), kind='stable'):
+        candidates = np.flatnonzero(~used & (oks[i] >= thresh))
+        if len(candidates) == 0:
+            continue
+        j = candidates[np.argmax(oks[i, candidates])]
+        used[j] = True
+        matches.append((int(i), int(j)))
+    return matches
+
+def evaluateImage(
+    pred_classes: np.ndarray,
+    pred_scores: np.ndarray,
+    pred_kpts: np.ndarray,
+    gt_classes: np.ndarray,
+    gt_kpts: np.ndarray,
+    confidence_thresh: float,
+    sigma: float = 0.05
+) -> dict:
+    '''
+    Match predictions of one image to ground truth of the same class,
+    keypoints are in pixels. The result is small, so it can be sent
+    between processes and added to an Evaluator.
+
+    At the operating point, predictions scoring at least
+    `confidence_thresh` are matched with OKS 0.5. The image error is
+    false positives + false negatives + (1 - mean OKS of matches).
+    '''
+    pred_classes = np.asarray(pred_classes, np.int64)
+    pred_scores = np.asarray(pred_scores, np.float64)
+    gt_classes = np.asarray(gt_classes, np.int64)
+
+    # tp[i, t]: prediction i is a true positive at OKS_THRESHOLDS[t].
+    tp = np.zeros((len(pred_classes), len(OKS_THRESHOLDS)), bool)
+    matches = [] # (class, mean keypoint error, OKS) at the operating point
+    for cls_id in np.unique(pred_classes):
+        p = np.flatnonzero(pred_classes == cls_id)
+        g = np.flatnonzero(gt_classes == cls_id)
+        if len(g) == 0:
+            continue
+        oks = oksMatrix(pred_kpts[p], gt_kpts[g], sigma)
+        for t, thresh in enumerate(OKS_THRESHOLDS):
+            for i, _ in greedyMatch(oks, pred_scores[p], thresh):
+                tp[p[i], t] = True
+
+        kept = np.flatnonzero(pred_scores[p] >= confidence_thresh)
+        for i, j in greedyMatch(oks[kept], pred_scores[p][kept], OKS_THRESHOLDS[0]):
+            pred = np.asarray(pred_kpts[p[kept[i]]], np.float64).reshape(-1, 2)
+            gt = np.asarray(gt_kpts[g[j]], np.float64).reshape(-1, 2)
+            error = np.linalg.norm(pred - gt, axis=-1).mean()
+            matches.append((int(cls_id), float(error), float(oks[kept[i], j])))
+
+    num_kept = int((pred_scores >= confidence_thresh).sum())
+    fp = num_kept - len(matches)
+    fn = len(gt_classes) - len(matches)
+    mean_oks = float(np.mean([m[2] for m in matches])) if len(matches) > 0 else 1.0
+    return {
+        'pred_classes': pred_classes.tolist(),
+        'pred_scores': pred_scores.tolist(),
+        'tp': tp.tolist(),
+        'gt_classes': gt_classes.tolist(),
+        'matches': matches,
+        'fp': fp,
+        'fn': fn,
+        'error': fp + fn + (1 - mean_oks)
+    }
+
+def _averagePrecision(tp: np.ndarray, fp: np.ndarray, num_gt: int) -> float:
+    ''' 101-point interpolated AP of counts per score bin, highest bin first. '''
+    tp = np.cumsum(tp)
+    fp = np.cumsum(fp)
+    recall = tp / num_gt
+    precision = tp / np.maximum(tp + fp, 1)
+    # Precision envelope, non-increasing with recall.
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    points = np.searchsorted(recall, np.linspace(0, 1, 101), side='left')
+    return float(np.where(points < len(precision), precision[np.minimum(points, len(precision) - 1)], 0).mean())
+
+class Evaluator:
+    '''
+    Accumulates results of `evaluateImage` into histograms of scores, so
+    memory does not grow with the number of images. Scores are binned in
+    `num_bins` bins, AP is exact up to ties within a bin.
+
+    Evaluator(num_classes, confidence_thresh, num_bins)
+
+    Methods:
+    * add(result) -> None
+    * summary() -> dict
+    '''
+    def __init__(self, num_classes: int = 16, confidence_thresh: float = 0.2, num_bins: int = 1000):
+        self.num_classes = num_classes
+        self.confidence_thresh = confidence_thresh
+        self.num_bins = num_bins
+
+        shape = (num_classes, len(OKS_THRESHOLDS), num_bins)
+        self.tp_hist = np.zeros(shape, np.int64)
+        self.fp_hist = np.zeros(shape, np.int64)
+        self.num_gt = np.zeros((num_classes,), np.int64)
+        self.num_pred = np.zeros((num_classes,), np.int64) # at the operating point
+        self.num_tp = np.zeros((num_classes,), np.int64)
+        self.error_sum = np.zeros((num_classes,), np.float64)
+        self.oks_sum = np.zeros((num_classes,), np.float64)
+        self.images = 0
+
+    def add(self, result: dict) -> None:
+        self.images += 1
+        np.add.at(self.num_gt, np.asarray(result['gt_classes'], np.int64), 1)
+
+        classes = np.asarray(result['pred_classes'], np.int64)
+        if len(classes) > 0:
+            scores = np.asarray(result['pred_scores'])
+            tp = np.asarray(result['tp'], bool)
+            bins = np.clip((scores * self.num_bins).astype(np.int64), 0, self.num_bins - 1)
+            for t in range(len(OKS_THRESHOLDS)):
+                np.add.at(self.tp_hist[:, t], (classes, bins), tp[:, t])
+                np.add.at(self.fp_hist[:, t], (classes, bins), ~tp[:, t])
+            np.add.at(self.num_pred, classes[scores >= self.confidence_thresh], 1)
+
+        for cls_id, error, oks in result['matches']:
+            self.num_tp[cls_id] += 1
+            self.error_sum[cls_id] += error
+            self.oks_sum[cls_id] += oks
+
+    def summary(self) -> dict:
+        '''
+        Per class and overall metrics, over classes with ground truth:
+        AP50, AP (OKS 0.5:0.95), precision and recall at the confidence
+        threshold, mean keypoint error in pixels and mean OKS of matches.
+        '''
+        classes = {}
+        for cls_id in np.flatnonzero(self.num_gt > 0):
+            # Highest score bin first.
+            aps = [
+                _averagePrecision(self.tp_hist[cls_id, t, ::-1], self.fp_hist[cls_id, t, ::-1], self.num_gt[cls_id])
+                for t in range(len(OKS_THRESHOLDS))
+            ]
+            num_tp = int(self.num_tp[cls_id])
+            classes[int(cls_id)] = {
+                'gt': int(self.num_gt[cls_id]),
+                'ap50': aps[0],
+                'ap': float(np.mean(aps)),
+                'precision': num_tp / max(int(self.num_pred[cls_id]), 1),
+                'recall': num_tp / int(self.num_gt[cls_id]),
+                'keypoint_error': self.error_sum[cls_id] / num_tp if num_tp > 0 else None,
+                'oks': self.oks_sum[cls_id] / num_tp if num_tp > 0 else None
+            }
+
+        num_tp = int(self.num_tp.sum())
+        return {
+            'images': self.images,
+            'map50': float(np.mean([c['ap50'] for c in classes.values()])) if classes else 0.0,
+            'map': float(np.mean([c['ap'] for c in classes.values()])) if classes else 0.0,
+            'precision': num_tp / max(int(self.num_pred.sum()), 1),
+            'recall': num_tp / max(int(self.num_gt.sum()), 1),
+            'keypoint_error': float(self.error_sum.sum() / num_tp) if num_tp > 0 else None,
+            'oks': float(self.oks_sum.sum() / num_tp) if num_tp > 0 else None,
+            'classes': classes
+        }
+
+def readErrors(images_folder: str) -> Dict[str, float]:
+    ''' Image filename -> error of the last evaluation, may be empty. '''
+    errors = {}
+    path = os.path.join(images_folder, ERROR_INDEX_FILE)
+    if not os.path.exists(path):
+        return errors
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                errors[entry['file']] = entry['error']
+            except (ValueError, KeyError):
+                continue
+    return errors
@@ -9,10 +9,13 @@ __all__ = [
     'gammaTransformation',
     'relabel',
     'correctLabels',
+    'ContourIndex',
+    'detectArmors',
+    'lightBarEndpoints',
 ]
 
 import os
-from typing import Iterable, List, Tuple, Union
+from typing import Dict, Iterable, List, Tuple, Union
 
 import cv2
 import numpy as np
@@ -122,25 +125,104 @@ def gammaTransformation(img: np.ndarray, gamma: float) -> np.ndarray:
     return cv2.cvtColor(hsv_img, cv2.COLOR_HSV2RGB)
 
 
-def _getCnts(img: np.ndarray) -> List[Tuple[int, int]]:
+def _getCnts(img: np.ndarray, roi: Tuple[int, int, int, int] = None) -> List[np.ndarray]:
+    ''' Contours of bright regions, in `roi` (x0, y0, x1, y1) if given. '''
+    offset = (0, 0)
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        img = img[y0:y1, x0:x1]
+        offset = (x0, y0)
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     _, binary = cv2.threshold(gray, _THRESH, 255, cv2.THRESH_BINARY)
-    cnts, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    cnts, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE, offset=offset)
     return cnts
 
+class ContourIndex:
+    '''
+    Contours of an image, extracted only in regions that were asked for,
+    with a grid of their bounding boxes. Keep one per image, regions are
+    extracted once.
+
+    ContourIndex(img, cell_size=64)
+
+    Methods:
+    * addRegion(x0, y0, x1, y1) -> None
+    * getNearby(pt, radius) -> List[np.ndarray]
+    '''
+    def __init__(self, img: np.ndarray, cell_size: int = 64):
+        self.img = img
+        self.cell_size = cell_size
+        self.cnts: List[np.ndarray] = []
+        self._boxes: List[Tuple[int, int, int, int]] = [] # x0, y0, x1, y1
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._regions: List[Tuple[int, int, int, int]] = []
+
+    def _covered(self, roi: Tuple[int, int, int, int]) -> bool:
+        x0, y0, x1, y1 = roi
+        return any(
+            rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1
+            for rx0, ry0, rx1, ry1 in self._regions
+        )
+
+    def _cells(self, x0: float, y0: float, x1: float, y1: float) -> Iterable[Tuple[int, int]]:
+        c = self.cell_size
+        for cy in range(int(y0 // c), int(y1 // c) + 1):
+            for cx in range(int(x0 // c), int(x1 // c) + 1):
+                yield cx, cy
+
+    def addRegion(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        ''' Extract contours of a region, clipped to the image. '''
+        h, w = self.img.shape[:2]
+        roi = (max(int(x0), 0), max(int(y0), 0), min(int(x1), w), min(int(y1), h))
+        if roi[0] >= roi[2] or roi[1] >= roi[3] or self._covered(roi):
+            return
+        # Most of the image asked for, extract all at once.
+        area = sum((rx1 - rx0) * (ry1 - ry0) for rx0, ry0, rx1, ry1 in self._regions)
+        if area + (roi[2] - roi[0]) * (roi[3] - roi[1]) > w * h / 2:
+            roi = (0, 0, w, h)
+            self.cnts, self._boxes, self._grid = [], [], {}
+
+        for cnt in _getCnts(self.img, roi):
+            bx, by, bw, bh = cv2.boundingRect(cnt)
+            box = (bx, by, bx + bw - 1, by + bh - 1)
+            for cell in self._cells(*box):
+                self._grid.setdefault(cell, []).append(len(self.cnts))
+            self.cnts.append(cnt)
+            self._boxes.append(box)
+        self._regions.append(roi)
+
+    def getNearby(self, pt: Tuple[float, float], radius: float) -> List[np.ndarray]:
+        ''' Contours whose bounding boxes are within `radius` of a point. '''
+        x, y = pt
+        ids = set()
+        for cell in self._cells(x - radius, y - radius, x + radius, y + radius):
+            ids.update(self._grid.get(cell, ()))
+
+        nearby = []
+        for i in sorted(ids):
+            x0, y0, x1, y1 = self._boxes[i]
+            dx = max(x0 - x, 0, x - x1)
+            dy = max(y0 - y, 0, y - y1)
+            if dx * dx + dy * dy < radius * radius:
+                nearby.append(self.cnts[i])
+        return nearby
+
 def _distance(p1, p2):
     dx = p1[0] - p2[0]
     dy = p1[1] - p2[1]
     return dx * dx + dy * dy
 
+# Largest distance from a point to the light bar it is corrected to
+_MAX_CORRECTION = 20
+
 def _verifyPoint(
         pt: Tuple[float, float],
-        cnts: List[Tuple[int, int]]) -> Tuple[float, float]:
+        cnts: List[np.ndarray]) -> Tuple[float, float]:
     min_dis = 1e6
     cnt_id = -1
     for i, cnt in enumerate(cnts):
         res = abs(cv2.pointPolygonTest(cnt, pt, True))
-        if res < 20 and res < min_dis:
+        if res < _MAX_CORRECTION and res < min_dis:
             min_dis = res
             cnt_id = i
 
@@ -158,27 +240,241 @@ def _verifyPoint(
     else:
         return list(light_p2)
 
-def _correctLabelByPoints(img: np.ndarray, points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
-    cnts = _getCnts(img)
-    # Do not correct if no contour found
-    if not cnts:
-        return points
+def _correctLabelByPoints(index: ContourIndex, points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    h, w = index.img.shape[:2]
+    points = [(x * w, y * h) for x, y in points]
+
+    # Light bars are beside the plate, as long as it is high.
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    margin = max(max(xs) - min(xs), max(ys) - min(ys)) / 2 + 2 * _MAX_CORRECTION
+    index.addRegion(min(xs) - margin, min(ys) - margin, max(xs) + margin + 1, max(ys) + margin + 1)
 
-    h, w, ch = img.shape
     verified_points = []
-    for i in range(4):
-        x, y = points[i]
-        x, y = _verifyPoint((x * w, y * h), cnts)
+    for pt in points:
+        # A contour is nearer than its bounding box.
+        x, y = _verifyPoint(pt, index.getNearby(pt, _MAX_CORRECTION))
         verified_points.append((x / w, y / h))
 
     return verified_points
 
-def relabel(img: np.ndarray, original_labels: List[fmt.ArmorLabelIO]) -> List[fmt.ArmorLabelIO]:
-    return original_labels
-
-def correctLabels(img: np.ndarray, labels: List[fmt.ArmorLabelIO]) -> List[fmt.ArmorLabelIO]:
+def relabel(
+    img: np.ndarray,
+    original_labels: List[fmt.ArmorLabelIO],
+    refine: bool = False,
+    max_dist: float = 0.5,
+    load_model: bool = False,
+    fallback: bool = False
+) -> List[fmt.ArmorLabelIO]:
+    '''
+    Add plates found by the active model of `ModelRegistry` that are not
+    labeled yet. Labels are relative to image size.
+
+    Predictions are matched to original labels by keypoint distance, see
+    `matching.matchLabels`. Original labels are always kept with their
+    class, keypoints of matched ones are replaced by predictions only if
+    `refine`. Until the model is loaded only original labels are kept,
+    loading is started if `load_model`, e.g. with `load_network` of the
+    user config. With `fallback`, plates are found by `detectArmors`
+    meanwhile, they have no armor type.
+    '''
+    from .matching import matchLabels
+    from .model_registry import ModelRegistry
+
+    loader = ModelRegistry().getActiveLoader()
+    if loader is not None and loader.isReady():
+        model = loader.get()
+        # Recent candidates are kept by model, relabel again is fast.
+        predictions = model.applyThresholds(model.getCandidates(img))
+    else:
+        if loader is None:
+            ui.logger.warning('No model is selected.')
+        elif load_model:
+            loader.load()
+            ui.logger.warning('Model is loading.')
+        else:
+            ui.logger.warning('Model is not loaded, enable loading network to find new plates.')
+        predictions = detectArmors(img) if fallback else []
+    h, w = img.shape[:2]
+    predictions = [
+        fmt.ArmorLabelIO(lb.cls_id, sortedPoints(lb.kpts))
+        for lb in fmt.normalizeLabels(predictions, w, h)
+    ]
+    labels = [
+        fmt.ArmorLabelIO(lb.cls_id, sortedPoints(lb.kpts))
+        for lb in original_labels
+    ]
+
+    # Matched in pixels, normalized distances depend on aspect ratio.
+    matches = matchLabels(
+        fmt.denormalizeLabels(predictions, w, h),
+        fmt.denormalizeLabels(labels, w, h),
+        max_dist
+    )
+    if refine:
+        for i, j in matches:
+            labels[j].kpts = predictions[i].kpts
+
+    matched = set(i for i, _ in matches)
+    return labels + [lb for i, lb in enumerate(predictions) if i not in matched]
+
+def correctLabels(
+    img: np.ndarray,
+    labels: List[fmt.ArmorLabelIO],
+    index: ContourIndex = None
+) -> List[fmt.ArmorLabelIO]:
+    '''
+    Move keypoints relative to image size to ends of nearby light bars.
+    Contours are extracted around labels only, pass the same `index` for
+    later corrections of the same image to reuse them.
+    '''
+    if index is None:
+        index = ContourIndex(img)
     res = []
     for lb in labels:
-        kpts = _correctLabelByPoints(img, lb.kpts)
+        kpts = _correctLabelByPoints(index, lb.kpts)
         res.append(fmt.ArmorLabelIO(lb.cls_id, kpts))
-    return res
\ No newline at end of file
+    return res
+
+def _getLightBars(
+    img: np.ndarray,
+    cnts: List[np.ndarray],
+    min_length: float,
+    min_aspect: float,
+    max_tilt: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Light bars among contours, endpoints are middles of the short sides
+    of their `minAreaRect`, sorted by y as in `_verifyPoint`.
+
+    Returns:
+        (tops (N, 2), bottoms (N, 2), colors (N,)), color 0 is blue, 1 is red.
+    '''
+    rects = []
+    colors = []
+    h, w = img.shape[:2]
+    for cnt in cnts:
+        # Contour of a bar has at least twice its length of points.
+        if len(cnt) < max(2 * min_length, 5):
+            continue
+        rect = cv2.minAreaRect(cnt)
+        (_, _), (rw, rh), _ = rect
+        if max(rw, rh) < min_length or max(rw, rh) < min_aspect * min(rw, rh):
+            continue
+        # Light bars are overexposed, color is in their halo.
+        x, y, bw, bh = cv2.boundingRect(cnt)
+        b, _, r, _ = cv2.mean(img[max(y-2, 0):min(y+bh+2, h), max(x-2, 0):min(x+bw+2, w)])
+        rects.append(cv2.boxPoints(rect))
+        colors.append(0 if b >= r else 1)
+
+    if len(rects) == 0:
+        empty = np.zeros((0, 2), np.float32)
+        return empty, empty, np.zeros((0,), np.int64)
+
+    corners = np.array(rects, np.float32) # (N, 4, 2)
+    corners = np.take_along_axis(corners, np.argsort(corners[..., 1], axis=1)[..., None], axis=1)
+    tops = corners[:, :2].mean(axis=1)
+    bottoms = corners[:, 2:].mean(axis=1)
+
+    d = bottoms - tops
+    tilts = np.degrees(np.arctan2(np.abs(d[:, 0]), d[:, 1]))
+    keep = tilts <= max_tilt
+    return tops[keep], bottoms[keep], np.array(colors)[keep]
+
+def detectArmors(
+    img: np.ndarray,
+    armor_type: int = 0,
+    min_length: float = 6.0,
+    min_aspect: float = 1.5,
+    max_tilt: float = 40.0,
+    min_length_ratio: float = 0.6,
+    max_angle_diff: float = 10.0,
+    min_distance: float = 0.8,
+    max_distance: float = 5.0,
+    max_pair_tilt: float = 30.0
+) -> List[fmt.ArmorLabelIO]:
+    '''
+    Classical armor detector, pairs light bars without a network. Labels
+    are in pixels like `PoseModel.inference`.
+
+    Bars are found by `_getCnts` thresholding, pairs of the same color
+    are kept if their lengths ratio is above `min_length_ratio`, their
+    angles differ less than `max_angle_diff` degrees, their distance is
+    `min_distance` to `max_distance` times their mean length, the line
+    between them tilts less than `max_pair_tilt` degrees, and no other bar
+    is between them. Each bar is used by its best pair only.
+
+    The number on a plate is not recognized, class is `armor_type` of the
+    bar color, e.g. 0 for BG and 8 for RG.
+    '''
+    tops, bottoms, colors = _getLightBars(img, _getCnts(img), min_length, min_aspect, max_tilt)
+    n = len(tops)
+    if n < 2:
+        return []
+
+    centers = (tops + bottoms) / 2
+    d = bottoms - tops
+    lengths = np.linalg.norm(d, axis=1)
+    angles = np.degrees(np.arctan2(d[:, 0], d[:, 1])) # signed tilt from vertical
+
+    i, j = np.triu_indices(n, 1)
+    mean_lengths = (lengths[i] + lengths[j]) / 2
+    length_ratios = np.minimum(lengths[i], lengths[j]) / np.maximum(lengths[i], lengths[j])
+    angle_diffs = np.abs(angles[i] - angles[j])
+    offsets = centers[j] - centers[i]
+    distances = np.linalg.norm(offsets, axis=1) / mean_lengths
+    pair_tilts = np.degrees(np.arctan2(np.abs(offsets[:, 1]), np.abs(offsets[:, 0])))
+
+    valid = (colors[i] == colors[j]) \
+        & (length_ratios >= min_length_ratio) \
+        & (angle_diffs <= max_angle_diff) \
+        & (distances >= min_distance) & (distances <= max_distance) \
+        & (pair_tilts <= max_pair_tilt)
+    i, j = i[valid], j[valid]
+    if len(i) == 0:
+        return []
+
+    # A plate has no light bar in between.
+    pts = np.stack([tops[i], bottoms[i], tops[j], bottoms[j]], axis=1) # (P, 4, 2)
+    box_min, box_max = pts.min(axis=1), pts.max(axis=1)
+    inside = ((centers[None] > box_min[:, None]) & (centers[None] < box_max[:, None])).all(axis=-1)
+    inside[np.arange(len(i)), i] = False
+    inside[np.arange(len(i)), j] = False
+    clear = ~inside.any(axis=1)
+    i, j = i[clear], j[clear]
+
+    # Better pairs first: parallel, similar length and level.
+    scores = angle_diffs[valid][clear] / max_angle_diff \
+        + (1 - length_ratios[valid][clear]) \
+        + pair_tilts[valid][clear] / max_pair_tilt
+
+    used = np.zeros((n,), bool)
+    labels = []
+    for k in np.argsort(scores, kind='stable'):
+        a, b = i[k], j[k]
+        if used[a] or used[b]:
+            continue
+        used[a] = used[b] = True
+        left, right = (a, b) if centers[a, 0] < centers[b, 0] else (b, a)
+        kpts = [tops[left], bottoms[left], bottoms[right], tops[right]] # lt, lb, rb, rt
+        labels.append(fmt.ArmorLabelIO(
+            int(colors[a]) * 8 + armor_type,
+            [(float(x), float(y)) for x, y in kpts]
+        ))
+    return labels
+
+def lightBarEndpoints(
+    img: np.ndarray,
+    min_length: float = 4.0,
+    min_aspect: float = 1.5,
+    max_tilt: float = 60.0
+) -> np.ndarray:
+    '''
+    Ends of light bars, where keypoints of plates are. Bars are found as
+    in `detectArmors` with looser limits.
+
+    Returns:
+        (N, 2) points in pixels.
+    '''
+    tops, bottoms, _ = _getLightBars(img, _getCnts(img), min_length, min_aspect, max_tilt)
+    return np.concatenate([tops, bottoms]).reshape(-1, 2)
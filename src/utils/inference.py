@@ -1,125 +1,747 @@
-from typing import List, Tuple
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+from typing import (Iterable, Iterator, List, NamedTuple, Tuple, Type,
+                    Union)
 
 import cv2
 import numpy as np
 
-from .lbformat import ArmorLabelIO
+from .. import pygame_gui as ui
+from .backend import Backend, createBackend
+from .detection_cache import DetectionCache, hashFile
+from .lbformat import ArmorLabelIO, LabelIO
+from .nms import nms
 
 
+class Candidates(NamedTuple):
+    ''' Pre-NMS candidates of one image, keypoints are in source image pixels. '''
+    class_ids: np.ndarray # (N,) int
+    scores: np.ndarray    # (N,) float32
+    boxes: np.ndarray     # (N, 4) float64, [x, y, w, h]
+    keypoints: np.ndarray # (N, num_keypoints, 2) float32
+    img_w: int
+    img_h: int
+
+def getTiles(
+    img_w: int, img_h: int,
+    tile_size: int,
+    overlap: float
+) -> List[Tuple[int, int, int, int]]:
+    '''
+    Overlapping tiles covering an image, evenly spread so the last tile
+    ends at the border.
+
+    Returns:
+        List[(x0, y0, x1, y1)]
+    '''
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        step = max(1, int(tile_size * (1 - overlap)))
+        n = -(-(length - tile_size) // step) + 1
+        return [round(i * (length - tile_size) / (n - 1)) for i in range(n)]
+
+    return [
+        (x, y, min(x + tile_size, img_w), min(y + tile_size, img_h))
+        for y in starts(img_h) for x in starts(img_w)
+    ]
+
+def readFrames(cap: cv2.VideoCapture) -> Iterator[np.ndarray]:
+    ''' Frames of a video capture until it ends. '''
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame
+
+# Marks the end of a stream in pipeline queues.
+_END = object()
+
+# Preprocessing buffers kept per kind, input shapes change every call
+# with `rect` and regions.
+_BUFFER_CAPACITY = 4
+
+def _reuseBuffer(
+    buffers: 'OrderedDict[tuple, np.ndarray]',
+    key: tuple,
+    shape: Tuple[int, ...],
+    dtype: type
+) -> np.ndarray:
+    ''' Buffer of `key`, created if missing, least recently used ones are dropped. '''
+    buffer = buffers.get(key)
+    if buffer is None:
+        buffer = np.empty(shape, dtype=dtype)
+        buffers[key] = buffer
+        while len(buffers) > _BUFFER_CAPACITY:
+            buffers.popitem(last=False)
+    else:
+        buffers.move_to_end(key)
+    return buffer
+
+class _StageError(NamedTuple):
+    ''' Exception raised in a pipeline stage, passed on to the consumer. '''
+    error: BaseException
+
+class _Stopped(Exception):
+    ''' The consumer stopped the pipeline. '''
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+    raise _Stopped()
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    raise _Stopped()
+
+def _drain(q: queue.Queue, stop: threading.Event) -> Iterator:
+    ''' Items of a pipeline queue until its end, stage errors are raised. '''
+    while True:
+        item = _get(q, stop)
+        if item is _END:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+def _runStage(items: Iterable, sink: queue.Queue, stop: threading.Event) -> None:
+    ''' Put all items of a stage into its output queue, in a thread. '''
+    try:
+        for item in items:
+            _put(sink, item, stop)
+        _put(sink, _END, stop)
+    except _Stopped:
+        pass
+    except BaseException as e:
+        try:
+            _put(sink, _StageError(e), stop)
+        except _Stopped:
+            pass
+
 class PoseModel:
+    '''
+    PoseModel(
+        model_path,
+        img_size,
+        num_classes,
+        num_keypoints,
+        confidence_thresh,
+        nms_thresh,
+        label_type,
+        cache,
+        candidate_thresh,
+        candidate_capacity,
+        rect,
+        stride,
+        backend,
+        num_threads,
+        inter_op_threads,
+        class_aware_nms,
+        quad_nms,
+        server
+    )
+
+    Pre-NMS candidates above `candidate_thresh` of the latest
+    `candidate_capacity` images are kept, so thresholds can be changed
+    without running the network again.
+
+    With `rect` on, images are padded only to the next multiple of
+    `stride` instead of a square, which needs a model with dynamic input
+    shape. It falls back to square letterbox for fixed-shape models.
+
+    `backend` is a name in `backend.BACKENDS` or a Backend object, thread
+    counts are passed to the backend.
+
+    NMS is done per class if `class_aware_nms`, so overlapping plates of
+    different colors are all kept. With `quad_nms` on, IoU is computed on
+    keypoint quadrilaterals instead of their bounding boxes.
+
+    If `server` is the address of a running InferenceServer with the same
+    model, forward passes are sent to it and batched with other clients.
+    The model runs locally if there is no such server, or it goes away.
+
+    Methods:
+    * inference(img, confidence_thresh, nms_thresh, cache) -> List[LabelIO]
+    * inferenceBatch(images, confidence_thresh, nms_thresh, cache) -> List[List[LabelIO]]
+    * inferenceTiled(img, tile_size, overlap, include_full, confidence_thresh, nms_thresh) -> List[LabelIO]
+    * inferenceRegions(img, regions, upscale, confidence_thresh, nms_thresh) -> List[LabelIO]
+    * inferenceStream(frames, batch_size, queue_size) -> Iterator[(int, List[LabelIO])]
+    * getCandidates(img) -> Candidates
+    * applyThresholds(candidates, confidence_thresh, nms_thresh) -> List[LabelIO]
+    * setThresholds(confidence_thresh, nms_thresh) -> None
+    * warmup() -> None
+    '''
     def __init__(self,
         model_path: str,
         img_size: Tuple[int, int] = (640, 640),
         num_classes: int = 16,
         num_keypoints: int = 4, 
         confidence_thresh: float = 0.2,
-        nms_thresh: float = 0.2
+        nms_thresh: float = 0.2,
+        label_type: Type[LabelIO] = ArmorLabelIO,
+        cache: DetectionCache = None,
+        candidate_thresh: float = 0.05,
+        candidate_capacity: int = 256,
+        rect: bool = False,
+        stride: int = 32,
+        backend: Union[str, Backend] = 'opencv',
+        num_threads: int = None,
+        inter_op_threads: int = None,
+        class_aware_nms: bool = True,
+        quad_nms: bool = False,
+        server: str = None
     ):
         self.img_size = img_size
         self.num_classes = num_classes
         self.num_keypoints = num_keypoints
         self.confidence_thresh = confidence_thresh
         self.nms_thresh = nms_thresh
+        self.label_type = label_type
+        self.class_aware_nms = class_aware_nms
+        self.quad_nms = quad_nms
 
-        self.net = cv2.dnn.readNetFromONNX(model_path)
-        self.letterbox_scale = 1.0
+        self.cache = cache
+        self.candidate_thresh = candidate_thresh
+        self.candidate_capacity = candidate_capacity
+        self._candidates: 'OrderedDict[str, Candidates]' = OrderedDict()
+        self._candidates_lock = threading.Lock()
 
-    def inference(self, img: np.ndarray) -> List[ArmorLabelIO]:
-        letterbox_img = self._letterbox(img)
+        self.rect = rect
+        self.stride = stride
+        # Output anchors per input pixel, used to detect fixed-shape models.
+        self._anchors_per_pixel: float = None
 
-        blob = self._blob_from_image(letterbox_img)
-        self.net.setInput(blob)
-        output_buffer = self.net.forward()
+        # Preprocessing buffers, reused between calls.
+        self._input_buffers: 'OrderedDict[Tuple[int, int], np.ndarray]' = OrderedDict()
+        self._blob_buffers: 'OrderedDict[Tuple[int, ...], np.ndarray]' = OrderedDict()
+        self._forward_lock = threading.Lock()
 
-        class_ids, class_scores, boxes, objects_keypoints = self._read_from_output_buffer(output_buffer)
+        self.model_hash = hashFile(model_path)
+        self._backend_args = (backend, model_path, num_threads, inter_op_threads)
+        self.backend: Backend = None
+        self.client = None
+        if server is not None:
+            from .inference_server import connectServer
+            self.client = connectServer(server, self)
+        if self.client is None:
+            self._createBackend()
 
-        indices = cv2.dnn.NMSBoxes(boxes, class_scores, self.confidence_thresh, self.nms_thresh)
+    def _createBackend(self) -> None:
+        backend, model_path, num_threads, inter_op_threads = self._backend_args
+        if isinstance(backend, Backend):
+            self.backend = backend
+        else:
+            self.backend = createBackend(
+                backend, model_path,
+                num_threads=num_threads,
+                inter_op_threads=inter_op_threads
+            )
 
-        results = []
-        for i in indices:
-            class_id = class_ids[i]
-            keypoints = self._get_keypoints(objects_keypoints[i])
+    def _imageKey(self, img: np.ndarray) -> str:
+        ''' Key of image content, model and letterbox. '''
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f'{self.model_hash} {self.img_size} {self.rect} {self.stride} {img.shape} {img.dtype}'.encode())
+        h.update(np.ascontiguousarray(img).data)
+        return h.hexdigest()
 
-            keypoints = self._clip_keypoints(keypoints, img.shape[1], img.shape[0])
+    def _cacheKey(self, image_key: str, confidence_thresh: float = None, nms_thresh: float = None) -> str:
+        ''' Image key with every threshold affecting results, model thresholds if not given. '''
+        if confidence_thresh is None:
+            confidence_thresh = self.confidence_thresh
+        if nms_thresh is None:
+            nms_thresh = self.nms_thresh
+        key = f'{image_key} {confidence_thresh} {nms_thresh} ' \
+            f'{self.class_aware_nms} {self.quad_nms}'
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
 
-            results.append(ArmorLabelIO(class_id, keypoints))
+    def _getRecentCandidates(self, image_key: str) -> Union[Candidates, None]:
+        with self._candidates_lock:
+            candidates = self._candidates.get(image_key)
+            if candidates is not None:
+                self._candidates.move_to_end(image_key)
+            return candidates
+
+    def _rememberCandidates(self, image_key: str, candidates: Candidates) -> None:
+        with self._candidates_lock:
+            self._candidates[image_key] = candidates
+            self._candidates.move_to_end(image_key)
+            while len(self._candidates) > self.candidate_capacity:
+                self._candidates.popitem(last=False)
+
+    def setThresholds(self, confidence_thresh: float = None, nms_thresh: float = None) -> None:
+        if confidence_thresh is not None:
+            self.confidence_thresh = confidence_thresh
+        if nms_thresh is not None:
+            self.nms_thresh = nms_thresh
+
+    def warmup(self) -> None:
+        ''' Run a dummy forward pass, the first forward pass is much slower. '''
+        dummy = np.zeros((self.img_size[1], self.img_size[0], 3), dtype=np.uint8)
+        self._forwardBatch([dummy])
+
+    def inference(self,
+        img: np.ndarray,
+        confidence_thresh: float = None,
+        nms_thresh: float = None,
+        cache: DetectionCache = None
+    ) -> List[LabelIO]:
+        return self.inferenceBatch([img], confidence_thresh, nms_thresh, cache)[0]
+
+    def inferenceBatch(self,
+        images: List[np.ndarray],
+        confidence_thresh: float = None,
+        nms_thresh: float = None,
+        cache: DetectionCache = None
+    ) -> List[List[LabelIO]]:
+        '''
+        Run all images through the network in a single forward pass. Images
+        found in cache or in recent candidates skip the network.
+
+        Thresholds and cache default to those of the model. A model shared
+        by several consumers is not changed by passing their own.
+
+        Returns:
+            List[List[LabelIO]], one list of labels for each image.
+        '''
+        if cache is None:
+            cache = self.cache
+        def apply(candidates: Candidates) -> List[LabelIO]:
+            return self.applyThresholds(candidates, confidence_thresh, nms_thresh)
+
+        if cache is None and self.candidate_capacity <= 0:
+            return [apply(c) for c in self._forwardBatch(images)]
+
+        image_keys = [self._imageKey(img) for img in images]
+        results: List[List[LabelIO]] = [None] * len(images)
+        missed = []
+        for i, image_key in enumerate(image_keys):
+            if cache is not None:
+                results[i] = cache.get(self._cacheKey(image_key, confidence_thresh, nms_thresh), self.label_type)
+            if results[i] is not None:
+                continue
+
+            candidates = self._getRecentCandidates(image_key)
+            if candidates is not None:
+                results[i] = apply(candidates)
+            else:
+                missed.append(i)
+
+        missed_candidates = self._forwardBatch([images[i] for i in missed])
+        for i, candidates in zip(missed, missed_candidates):
+            if self.candidate_capacity > 0:
+                self._rememberCandidates(image_keys[i], candidates)
+            results[i] = apply(candidates)
+            if cache is not None:
+                cache.put(self._cacheKey(image_keys[i], confidence_thresh, nms_thresh), results[i])
 
         return results
 
-    def _letterbox(self, source: np.ndarray) -> np.ndarray:
+    def inferenceTiled(self,
+        img: np.ndarray,
+        tile_size: int = None,
+        overlap: float = 0.2,
+        include_full: bool = True,
+        confidence_thresh: float = None,
+        nms_thresh: float = None
+    ) -> List[LabelIO]:
+        '''
+        Cut image into overlapping tiles of `tile_size` (default: network
+        input size, i.e. native resolution) and run them as one batch, so
+        small far targets are not shrunk away. Duplicates across tiles are
+        merged by NMS. With `include_full`, the whole image is in the batch
+        too, for targets larger than a tile. Results are not cached.
+        '''
+        if tile_size is None:
+            tile_size = max(self.img_size)
+        img_h, img_w = img.shape[:2]
+
+        tiles = getTiles(img_w, img_h, tile_size, overlap)
+        if include_full and len(tiles) > 1:
+            tiles.append((0, 0, img_w, img_h))
+        return self.inferenceRegions(img, tiles, True, confidence_thresh, nms_thresh)
+
+    def inferenceRegions(self,
+        img: np.ndarray,
+        regions: List[Tuple[int, int, int, int]],
+        upscale: bool = False,
+        confidence_thresh: float = None,
+        nms_thresh: float = None
+    ) -> List[LabelIO]:
+        '''
+        Run regions (x0, y0, x1, y1) of an image as one batch, results are
+        merged by NMS in image coordinates. Without `upscale`, regions
+        smaller than the network input run at native resolution, and in
+        `rect` mode the network input is only as large as the regions.
+        Results are not cached.
+        '''
+        img_h, img_w = img.shape[:2]
+        if len(regions) == 0:
+            return []
+
+        crops = [img[y0:y1, x0:x1] for x0, y0, x1, y1 in regions]
+        region_candidates = self._forwardBatch(crops, upscale)
+        offsets = [np.array([x0, y0], dtype=np.float32) for x0, y0, _, _ in regions]
+        candidates = Candidates(
+            np.concatenate([c.class_ids for c in region_candidates]),
+            np.concatenate([c.scores for c in region_candidates]),
+            np.concatenate([
+                c.boxes + np.concatenate([offset, (0, 0)])
+                for c, offset in zip(region_candidates, offsets)
+            ]),
+            np.concatenate([
+                c.keypoints + offset
+                for c, offset in zip(region_candidates, offsets)
+            ]),
+            img_w, img_h
+        )
+        return self.applyThresholds(candidates, confidence_thresh, nms_thresh)
+
+    def inferenceStream(self,
+        frames: Union[Iterable[np.ndarray], cv2.VideoCapture],
+        batch_size: int = 1,
+        queue_size: int = 4
+    ) -> Iterator[Tuple[int, List[LabelIO]]]:
+        '''
+        Pipelined inference of a frame stream, e.g. a whole match video.
+        Reading with letterbox, forward pass, and decoding with NMS run in
+        three threads connected by queues of `queue_size` batches. OpenCV
+        releases the GIL, so the stages overlap. Results are not cached.
+
+        Yields:
+            (frame index, labels) in frame order.
+        '''
+        if isinstance(frames, cv2.VideoCapture):
+            frames = readFrames(frames)
+        frames = iter(frames)
+
+        if self.client is not None:
+            # The server batches frames with other requests itself.
+            for index, frame in enumerate(frames):
+                yield index, self.applyThresholds(self._forwardBatch([frame])[0])
+            return
+
+        start = 0
+        if self.rect:
+            # Rect input may fall back to square, find out before the
+            # pipeline fixes input sizes.
+            first = next(frames, None)
+            if first is None:
+                return
+            yield 0, self.applyThresholds(self._forwardBatch([first])[0])
+            start = 1
+
+        stop = threading.Event()
+        # Free blob buffers, a batch holds one until its forward pass ends.
+        blobs = queue.Queue()
+        for _ in range(queue_size + 2):
+            blobs.put(None)
+        forward_queue = queue.Queue(queue_size)
+        decode_queue = queue.Queue(queue_size)
+        output_queue = queue.Queue(queue_size * batch_size)
+
+        def preprocess() -> Iterator:
+            input_buffers = OrderedDict()
+            index = start
+            while True:
+                batch = [frame for _, frame in zip(range(batch_size), frames)]
+                if len(batch) == 0:
+                    return
+                input_size = self._inputSize(batch)
+                shape = (len(batch), 3, input_size[1], input_size[0])
+                blob = _get(blobs, stop)
+                if blob is None or blob.shape != shape:
+                    blob = np.empty(shape, dtype=np.float32)
+                _, scales = self._preprocess(batch, input_size, blob, input_buffers)
+                sizes = [(frame.shape[1], frame.shape[0]) for frame in batch]
+                yield index, blob, scales, sizes
+                index += len(batch)
+
+        def forward() -> Iterator:
+            for index, blob, scales, sizes in _drain(forward_queue, stop):
+                with self._forward_lock:
+                    output_buffer = self.backend.forward(blob)
+                blobs.put(blob)
+                yield index, output_buffer, scales, sizes
+
+        def decode() -> Iterator:
+            for index, output_buffer, scales, sizes in _drain(decode_queue, stop):
+                for i, (scale, (img_w, img_h)) in enumerate(zip(scales, sizes)):
+                    candidates = Candidates(
+                        *self._read_from_output_buffer(output_buffer[i], scale, self.confidence_thresh),
+                        img_w, img_h
+                    )
+                    yield index + i, self.applyThresholds(candidates)
+
+        threads = [
+            threading.Thread(target=_runStage, args=(stage(), sink, stop), daemon=True)
+            for stage, sink in [
+                (preprocess, forward_queue),
+                (forward, decode_queue),
+                (decode, output_queue)
+            ]
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            yield from _drain(output_queue, stop)
+        finally:
+            # Also reached if the consumer stops early.
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def getCandidates(self, img: np.ndarray) -> Candidates:
+        ''' Pre-NMS candidates of an image, from recent images if possible. '''
+        image_key = self._imageKey(img)
+        candidates = self._getRecentCandidates(image_key)
+        if candidates is None:
+            candidates = self._forwardBatch([img])[0]
+            if self.candidate_capacity > 0:
+                self._rememberCandidates(image_key, candidates)
+        return candidates
+
+    def applyThresholds(self,
+        candidates: Candidates,
+        confidence_thresh: float = None,
+        nms_thresh: float = None
+    ) -> List[LabelIO]:
+        '''
+        Filter candidates by confidence and NMS, model thresholds are used
+        if not given. Confidence lower than `candidate_thresh` has no effect
+        on candidates kept from earlier calls.
+        '''
+        if confidence_thresh is None:
+            confidence_thresh = self.confidence_thresh
+        if nms_thresh is None:
+            nms_thresh = self.nms_thresh
+
+        indices = nms(
+            candidates.boxes, candidates.scores, nms_thresh, confidence_thresh,
+            class_ids=candidates.class_ids if self.class_aware_nms else None,
+            keypoints=candidates.keypoints if self.quad_nms else None
+        )
+
+        keypoints = self._clip_keypoints(candidates.keypoints[indices], candidates.img_w, candidates.img_h)
+
+        return [
+            self.label_type(int(class_id), [tuple(pt) for pt in kpts.tolist()])
+            for class_id, kpts in zip(candidates.class_ids[indices], keypoints)
+        ]
+
+    def _forwardBatch(self,
+        images: List[np.ndarray],
+        upscale: bool = True,
+        score_thresh: float = None
+    ) -> List[Candidates]:
+        '''
+        Pre-NMS candidates of images. Without `upscale`, images smaller than
+        the network input keep their resolution.
+        '''
+        if len(images) == 0:
+            return []
+
+        if score_thresh is None:
+            score_thresh = min(self.candidate_thresh, self.confidence_thresh)
+
+        client = self.client
+        if client is not None:
+            try:
+                return client.candidates(images, upscale, score_thresh)
+            except (OSError, RuntimeError):
+                ui.logger.warning('Inference server failed, run the model locally.', self)
+                self.client = None
+                client.close()
+
+        # Buffers and network are shared, one forward pass at a time.
+        with self._forward_lock:
+            if self.backend is None:
+                self._createBackend()
+            input_size = self._inputSize(images, upscale)
+            output_buffer, letterbox_scales = self._forward(images, input_size, upscale)
+
+        return [
+            Candidates(
+                *self._read_from_output_buffer(output_buffer[i], letterbox_scales[i], score_thresh),
+                img.shape[1], img.shape[0]
+            ) for i, img in enumerate(images)
+        ]
+
+    def _forward(self,
+        images: List[np.ndarray],
+        input_size: Tuple[int, int],
+        upscale: bool = True
+    ) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+        blob, scales = self._preprocess(images, input_size, upscale=upscale)
+        output_buffer = self._forwardBlob(blob)
+        if output_buffer is not None:
+            return output_buffer, scales
+
+        ui.logger.warning('Model input shape is fixed, use square letterbox.', self)
+        self.rect = False
+        return self._forward(images, tuple(self.img_size), upscale)
+
+    def _forwardBlob(self, blob: np.ndarray) -> Union[np.ndarray, None]:
+        ''' Raw output of a blob, None if the network rejects a rect input shape. '''
+        net_h, net_w = blob.shape[2:]
+        if (net_w, net_h) == tuple(self.img_size):
+            output_buffer = self.backend.forward(blob)
+            self._anchors_per_pixel = output_buffer.shape[-1] / (net_w * net_h)
+            return output_buffer
+
+        try:
+            output_buffer = self.backend.forward(blob)
+        except Exception: # raised by backend
+            return None
+        if self._anchors_per_pixel is not None and \
+            abs(output_buffer.shape[-1] - self._anchors_per_pixel * net_w * net_h) >= 0.5:
+            return None
+        return output_buffer
+
+    def _inputSize(self, images: List[np.ndarray], upscale: bool = True) -> Tuple[int, int]:
+        ''' Network input (w, h) of a batch. '''
+        if not self.rect:
+            return tuple(self.img_size)
+
+        net_w, net_h = 0, 0
+        for img in images:
+            w, h = self._resizedSize(img, self.img_size, upscale)
+            net_w = max(net_w, -(-w // self.stride) * self.stride)
+            net_h = max(net_h, -(-h // self.stride) * self.stride)
+        return net_w, net_h
+
+    def _resizedSize(self,
+        source: np.ndarray,
+        input_size: Tuple[int, int],
+        upscale: bool = True
+    ) -> Tuple[int, int]:
+        '''
+        Source size after its longer side is resized to `img_size`, only
+        shrinked if not `upscale`.
+        '''
         h, w = source.shape[:2]
-        _max = max(w, h)
-        result = np.full((_max, _max, 3), 114, dtype=np.uint8)
-        result[:h, :w] = source
-        self.letterbox_scale = _max / max(self.img_size)
-        return result
-
-    def _blob_from_image(self, image: np.ndarray) -> np.ndarray:
-        resized = cv2.resize(image, self.img_size)
-        return cv2.dnn.blobFromImage(
-            resized, 
-            scalefactor=1/255.0, 
-            size=self.img_size,
-            swapRB=True,  # BGR to RGB
-            crop=False
+        scale = max(w, h) / max(self.img_size)
+        if not upscale:
+            scale = max(scale, 1.0)
+        return (
+            min(input_size[0], max(1, round(w / scale))),
+            min(input_size[1], max(1, round(h / scale)))
         )
 
-    def _read_from_output_buffer(self, output_buffer):
-        output_buffer = np.squeeze(output_buffer).T
-        class_range = [4, 4 + self.num_classes]
-        kpts_range = [4 + self.num_classes, 4 + self.num_classes + 2 * self.num_keypoints]
-
-        class_ids = []
-        class_scores = []
-        boxes = []
-        objects_keypoints = []
-
-        for i in range(output_buffer.shape[0]):
-            classes_scores = output_buffer[i, class_range[0]:class_range[1]]
-            max_score = np.max(classes_scores)
-
-            if max_score > self.confidence_thresh:
-                class_id = np.argmax(classes_scores)
-
-                keypoints = []
-                kpts = output_buffer[i, kpts_range[0]:kpts_range[1]]
-                for j in range(self.num_keypoints):
-                    x = kpts[j * 2] * self.letterbox_scale
-                    y = kpts[j * 2 + 1] * self.letterbox_scale
-                    keypoints.extend([x, y])
-
-                box = self._kpts_to_bbox(keypoints)
-
-                class_ids.append(class_id)
-                class_scores.append(float(max_score))
-                boxes.append(box)
-                objects_keypoints.append(keypoints)
-
-        return class_ids, class_scores, boxes, objects_keypoints
-
-    def _kpts_to_bbox(self, keypoints):
-        xs = keypoints[0::2]
-        ys = keypoints[1::2]
-
-        x_min = np.min(xs)
-        y_min = np.min(ys)
-        x_max = np.max(xs)
-        y_max = np.max(ys)
-
-        return [x_min, y_min, x_max - x_min, y_max - y_min]
-
-    def _get_keypoints(self, keypoints_flat):
-        keypoints = []
-        for j in range(self.num_keypoints):
-            x = keypoints_flat[2 * j]
-            y = keypoints_flat[2 * j + 1]
-            keypoints.append((x, y))
-        return keypoints
-
-    def _clip_keypoints(self, keypoints, img_w, img_h):
-        clipped = []
-        for pt in keypoints:
-            x = max(0, min(float(pt[0]), img_w - 1))
-            y = max(0, min(float(pt[1]), img_h - 1))
-            clipped.append((x, y))
-        return clipped
\ No newline at end of file
+    def _getBlobBuffer(self, shape: Tuple[int, ...]) -> np.ndarray:
+        return _reuseBuffer(self._blob_buffers, shape, shape, np.float32)
+
+    def _letterbox(self,
+        source: np.ndarray,
+        input_size: Tuple[int, int],
+        input_buffers: 'OrderedDict[Tuple[int, int], np.ndarray]' = None,
+        upscale: bool = True
+    ) -> Tuple[np.ndarray, Tuple[float, float]]:
+        '''
+        Resize source straight into the top left of a padded network input
+        buffer of `input_size`, keeping its aspect ratio. Buffers are taken
+        from `input_buffers`, model buffers by default.
+
+        Returns:
+            (input buffer, (x, y) scales from network input to source)
+        '''
+        if input_buffers is None:
+            input_buffers = self._input_buffers
+        net_w, net_h = input_size
+        buffer = _reuseBuffer(input_buffers, (net_w, net_h), (net_h, net_w, 3), np.uint8)
+
+        h, w = source.shape[:2]
+        resized_w, resized_h = self._resizedSize(source, input_size, upscale)
+
+        cv2.resize(source, (resized_w, resized_h), dst=buffer[:resized_h, :resized_w])
+        buffer[:resized_h, resized_w:] = 114
+        buffer[resized_h:] = 114
+        return buffer, (w / resized_w, h / resized_h)
+
+    def _preprocess(self,
+        images: List[np.ndarray],
+        input_size: Tuple[int, int],
+        blob: np.ndarray = None,
+        input_buffers: 'OrderedDict[Tuple[int, int], np.ndarray]' = None,
+        upscale: bool = True
+    ) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+        '''
+        Letterbox images into a NCHW blob, scaled to [0, 1] and converted
+        from BGR to RGB. Both blob and input buffer are reused, model
+        buffers are used if not given.
+        '''
+        net_w, net_h = input_size
+        if blob is None:
+            blob = self._getBlobBuffer((len(images), 3, net_h, net_w))
+        scales = []
+        for i, img in enumerate(images):
+            letterbox_img, scale = self._letterbox(img, input_size, input_buffers, upscale)
+            self._fillBlob(blob[i], letterbox_img)
+            scales.append(scale)
+        return blob, scales
+
+    def _fillBlob(self, blob: np.ndarray, image: np.ndarray) -> None:
+        ''' HWC BGR uint8 image to CHW RGB float blob in [0, 1]. '''
+        for ch in range(3):
+            np.multiply(image[..., 2 - ch], np.float32(1 / 255.0), out=blob[ch])
+
+    def _read_from_output_buffer(self,
+        output_buffer: np.ndarray,
+        letterbox_scale: Union[float, Tuple[float, float]],
+        score_thresh: float
+    ) -> Tuple[
+        np.ndarray, np.ndarray, np.ndarray, np.ndarray
+    ]:
+        '''
+        Decode candidates from raw network output.
+
+        Output rows are laid out as [box(4), class scores(num_classes),
+        keypoints(2 * num_keypoints)], one column per anchor. Keypoints are
+        scaled back to source image by `letterbox_scale`, a
+        scale of both axes or (x, y) scales,
+        only rows scoring above `score_thresh` are kept.
+
+        Returns:
+            class_ids: (N,) int
+            class_scores: (N,) float32
+            boxes: (N, 4) float64, [x, y, w, h]
+            keypoints: (N, num_keypoints, 2) float32
+        '''
+        output_buffer = np.asarray(output_buffer)
+        output_buffer = output_buffer.reshape(output_buffer.shape[-2:]).T
+        class_start = 4
+        kpts_start = class_start + self.num_classes
+        kpts_end = kpts_start + 2 * self.num_keypoints
+
+        scores = output_buffer[:, class_start:kpts_start]
+        max_scores = scores.max(axis=1)
+        mask = max_scores > score_thresh
+
+        class_ids = scores[mask].argmax(axis=1)
+        class_scores = max_scores[mask].astype(np.float32)
+        keypoints = output_buffer[mask, kpts_start:kpts_end].reshape(-1, self.num_keypoints, 2)
+        keypoints = keypoints * np.asarray(letterbox_scale, dtype=np.float32)
+        boxes = self._kpts_to_bbox(keypoints)
+
+        return class_ids, class_scores, boxes, keypoints
+
+    def _kpts_to_bbox(self, keypoints: np.ndarray) -> np.ndarray:
+        ''' (N, num_keypoints, 2) -> (N, 4) boxes of [x, y, w, h] '''
+        pt_min = keypoints.min(axis=1)
+        pt_max = keypoints.max(axis=1)
+        return np.concatenate([pt_min, pt_max - pt_min], axis=1).astype(np.float64)
+
+    def _clip_keypoints(self, keypoints: np.ndarray, img_w: int, img_h: int) -> np.ndarray:
+        clipped = np.empty(keypoints.shape, dtype=np.float64)
+        np.clip(keypoints[..., 0], 0, img_w - 1, out=clipped[..., 0])
+        np.clip(keypoints[..., 1], 0, img_h - 1, out=clipped[..., 1])
+        return clipped
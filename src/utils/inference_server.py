@@ -0,0 +1,401 @@
+'''
+Local inference server sharing one PoseModel between processes.
+
+Requests arriving within a short window are batched into one forward
+pass. Messages are a JSON header followed by raw arrays:
+
+    [header length: uint32][payload length: uint32][header][payload]
+
+where header['arrays'] lists (dtype, shape) of arrays in the payload.
+'''
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from .. import pygame_gui as ui
+from .inference import Candidates, PoseModel
+from .lbformat import ArmorLabelIO, LabelIO
+
+DEFAULT_ADDRESS = '127.0.0.1:50751'
+
+def parseAddress(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    '''
+    'unix:/path/to/socket' or 'host:port' -> (socket family, address)
+    '''
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+def _recvExact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('Connection closed.')
+        received += n
+    return bytes(buffer)
+
+def sendMessage(sock: socket.socket, header: dict, arrays: List[np.ndarray] = ()) -> None:
+    arrays = [np.ascontiguousarray(arr) for arr in arrays]
+    header = dict(header, arrays=[(arr.dtype.str, arr.shape) for arr in arrays])
+    header_bytes = json.dumps(header).encode()
+    payload_size = sum(arr.nbytes for arr in arrays)
+    sock.sendall(struct.pack('!II', len(header_bytes), payload_size) + header_bytes)
+    for arr in arrays:
+        sock.sendall(memoryview(arr).cast('B'))
+
+def recvMessage(sock: socket.socket) -> Tuple[dict, List[np.ndarray]]:
+    header_size, payload_size = struct.unpack('!II', _recvExact(sock, 8))
+    header = json.loads(_recvExact(sock, header_size))
+    payload = _recvExact(sock, payload_size)
+
+    arrays = []
+    offset = 0
+    for dtype, shape in header.pop('arrays'):
+        arr = np.frombuffer(payload, dtype=dtype, count=int(np.prod(shape)), offset=offset)
+        arrays.append(arr.reshape(shape))
+        offset += arr.nbytes
+    return header, arrays
+
+def _candidatesToArrays(candidates: Candidates) -> List[np.ndarray]:
+    return [candidates.class_ids, candidates.scores, candidates.boxes, candidates.keypoints]
+
+def _arraysToCandidates(arrays: List[np.ndarray], img_w: int, img_h: int) -> Candidates:
+    class_ids, scores, boxes, keypoints = arrays
+    return Candidates(class_ids, scores, boxes, keypoints, img_w, img_h)
+
+def _filterCandidates(candidates: Candidates, score_thresh: float) -> Candidates:
+    keep = candidates.scores > score_thresh
+    return candidates._replace(
+        class_ids=candidates.class_ids[keep],
+        scores=candidates.scores[keep],
+        boxes=candidates.boxes[keep],
+        keypoints=candidates.keypoints[keep]
+    )
+
+class _Request:
+    def __init__(self, img: np.ndarray, upscale: bool, score_thresh: float):
+        self.img = img
+        self.upscale = upscale
+        self.score_thresh = score_thresh
+        self.done = threading.Event()
+        self.result: Candidates = None
+        self.error: Exception = None
+
+class _Batcher:
+    '''
+    Collects requests for `window` seconds after the first one, at most
+    `max_batch`, and runs them in one forward pass.
+    '''
+    def __init__(self, model: PoseModel, window: float, max_batch: int):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+
+        self._cond = threading.Condition()
+        self._requests: List[_Request] = []
+        self._running = True
+        self.batches = 0
+        self.images = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self,
+        images: List[np.ndarray],
+        upscale: bool = True,
+        score_thresh: float = None
+    ) -> List[Candidates]:
+        '''
+        Candidates above `score_thresh`, model thresholds if None. Images
+        are queued together, so they share forward passes.
+        '''
+        if score_thresh is None:
+            score_thresh = min(self.model.candidate_thresh, self.model.confidence_thresh)
+        requests = [_Request(img, upscale, score_thresh) for img in images]
+        with self._cond:
+            if not self._running:
+                raise RuntimeError('Inference server is stopped.')
+            self._requests.extend(requests)
+            self._cond.notify()
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+        return [request.result for request in requests]
+
+    def _take(self) -> List[_Request]:
+        with self._cond:
+            while self._running and len(self._requests) == 0:
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            deadline = time.monotonic() + self.window
+            while len(self._requests) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Only requests of the same resize mode share a batch.
+            upscale = self._requests[0].upscale
+            batch = [r for r in self._requests if r.upscale == upscale][:self.max_batch]
+            self._requests = [r for r in self._requests if r not in batch]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if len(batch) == 0:
+                return
+            try:
+                score_thresh = min(r.score_thresh for r in batch)
+                results = self.model._forwardBatch([r.img for r in batch], batch[0].upscale, score_thresh)
+                for request, candidates in zip(batch, results):
+                    request.result = _filterCandidates(candidates, request.score_thresh)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            self.batches += 1
+            self.images += len(batch)
+            for request in batch:
+                request.done.set()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            for request in self._requests:
+                request.error = RuntimeError('Inference server is stopped.')
+                request.done.set()
+            self._requests = []
+            self._cond.notify()
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class InferenceServer:
+    '''
+    InferenceServer(model, address, window, max_batch)
+
+    Ops of a request header, each request carries a batch of images:
+    * info -> model hash, input size, letterbox and numbers of classes and keypoints
+    * candidates(images, upscale, score_thresh) -> pre-NMS candidates of each image
+    * labels(images, confidence_thresh, nms_thresh) -> labels in pixels of each image
+
+    Methods:
+    * serveForever() -> None
+    * shutdown() -> None
+    '''
+    def __init__(self,
+        model: PoseModel,
+        address: str = DEFAULT_ADDRESS,
+        window: float = 0.005,
+        max_batch: int = 8
+    ):
+        self.model = model
+        self.address = address
+        self.batcher = _Batcher(model, window, max_batch)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+        server = self
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                server._handle(self.request)
+
+        family, sock_address = parseAddress(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(sock_address):
+                os.remove(sock_address) # left by a killed server
+            self._server = _UnixServer(sock_address, Handler)
+        else:
+            self._server = _TCPServer(sock_address, Handler)
+            host, port = self._server.server_address[:2]
+            self.address = f'{host}:{port}' # port 0 picks a free one
+
+    def _handle(self, sock: socket.socket) -> None:
+        with self._connections_lock:
+            self._connections.add(sock)
+        try:
+            self._serveConnection(sock)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(sock)
+
+    def _serveConnection(self, sock: socket.socket) -> None:
+        ''' Serve requests of a connection until it is closed. '''
+        while True:
+            try:
+                header, arrays = recvMessage(sock)
+            except (ConnectionError, OSError, struct.error):
+                return
+
+            op = header.get('op')
+            try:
+                if op == 'info':
+                    sendMessage(sock, {
+                        'model_hash': self.model.model_hash,
+                        'img_size': list(self.model.img_size),
+                        'rect': self.model.rect,
+                        'stride': self.model.stride,
+                        'num_classes': self.model.num_classes,
+                        'num_keypoints': self.model.num_keypoints
+                    })
+                elif op == 'candidates':
+                    results = self.batcher.submit(arrays, header.get('upscale', True), header.get('score_thresh'))
+                    sendMessage(sock, {}, [arr for c in results for arr in _candidatesToArrays(c)])
+                elif op == 'labels':
+                    results = [
+                        self.model.applyThresholds(
+                            candidates,
+                            header.get('confidence_thresh'),
+                            header.get('nms_thresh')
+                        ) for candidates in self.batcher.submit(arrays)
+                    ]
+                    sendMessage(sock, {'labels': [
+                        [[lb.cls_id, lb.kpts] for lb in labels] for labels in results
+                    ]})
+                else:
+                    sendMessage(sock, {'error': f'Unknown op {op}.'})
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                sendMessage(sock, {'error': str(e)})
+
+    def serveForever(self) -> None:
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self.batcher.stop()
+        # Clients notice and run their models locally.
+        with self._connections_lock:
+            for sock in self._connections:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        family, sock_address = parseAddress(self.address)
+        if family == socket.AF_UNIX and os.path.exists(sock_address):
+            os.remove(sock_address)
+
+class InferenceClient:
+    '''
+    Connection to an InferenceServer, requests are sent one at a time,
+    each with all images of a batch. Raises OSError (socket.timeout) if
+    the server does not reply within `timeout` seconds.
+
+    InferenceClient(address, timeout)
+
+    Methods:
+    * info() -> dict
+    * candidates(images, upscale, score_thresh) -> List[Candidates]
+    * labels(images, confidence_thresh, nms_thresh) -> List[List[LabelIO]]
+    * close() -> None
+    '''
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 10.0):
+        family, sock_address = parseAddress(address)
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(sock_address)
+        except OSError:
+            self._sock.close()
+            raise
+        self._lock = threading.Lock()
+
+    def _request(self, header: dict, arrays: List[np.ndarray] = ()) -> Tuple[dict, List[np.ndarray]]:
+        with self._lock:
+            sendMessage(self._sock, header, arrays)
+            header, arrays = recvMessage(self._sock)
+        if 'error' in header:
+            raise RuntimeError(f'Inference server: {header["error"]}')
+        return header, arrays
+
+    def info(self) -> dict:
+        return self._request({'op': 'info'})[0]
+
+    def candidates(self,
+        images: List[np.ndarray],
+        upscale: bool = True,
+        score_thresh: float = None
+    ) -> List[Candidates]:
+        '''
+        Images are sent in one message, the server batches them with
+        requests of other clients.
+        '''
+        if len(images) == 0:
+            return []
+        header = {'op': 'candidates', 'upscale': upscale, 'score_thresh': score_thresh}
+        _, arrays = self._request(header, images)
+        return [
+            _arraysToCandidates(arrays[4*i:4*i+4], img.shape[1], img.shape[0])
+            for i, img in enumerate(images)
+        ]
+
+    def labels(self,
+        images: List[np.ndarray],
+        confidence_thresh: float = None,
+        nms_thresh: float = None,
+        label_type: type = ArmorLabelIO
+    ) -> List[List[LabelIO]]:
+        if len(images) == 0:
+            return []
+        header, _ = self._request({
+            'op': 'labels',
+            'confidence_thresh': confidence_thresh,
+            'nms_thresh': nms_thresh
+        }, images)
+        return [
+            [label_type(cls_id, [tuple(pt) for pt in kpts]) for cls_id, kpts in labels]
+            for labels in header['labels']
+        ]
+
+    def close(self) -> None:
+        self._sock.close()
+
+def connectServer(address: str, model: PoseModel, timeout: float = 10.0) -> Union[InferenceClient, None]:
+    '''
+    Client of a running server with the same model and settings as
+    `model`, or None. Requests time out after `timeout` seconds, then
+    `model` runs locally.
+    '''
+    try:
+        client = InferenceClient(address, timeout)
+    except OSError:
+        return None
+
+    try:
+        info = client.info()
+    except (OSError, RuntimeError, ConnectionError):
+        client.close()
+        return None
+
+    if info['model_hash'] != model.model_hash \
+        or tuple(info['img_size']) != tuple(model.img_size) \
+        or info.get('rect') != model.rect \
+        or info.get('stride') != model.stride \
+        or info['num_classes'] != model.num_classes \
+        or info['num_keypoints'] != model.num_keypoints:
+        ui.logger.warning(f'Inference server at {address} runs another model or letterbox.')
+        client.close()
+        return None
+
+    return client
@@ -71,6 +71,20 @@ class BuffLabelIO(LabelIO):
     * [(x1, y1), (x2, y2), (x3, y3), (x4, y4), (x5, y5)]
     '''
 
+def normalizeLabels(labels: List[LabelIO], img_w: int, img_h: int) -> List[LabelIO]:
+    ''' Pixel keypoints to keypoints relative to image size. '''
+    return [
+        lb.__class__(lb.cls_id, [(x / img_w, y / img_h) for x, y in lb.kpts])
+        for lb in labels
+    ]
+
+def denormalizeLabels(labels: List[LabelIO], img_w: int, img_h: int) -> List[LabelIO]:
+    ''' Keypoints relative to image size to pixel keypoints. '''
+    return [
+        lb.__class__(lb.cls_id, [(x * img_w, y * img_h) for x, y in lb.kpts])
+        for lb in labels
+    ]
+
 def loadLabel(path: str) -> List[LabelIO]:
     ''' Load labels from file. '''
     if not os.path.exists(path):
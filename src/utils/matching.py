@@ -0,0 +1,110 @@
+__all__ = [
+    'linearAssignment',
+    'keypointDistances',
+    'matchLabels',
+]
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .lbformat import LabelIO
+
+
+def linearAssignment(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Hungarian algorithm, minimum cost assignment of a (N, M) cost matrix.
+    Every row or every column (whichever are fewer) is assigned.
+
+    Returns:
+        (row indices, column indices), sorted by row.
+    '''
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.zeros((0,), np.int64), np.zeros((0,), np.int64)
+
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    # Shortest augmenting path with potentials, O(n^2 m). Index 0 of
+    # columns is a virtual start, rows and columns are 1-based.
+    u = np.zeros((n + 1,))
+    v = np.zeros((m + 1,))
+    p = np.zeros((m + 1,), np.int64)   # row assigned to each column
+    way = np.zeros((m + 1,), np.int64) # previous column on the path
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full((m + 1,), np.inf)
+        used = np.zeros((m + 1,), bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = np.flatnonzero(~used[1:]) + 1
+            reduced = cost[i0 - 1, free - 1] - u[i0] - v[free]
+            better = reduced < minv[free]
+            minv[free[better]] = reduced[better]
+            way[free[better]] = j0
+
+            j1 = free[np.argmin(minv[free])]
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:] > 0)
+    rows = p[cols + 1] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+def keypointDistances(kpts1: np.ndarray, kpts2: np.ndarray) -> np.ndarray:
+    ''' (N, K, 2) and (M, K, 2) keypoints -> (N, M) mean keypoint distance. '''
+    kpts1 = np.asarray(kpts1, dtype=np.float64).reshape(len(kpts1), -1, 2)
+    kpts2 = np.asarray(kpts2, dtype=np.float64).reshape(len(kpts2), -1, 2)
+    return np.linalg.norm(kpts1[:, None] - kpts2[None], axis=-1).mean(axis=-1)
+
+def matchLabels(
+    labels1: List[LabelIO],
+    labels2: List[LabelIO],
+    max_dist: float = 0.5,
+    same_class: bool = False
+) -> List[Tuple[int, int]]:
+    '''
+    One-to-one match of labels by mean keypoint distance. A pair only
+    matches if its distance is below `max_dist` times the size (longer
+    bbox side) of the label in `labels2`. Labels should have the same
+    number of keypoints in the same order.
+
+    Returns:
+        [(index in labels1, index in labels2), ...]
+    '''
+    if len(labels1) == 0 or len(labels2) == 0:
+        return []
+
+    kpts1 = np.array([lb.kpts for lb in labels1], dtype=np.float64)
+    kpts2 = np.array([lb.kpts for lb in labels2], dtype=np.float64)
+    dists = keypointDistances(kpts1, kpts2)
+
+    sizes = (kpts2.max(axis=1) - kpts2.min(axis=1)).max(axis=1)
+    valid = dists < max_dist * sizes[None]
+    if same_class:
+        cls1 = np.array([lb.cls_id for lb in labels1])
+        cls2 = np.array([lb.cls_id for lb in labels2])
+        valid &= cls1[:, None] == cls2[None]
+
+    # Invalid pairs cost more than any set of valid ones.
+    invalid_cost = dists[valid].sum() + 1 if valid.any() else 1
+    rows, cols = linearAssignment(np.where(valid, dists, invalid_cost))
+    return [(int(i), int(j)) for i, j in zip(rows, cols) if valid[i, j]]
@@ -0,0 +1,65 @@
+import threading
+from typing import Callable, Union
+
+from .. import pygame_gui as ui
+from .inference import PoseModel
+
+STATE_UNLOADED = 0
+STATE_LOADING = 1
+STATE_READY = 2
+STATE_FAILED = 3
+
+class ModelLoader:
+    '''
+    Load a model on a background thread, followed by a warm-up forward
+    pass so that the first real inference is not slow.
+
+    ModelLoader(factory)
+    * factory() -> PoseModel
+
+    Methods:
+    * load() -> None
+    * get() -> PoseModel | None
+    * getState() -> int
+    * isReady() -> bool
+    '''
+    def __init__(self, factory: Callable[[], PoseModel]):
+        self.factory = factory
+
+        self._lock = threading.Lock()
+        self._state = STATE_UNLOADED
+        self._model: PoseModel = None
+
+    def _load(self) -> None:
+        try:
+            model = self.factory()
+            model.warmup()
+        except Exception as e:
+            ui.logger.warning(f'Failed to load model: {e}', self)
+            with self._lock:
+                self._state = STATE_FAILED
+            return
+
+        with self._lock:
+            self._model = model
+            self._state = STATE_READY
+
+    def load(self) -> None:
+        ''' Start loading if it is not loaded or loading. '''
+        with self._lock:
+            if self._state in (STATE_LOADING, STATE_READY):
+                return
+            self._state = STATE_LOADING
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def get(self) -> Union[PoseModel, None]:
+        ''' Returns the model, or None if it is not ready. '''
+        with self._lock:
+            return self._model
+
+    def getState(self) -> int:
+        with self._lock:
+            return self._state
+
+    def isReady(self) -> bool:
+        return self.getState() == STATE_READY
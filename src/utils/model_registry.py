@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+from .. import pygame_gui as ui
+from .inference import PoseModel
+from .model_loader import ModelLoader
+
+
+@ui.utils.singleton
+class ModelRegistry:
+    '''
+    Process-wide models shared by pages and inference workers. Models
+    are loaded in background by id or by onnx path, the latest
+    `capacity` of them are kept loaded, so switching back is instant.
+
+    ModelRegistry(capacity)
+
+    Methods:
+    * register(model_id, model_path, **kwargs) -> None
+    * unregister(model_id) -> None
+    * setDefaults(**kwargs) -> None
+    * setCapacity(capacity) -> None
+    * getIds() -> List[str]
+    * getLoader(model) -> ModelLoader
+    * setActive(model) -> None
+    * getActive() -> str | None
+    * getActiveLoader() -> ModelLoader | None
+    '''
+    def __init__(self, capacity: int = 2):
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._models: Dict[str, dict] = {} # id -> PoseModel arguments
+        self._defaults: dict = {}
+        self._loaders: 'OrderedDict[str, ModelLoader]' = OrderedDict()
+        self._active: str = None
+
+    def register(self, model_id: str, model_path: str, **kwargs) -> None:
+        ''' Register a model id, `kwargs` are passed to PoseModel. '''
+        with self._lock:
+            self._models[model_id] = dict(kwargs, model_path=model_path)
+            # Registered again with other arguments, load it again.
+            self._loaders.pop(model_id, None)
+
+    def unregister(self, model_id: str) -> None:
+        ''' Forget a model id and its loader, active model is unset if it was. '''
+        with self._lock:
+            self._models.pop(model_id, None)
+            self._loaders.pop(model_id, None)
+            if self._active == model_id:
+                self._active = None
+
+    def setDefaults(self, **kwargs) -> None:
+        ''' PoseModel arguments of all models, e.g. backend. '''
+        with self._lock:
+            self._defaults = kwargs
+
+    def setCapacity(self, capacity: int) -> None:
+        with self._lock:
+            self.capacity = capacity
+            self._evict()
+
+    def getIds(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def _key(self, model: str) -> str:
+        ''' Model id, or absolute path for unregistered models. '''
+        return model if model in self._models else os.path.abspath(model)
+
+    def _arguments(self, key: str) -> dict:
+        if key in self._models:
+            return dict(self._defaults, **self._models[key])
+        return dict(self._defaults, model_path=key)
+
+    def _evict(self) -> None:
+        ''' Drop least recently used loaders, except the active one. '''
+        for key in list(self._loaders):
+            if len(self._loaders) <= self.capacity:
+                break
+            if key != self._active:
+                del self._loaders[key]
+
+    def getLoader(self, model: str) -> ModelLoader:
+        '''
+        Loader of a model id or path, created if it is not kept. Call
+        `load()` of the loader to start loading.
+        '''
+        with self._lock:
+            key = self._key(model)
+            loader = self._loaders.get(key)
+            if loader is None:
+                kwargs = self._arguments(key)
+                loader = ModelLoader(lambda : PoseModel(**kwargs))
+                self._loaders[key] = loader
+            self._loaders.move_to_end(key)
+            self._evict()
+            return loader
+
+    def setActive(self, model: Union[str, None]) -> None:
+        ''' Model used by pages, they switch to it once it is loaded. '''
+        with self._lock:
+            self._active = None if model is None else self._key(model)
+
+    def getActive(self) -> Union[str, None]:
+        with self._lock:
+            return self._active
+
+    def getActiveLoader(self) -> Union[ModelLoader, None]:
+        active = self.getActive()
+        if active is None:
+            return None
+        return self.getLoader(active)
+
+def setupModelRegistry(config_manager) -> ModelRegistry:
+    '''
+    Register models of user config. A model is a path or a dict of
+    PoseModel arguments with `model_path`.
+    '''
+    registry = ModelRegistry()
+    registry.setCapacity(config_manager['model_cache_size'])
+    registry.setDefaults(
+        img_size=(416, 416),
+        backend=config_manager['inference_backend'],
+        num_threads=config_manager['inference_threads'],
+        inter_op_threads=config_manager['inference_inter_op_threads'],
+        server=config_manager['inference_server']
+    )
+    for model_id, model in config_manager['models'].items():
+        if isinstance(model, str):
+            model = {'model_path': model}
+        model = dict(model)
+        if 'img_size' in model:
+            model['img_size'] = tuple(model['img_size'])
+        registry.register(model_id, **model)
+    registry.setActive(config_manager['active_model'])
+    return registry
@@ -0,0 +1,138 @@
+__all__ = [
+    'boxIoU',
+    'quadIoU',
+    'nms',
+]
+
+import cv2
+import numpy as np
+
+
+def boxIoU(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    '''
+    IoU of one (x1, y1, x2, y2) box against (N, 4) boxes.
+    '''
+    return _pairwiseIoU(np.asarray(box)[None], np.asarray(boxes))[0]
+
+def _pairwiseIoU(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    ''' (M, 4) and (N, 4) boxes as (x1, y1, x2, y2) -> (M, N) IoU. '''
+    w = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    h = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+
+    areas1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    areas2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = areas1[:, None] + areas2[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+def quadIoU(quad1: np.ndarray, quad2: np.ndarray) -> float:
+    '''
+    IoU of two quadrilaterals given by (4, 2) points in any order,
+    their convex hulls are compared.
+    '''
+    hull1 = cv2.convexHull(np.asarray(quad1, np.float32))
+    hull2 = cv2.convexHull(np.asarray(quad2, np.float32))
+    return _hullIoU(hull1, cv2.contourArea(hull1), hull2, cv2.contourArea(hull2))
+
+def _hullIoU(hull1: np.ndarray, area1: float, hull2: np.ndarray, area2: float) -> float:
+    if area1 <= 0 or area2 <= 0:
+        return 0.0
+    inter, _ = cv2.intersectConvexConvex(hull1, hull2)
+    union = area1 + area2 - inter
+    return inter / union if union > 0 else 0.0
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_thresh: float,
+    score_thresh: float = 0.0,
+    class_ids: np.ndarray = None,
+    keypoints: np.ndarray = None,
+    top_k: int = None
+) -> np.ndarray:
+    '''
+    Greedy non-maximum suppression, returns indices of kept candidates
+    in descending score order.
+
+    Args:
+    * boxes: (N, 4) as (x, y, w, h), same as `cv2.dnn.NMSBoxes`.
+    * scores: (N,), candidates not above `score_thresh` are dropped.
+    * class_ids: (N,), candidates of different classes never suppress
+    each other. Class agnostic if `None`.
+    * keypoints: (N, K, 2), IoU of keypoint hulls is used instead of
+    boxes, K should be at least 3.
+    * top_k: only the best `top_k` candidates go into NMS.
+
+    A candidate is suppressed if its IoU with a kept one is larger than
+    `iou_thresh`.
+    '''
+    scores = np.asarray(scores).reshape(-1)
+    order = np.flatnonzero(scores > score_thresh)
+    order = order[np.argsort(-scores[order], kind='stable')]
+    if top_k is not None:
+        order = order[:top_k]
+    if order.size == 0:
+        return np.zeros((0,), np.int64)
+
+    xywh = np.asarray(boxes, np.float64).reshape(-1, 4)[order]
+    xyxy = np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]], axis=1)
+
+    hulls = areas = None
+    if keypoints is not None:
+        hulls = [cv2.convexHull(kpts) for kpts in np.asarray(keypoints, np.float32)[order]]
+        areas = [cv2.contourArea(hull) for hull in hulls]
+
+    # Positions in `order`, each group is still sorted by score.
+    if class_ids is None:
+        groups = [np.arange(order.size)]
+    else:
+        order_class_ids = np.asarray(class_ids).reshape(-1)[order]
+        groups = [np.flatnonzero(order_class_ids == c) for c in np.unique(order_class_ids)]
+
+    keep = [group[_greedy(xyxy[group], iou_thresh, hulls, areas, group)] for group in groups]
+    return order[np.sort(np.concatenate(keep))]
+
+# Rows of IoU matrix computed at once. Blocks start small since the
+# best boxes usually suppress most others, and grow to the upper bound.
+_MIN_BLOCK = 8
+_MAX_BLOCK = 256
+
+def _greedy(
+    xyxy: np.ndarray,
+    iou_thresh: float,
+    hulls: list,
+    areas: list,
+    group: np.ndarray
+) -> np.ndarray:
+    ''' Greedy NMS on boxes sorted by score, returns kept positions. '''
+    n = xyxy.shape[0]
+    removed = np.zeros((n,), bool)
+    keep = []
+    start, block = 0, _MIN_BLOCK
+    while start < n:
+        # Suppressed boxes are left out, dense clusters shrink quickly.
+        rows = start + np.flatnonzero(~removed[start:start+block])
+        cols = start + np.flatnonzero(~removed[start:])
+        start, block = start + block, min(block * 2, _MAX_BLOCK)
+        if rows.size == 0:
+            continue
+        # Quads only overlap if their boxes do.
+        overlap = _pairwiseIoU(xyxy[rows], xyxy[cols]) > (0 if hulls is not None else iou_thresh)
+
+        # Rows are sorted and also in cols.
+        for row, pos in enumerate(np.searchsorted(cols, rows)):
+            i = cols[pos]
+            if removed[i]:
+                continue
+            keep.append(i)
+            hits = cols[pos+1:][overlap[row, pos+1:]]
+            if hulls is None:
+                removed[hits] = True
+                continue
+
+            a = group[i]
+            for j in hits[~removed[hits]]:
+                b = group[j]
+                if _hullIoU(hulls[a], areas[a], hulls[b], areas[b]) > iou_thresh:
+                    removed[j] = True
+    return np.array(keep, np.int64)
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .. import pygame_gui as ui
+from . import imgproc
+from . import lbformat as fmt
+
+# (mtime_ns, size) of a file
+FileStat = Tuple[int, int]
+
+# Records of processed images and written labels, in the output folder.
+STATE_FILE = '.prelabel.json'
+
+def getFileStat(path: str) -> Union[FileStat, None]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def snapshot(images_folder: str) -> Dict[str, FileStat]:
+    ''' Image filename -> file stat of every image in a folder. '''
+    files = {}
+    for filename in imgproc.getImageFiles(images_folder):
+        stat = getFileStat(os.path.join(images_folder, filename))
+        if stat is not None:
+            files[filename] = stat
+    return files
+
+class Prelabeler:
+    '''
+    Pre-label new or changed images of a folder, comparing snapshots of
+    it taken by `poll()`. An image is labeled once it is unchanged
+    between two polls, so files being copied are not read.
+
+    Prelabeler(images_folder, labels_folder, infer_batch, output_folder, batch_size, max_rate)
+
+    `infer_batch` returns labels in pixels of a list of images, e.g.
+    `PoseModel.inferenceBatch`. Labels are written to `output_folder`,
+    the labels folder by default. Human labels are never overwritten: a
+    label file is only written if it does not exist, or it was written
+    here and is not modified since. With a separate output folder,
+    images that have a label in the labels folder are skipped.
+
+    At most `max_rate` images are labeled per second if given.
+
+    Methods:
+    * poll() -> List[str]
+    * process(filenames) -> int
+    * runForever(interval, stop) -> None
+    '''
+    def __init__(self,
+        images_folder: str,
+        labels_folder: str,
+        infer_batch: Callable[[List[np.ndarray]], List[List[fmt.LabelIO]]],
+        output_folder: str = None,
+        batch_size: int = 4,
+        max_rate: float = None
+    ):
+        self.images_folder = images_folder
+        self.labels_folder = labels_folder
+        self.output_folder = output_folder or labels_folder
+        self.infer_batch = infer_batch
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+
+        imgproc.makeFolder(self.output_folder)
+        self.state_path = os.path.join(self.output_folder, STATE_FILE)
+        self._images: Dict[str, FileStat] = {} # processed images
+        self._labels: Dict[str, FileStat] = {} # label files written here
+        self._loadState()
+        # Images changed in the last poll, labeled if unchanged in the next.
+        self._changed: Dict[str, FileStat] = {}
+
+        self.labeled = 0 # label files written
+        self.skipped = 0 # images with human labels
+
+    def _loadState(self) -> None:
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self._images = {k: tuple(v) for k, v in state['images'].items()}
+            self._labels = {k: tuple(v) for k, v in state['labels'].items()}
+        except (OSError, ValueError, KeyError):
+            ui.logger.warning(f'Invalid prelabel state {self.state_path}, start over.')
+
+    def _saveState(self) -> None:
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'images': self._images, 'labels': self._labels}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def poll(self) -> List[str]:
+        ''' Take a snapshot, returns images ready to label, sorted. '''
+        current = snapshot(self.images_folder)
+        ready = [
+            filename for filename, stat in current.items()
+            if self._images.get(filename) != stat and self._changed.get(filename) == stat
+        ]
+        self._changed = {
+            filename: stat for filename, stat in current.items()
+            if self._images.get(filename) != stat
+        }
+        for filename in set(self._images) - set(current):
+            del self._images[filename] # removed images
+        return sorted(ready)
+
+    def _canWrite(self, label_file: str) -> bool:
+        ''' Whether a label file is missing, or ours and untouched. '''
+        if self.output_folder != self.labels_folder \
+            and os.path.exists(os.path.join(self.labels_folder, label_file)):
+            return False
+        stat = getFileStat(os.path.join(self.output_folder, label_file))
+        return stat is None or self._labels.get(label_file) == stat
+
+    def _write(self, label_file: str, labels: List[fmt.LabelIO]) -> bool:
+        path = os.path.join(self.output_folder, label_file)
+        if len(labels) == 0:
+            # Drop our labels of the image before it changed, unless an
+            # annotator saved them during inference.
+            if label_file in self._labels and os.path.exists(path):
+                if not self._canWrite(label_file):
+                    self._labels.pop(label_file)
+                    self.skipped += 1
+                    return False
+                os.remove(path)
+            self._labels.pop(label_file, None)
+            return False
+
+        tmp_path = path + '.tmp'
+        fmt.saveLabel(tmp_path, labels)
+        # Checked again, an annotator may have saved it during inference.
+        if not self._canWrite(label_file):
+            os.remove(tmp_path)
+            self.skipped += 1
+            return False
+        os.replace(tmp_path, path)
+        self._labels[label_file] = getFileStat(path)
+        return True
+
+    def process(self, filenames: List[str]) -> int:
+        ''' Label images returned by `poll()`, returns number of label files written. '''
+        images = []
+        tasks = []
+        for filename in filenames:
+            stat = self._changed.get(filename)
+            label_file = imgproc.getLabelPath(filename, '')
+            if not self._canWrite(label_file):
+                self._images[filename] = stat
+                self.skipped += 1
+                continue
+
+            img = cv2.imread(os.path.join(self.images_folder, filename))
+            if img is None:
+                # Retried once the file changes.
+                ui.logger.warning(f'Can not read image {filename}.')
+                self._images[filename] = stat
+                continue
+            images.append(img)
+            tasks.append((filename, stat, label_file))
+
+        written = 0
+        results = self.infer_batch(images) if len(images) > 0 else []
+        for img, (filename, stat, label_file), labels in zip(images, tasks, results):
+            h, w = img.shape[:2]
+            if self._write(label_file, fmt.normalizeLabels(labels, w, h)):
+                written += 1
+            self._images[filename] = stat
+
+        self.labeled += written
+        self._saveState()
+        return written
+
+    def runForever(self, interval: float = 5.0, stop: threading.Event = None) -> None:
+        ''' Poll every `interval` seconds until `stop` is set. '''
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            filenames = self.poll()
+            for i in range(0, len(filenames), self.batch_size):
+                if stop.is_set():
+                    return
+                chunk = filenames[i:i+self.batch_size]
+                start = time.monotonic()
+                self.process(chunk)
+                if self.max_rate is not None:
+                    stop.wait(max(0.0, len(chunk) / self.max_rate - (time.monotonic() - start)))
+            stop.wait(interval)
@@ -0,0 +1,219 @@
+from typing import Callable, List, Tuple, Union
+
+import numpy as np
+
+from .inference import Candidates, PoseModel
+from .lbformat import LabelIO
+
+
+def getROIs(
+    labels: List[LabelIO],
+    img_w: int, img_h: int,
+    scale: float = 2.0,
+    min_size: int = 64
+) -> List[Tuple[int, int, int, int]]:
+    '''
+    Square regions around labels, `scale` times their longer side and at
+    least `min_size`, moved inside the image. Overlapping regions are
+    merged so a target is searched only once.
+
+    Returns:
+        List[(x0, y0, x1, y1)]
+    '''
+    regions = []
+    for lb in labels:
+        kpts = np.asarray(lb.kpts, dtype=np.float64)
+        (x_min, y_min), (x_max, y_max) = kpts.min(axis=0), kpts.max(axis=0)
+        size = max((x_max - x_min) * scale, (y_max - y_min) * scale, min_size)
+        w, h = min(int(np.ceil(size)), img_w), min(int(np.ceil(size)), img_h)
+        x0 = int(np.clip(round((x_min + x_max - w) / 2), 0, img_w - w))
+        y0 = int(np.clip(round((y_min + y_max - h) / 2), 0, img_h - h))
+        regions.append([x0, y0, x0 + w, y0 + h])
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    return [tuple(region) for region in regions]
+
+def packRegions(
+    sizes: List[Tuple[int, int]],
+    canvas_w: int, canvas_h: int,
+    gap: int = 16
+) -> List[Union[Tuple[int, int, int], None]]:
+    '''
+    Pack (w, h) sizes into as few canvases as possible, shelf by shelf
+    from the tallest, `gap` pixels apart.
+
+    Returns:
+        List[(canvas index, x, y)], None for sizes larger than a canvas
+    '''
+    slots = [None] * len(sizes)
+    canvas, x, y, shelf_h = 0, 0, 0, 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[i]
+        if w > canvas_w or h > canvas_h:
+            continue
+        if x + w > canvas_w:
+            x, y, shelf_h = 0, y + shelf_h + gap, 0
+        if y + h > canvas_h:
+            canvas, x, y, shelf_h = canvas + 1, 0, 0, 0
+        slots[i] = (canvas, x, y)
+        x += w + gap
+        shelf_h = max(shelf_h, h)
+    return slots
+
+class ROIInference:
+    '''
+    Video inference restricted to regions around the last detections.
+    Regions are packed at native resolution into network inputs of
+    `img_size`, so all regions of a frame usually cost a single forward
+    pass no larger than a whole frame pass, in `rect` mode only as large
+    as the packed regions. Regions larger than the network input are
+    letterboxed on their own, each costing a whole frame pass.
+
+    ROIInference(model, full_interval, scale, min_size)
+
+    The whole frame is labeled every `full_interval` frames, after
+    seeking backwards, when there was no detection, or when no target is
+    found in the regions.
+
+    Methods:
+    * process(frame_idx, frame, infer) -> List[LabelIO]
+    * inferenceRegions(frame, regions) -> List[LabelIO]
+    * reset() -> None
+    * resetStats() -> None
+    '''
+    # Padding between packed regions, targets do not reach a neighbour.
+    GAP = 16
+
+    def __init__(self,
+        model: PoseModel,
+        full_interval: int = 10,
+        scale: float = 2.0,
+        min_size: int = 64
+    ):
+        self.model = model
+        self.full_interval = full_interval
+        self.scale = scale
+        self.min_size = min_size
+
+        self.reset()
+        self.resetStats()
+
+    def reset(self) -> None:
+        ''' Next frame is labeled as a whole. '''
+        self._full_idx: int = None
+        self._last_idx: int = None
+        self._labels: List[LabelIO] = []
+
+    def resetStats(self) -> None:
+        self.full_passes = 0 # whole frame labeled
+        self.roi_passes = 0  # labeled by regions only
+        self.fallbacks = 0   # regions found nothing, whole frame labeled again
+
+    def _needsFull(self, frame_idx: int) -> bool:
+        return self._full_idx is None \
+            or len(self._labels) == 0 \
+            or frame_idx <= self._last_idx \
+            or frame_idx - self._full_idx >= self.full_interval
+
+    def process(self,
+        frame_idx: int,
+        frame: np.ndarray,
+        infer: Callable[[np.ndarray], List[LabelIO]] = None
+    ) -> List[LabelIO]:
+        '''
+        Labels of a frame in frame coordinates. Whole frames are labeled
+        by `infer`, `model.inference` by default.
+        '''
+        if not self._needsFull(frame_idx):
+            img_h, img_w = frame.shape[:2]
+            regions = getROIs(self._labels, img_w, img_h, self.scale, self.min_size)
+            labels = self.inferenceRegions(frame, regions)
+            if len(labels) > 0:
+                self.roi_passes += 1
+                self._labels = labels
+                self._last_idx = frame_idx
+                return labels
+            self.fallbacks += 1
+
+        labels = (infer or self.model.inference)(frame)
+        self.full_passes += 1
+        self._full_idx = frame_idx
+        self._last_idx = frame_idx
+        self._labels = labels
+        return labels
+
+    def inferenceRegions(self,
+        frame: np.ndarray,
+        regions: List[Tuple[int, int, int, int]]
+    ) -> List[LabelIO]:
+        '''
+        Labels found in regions (x0, y0, x1, y1) of a frame, in frame
+        coordinates. Regions are packed into as few network inputs as
+        possible and run as one batch.
+        '''
+        if len(regions) == 0:
+            return []
+        img_h, img_w = frame.shape[:2]
+        net_w, net_h = self.model.img_size
+        slots = packRegions([(x1 - x0, y1 - y0) for x0, y0, x1, y1 in regions], net_w, net_h, self.GAP)
+
+        num_canvases = max([slot[0] + 1 for slot in slots if slot is not None], default=0)
+        canvases = [np.full((net_h, net_w, 3), 114, dtype=np.uint8) for _ in range(num_canvases)]
+        extents = [[0, 0] for _ in range(num_canvases)]
+        # (input index, region, slot top left) of every region
+        placements = []
+        oversized = []
+        for (x0, y0, x1, y1), slot in zip(regions, slots):
+            if slot is None:
+                placements.append((num_canvases + len(oversized), (x0, y0, x1, y1), None))
+                oversized.append(frame[y0:y1, x0:x1])
+                continue
+            canvas, x, y = slot
+            w, h = x1 - x0, y1 - y0
+            canvases[canvas][y:y+h, x:x+w] = frame[y0:y1, x0:x1]
+            extents[canvas] = [max(extents[canvas][0], x + w), max(extents[canvas][1], y + h)]
+            placements.append((canvas, (x0, y0, x1, y1), (x, y)))
+
+        # Unused canvas area is not passed, `rect` mode gets a smaller input.
+        inputs = [canvas[:h, :w] for canvas, (w, h) in zip(canvases, extents)] + oversized
+        input_candidates = self.model._forwardBatch(inputs, upscale=False)
+
+        class_ids, scores, boxes, keypoints = [], [], [], []
+        for index, (x0, y0, x1, y1), top_left in placements:
+            c = input_candidates[index]
+            if top_left is None:
+                keep = np.arange(len(c.scores))
+                offset = np.array([x0, y0], dtype=np.float64)
+            else:
+                # Targets centered inside the slot of the region.
+                x, y = top_left
+                centers = c.boxes[:, :2] + c.boxes[:, 2:] / 2
+                keep = np.flatnonzero(
+                    (centers[:, 0] >= x) & (centers[:, 0] < x + x1 - x0) &
+                    (centers[:, 1] >= y) & (centers[:, 1] < y + y1 - y0)
+                )
+                offset = np.array([x0 - x, y0 - y], dtype=np.float64)
+            class_ids.append(c.class_ids[keep])
+            scores.append(c.scores[keep])
+            boxes.append(c.boxes[keep] + np.concatenate([offset, (0, 0)]))
+            keypoints.append(c.keypoints[keep] + offset)
+
+        candidates = Candidates(
+            np.concatenate(class_ids), np.concatenate(scores),
+            np.concatenate(boxes), np.concatenate(keypoints),
+            img_w, img_h
+        )
+        return self.model.applyThresholds(candidates)
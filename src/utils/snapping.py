@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, List, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .. import pygame_gui as ui
+from .imgproc import lightBarEndpoints
+
+
+class PointGrid:
+    '''
+    Points hashed into a uniform grid. Finding the nearest point within a
+    radius only visits cells around it, in constant time for radius up to
+    `cell_size`.
+
+    PointGrid(points, cell_size=32)
+
+    Methods:
+    * nearest(pt, radius) -> Tuple[float, float] | None
+    '''
+    def __init__(self, points: np.ndarray, cell_size: int = 32):
+        self.cell_size = cell_size
+        self.points = np.asarray(points, np.float64).reshape(-1, 2)
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+        for x, y in self.points.tolist():
+            cell = (int(x // cell_size), int(y // cell_size))
+            self._cells.setdefault(cell, []).append((x, y))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def nearest(self, pt: Tuple[float, float], radius: float) -> Union[Tuple[float, float], None]:
+        x, y = pt
+        c = self.cell_size
+        best = None
+        best_d2 = radius * radius
+        for cy in range(int((y - radius) // c), int((y + radius) // c) + 1):
+            for cx in range(int((x - radius) // c), int((x + radius) // c) + 1):
+                for px, py in self._cells.get((cx, cy), ()):
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 <= best_d2:
+                        best, best_d2 = (px, py), d2
+        return best
+
+class SnapIndex:
+    '''
+    Light bar endpoints of an image to snap keypoints to. Endpoints are
+    extracted by a background thread, nothing is snapped until ready.
+
+    SnapIndex(image, cell_size=32)
+    * image: image path or BGR image
+
+    Methods:
+    * isReady() -> bool
+    * wait(timeout) -> bool
+    * nearest(pt, radius) -> Tuple[float, float] | None
+    '''
+    def __init__(self, image: Union[str, np.ndarray], cell_size: int = 32):
+        self.cell_size = cell_size
+        self._grid: PointGrid = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._build, args=(image,), daemon=True)
+        self._thread.start()
+
+    def _build(self, image: Union[str, np.ndarray]) -> None:
+        try:
+            img = cv2.imread(image) if isinstance(image, str) else image
+            if img is None:
+                ui.logger.warning(f'Can not read image {image}, keypoints are not snapped.')
+                return
+            self._grid = PointGrid(lightBarEndpoints(img), self.cell_size)
+        finally:
+            self._ready.set()
+
+    def isReady(self) -> bool:
+        return self._grid is not None
+
+    def wait(self, timeout: float = None) -> bool:
+        ''' Wait until extraction finished, returns if ready. '''
+        self._ready.wait(timeout)
+        return self.isReady()
+
+    def nearest(self, pt: Tuple[float, float], radius: float) -> Union[Tuple[float, float], None]:
+        ''' Nearest endpoint within `radius` pixels, None if not ready. '''
+        grid = self._grid
+        if grid is None:
+            return None
+        return grid.nearest(pt, radius)
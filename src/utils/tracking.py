@@ -0,0 +1,152 @@
+import copy
+import threading
+from typing import Callable, List, Union
+
+import cv2
+import numpy as np
+
+from .lbformat import LabelIO
+
+
+class KeypointTracker:
+    '''
+    Keyframe + track labeling of a video. Labels of a keyframe come from
+    the network, keypoints of later frames are propagated by pyramidal
+    Lucas-Kanade optical flow.
+
+    KeypointTracker(keyframe_interval, drift_thresh, win_size, max_level)
+
+    A new keyframe is needed every `keyframe_interval` frames, after
+    seeking backwards, or when tracking is lost. Tracking is lost if any
+    keypoint is not found, or its forward-backward error is larger than
+    `drift_thresh` pixels.
+
+    `reset` may be called from another thread while `process` runs, a
+    keyframe labeled before the reset is dropped.
+
+    Methods:
+    * process(frame_idx, frame, infer) -> List[LabelIO]
+    * needsKeyframe(frame_idx) -> bool
+    * setKeyframe(frame_idx, frame, labels) -> None
+    * track(frame_idx, frame) -> List[LabelIO] | None
+    * reset() -> None
+    * resetStats() -> None
+    '''
+    def __init__(self,
+        keyframe_interval: int = 5,
+        drift_thresh: float = 2.0,
+        win_size: int = 21,
+        max_level: int = 3
+    ):
+        self.keyframe_interval = keyframe_interval
+        self.drift_thresh = drift_thresh
+        self.lk_params = dict(
+            winSize=(win_size, win_size),
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+
+        # Guards tracked state, not held while `infer` runs.
+        self._lock = threading.Lock()
+        # Increased by reset, keyframes inferred before it are dropped.
+        self._generation = 0
+        self.reset()
+        self.resetStats()
+
+    def reset(self) -> None:
+        ''' Drop tracked state, next frame is a keyframe. '''
+        with self._lock:
+            self._generation += 1
+            self._keyframe_idx: int = None
+            self._last_idx: int = None
+            self._last_gray: np.ndarray = None
+            self._labels: List[LabelIO] = []
+
+    def resetStats(self) -> None:
+        self.forwards = 0 # network passes
+        self.tracked = 0  # frames labeled by tracking only
+        self.lost = 0     # tracking failures that needed a keyframe
+
+    def needsKeyframe(self, frame_idx: int) -> bool:
+        with self._lock:
+            return self._needsKeyframe(frame_idx)
+
+    def _needsKeyframe(self, frame_idx: int) -> bool:
+        return self._keyframe_idx is None \
+            or frame_idx <= self._last_idx \
+            or frame_idx - self._keyframe_idx >= self.keyframe_interval
+
+    def setKeyframe(self, frame_idx: int, frame: np.ndarray, labels: List[LabelIO]) -> None:
+        with self._lock:
+            self._setKeyframe(frame_idx, frame, labels)
+
+    def _setKeyframe(self, frame_idx: int, frame: np.ndarray, labels: List[LabelIO]) -> None:
+        self._keyframe_idx = frame_idx
+        self._last_idx = frame_idx
+        self._last_gray = self._gray(frame)
+        self._labels = copy.deepcopy(labels)
+        self.forwards += 1
+
+    def track(self, frame_idx: int, frame: np.ndarray) -> Union[List[LabelIO], None]:
+        '''
+        Propagate labels from the last frame to this one.
+
+        Returns:
+            Tracked labels, or None if tracking is lost.
+        '''
+        with self._lock:
+            return self._track(frame_idx, frame)
+
+    def _track(self, frame_idx: int, frame: np.ndarray) -> Union[List[LabelIO], None]:
+        gray = self._gray(frame)
+        if len(self._labels) > 0:
+            points = np.array([lb.kpts for lb in self._labels], np.float32)
+            num_keypoints = points.shape[1]
+            points = points.reshape(-1, 1, 2)
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self._last_gray, gray, points, None, **self.lk_params)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._last_gray, moved, None, **self.lk_params)
+            drift = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+            if not (status.all() and back_status.all() and (drift <= self.drift_thresh).all()):
+                self.lost += 1
+                return None
+
+            h, w = gray.shape
+            moved = moved.reshape(-1, num_keypoints, 2)
+            moved[..., 0] = np.clip(moved[..., 0], 0, w - 1)
+            moved[..., 1] = np.clip(moved[..., 1], 0, h - 1)
+            self._labels = [
+                type(lb)(lb.cls_id, [tuple(pt) for pt in kpts.tolist()])
+                for lb, kpts in zip(self._labels, moved)
+            ]
+
+        self._last_idx = frame_idx
+        self._last_gray = gray
+        self.tracked += 1
+        return copy.deepcopy(self._labels)
+
+    def process(self,
+        frame_idx: int,
+        frame: np.ndarray,
+        infer: Callable[[np.ndarray], List[LabelIO]]
+    ) -> List[LabelIO]:
+        ''' Labels of a frame, `infer` is only called for keyframes. '''
+        with self._lock:
+            generation = self._generation
+            if not self._needsKeyframe(frame_idx):
+                labels = self._track(frame_idx, frame)
+                if labels is not None:
+                    return labels
+
+        labels = infer(frame)
+        with self._lock:
+            if generation == self._generation:
+                self._setKeyframe(frame_idx, frame, labels)
+            else:
+                self.forwards += 1
+        return labels
+
+    def _gray(self, frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 2:
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
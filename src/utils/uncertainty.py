@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Union
+
+import cv2
+
+from .. import pygame_gui as ui
+from . import imgproc
+from . import lbformat as fmt
+from .inference import Candidates, PoseModel
+from .matching import matchLabels
+from .model_loader import STATE_FAILED, ModelLoader
+from .nms import nms
+
+# Scores of an images folder, in the folder itself.
+INDEX_FILE = '.uncertainty.jsonl'
+
+def uncertaintySignals(
+    candidates: Candidates,
+    labels: Union[List[fmt.LabelIO], None],
+    confidence_thresh: float,
+    nms_thresh: float,
+    class_aware_nms: bool = True,
+    band: float = 0.15,
+    max_dist: float = 0.5
+) -> Dict[str, float]:
+    '''
+    How informative labeling an image is, from its pre-NMS candidates and
+    its labels in pixels (None if not labeled yet).
+
+    Signals:
+    * margin: 1 - distance of the closest plate score to the confidence
+      threshold, divided by `band`, 0 if no plate is that close.
+    * near: number of plates scoring within `band` of the threshold.
+    * disagreement: missed, extra and misclassified plates compared to
+      labels, see `matching.matchLabels`.
+    * score: sum of the above, higher is more informative.
+    '''
+    indices = nms(
+        candidates.boxes, candidates.scores, nms_thresh, max(confidence_thresh - band, 0.0),
+        class_ids=candidates.class_ids if class_aware_nms else None
+    )
+    scores = candidates.scores[indices]
+    gaps = abs(scores - confidence_thresh)
+    near = int((gaps < band).sum())
+    margin = float(max(0.0, 1 - gaps.min() / band)) if len(gaps) > 0 else 0.0
+
+    disagreement = 0
+    if labels is not None:
+        kept = indices[scores >= confidence_thresh]
+        predictions = [
+            fmt.LabelIO(int(cls_id), kpts.tolist())
+            for cls_id, kpts in zip(candidates.class_ids[kept], candidates.keypoints[kept])
+        ]
+        matches = matchLabels(predictions, labels, max_dist)
+        disagreement = len(predictions) + len(labels) - 2 * len(matches) \
+            + sum(predictions[i].cls_id != labels[j].cls_id for i, j in matches)
+
+    return {
+        'margin': margin,
+        'near': near,
+        'disagreement': disagreement,
+        'score': margin + near + disagreement
+    }
+
+def readScores(images_folder: str) -> Dict[str, float]:
+    ''' Image filename -> score of the index of a folder, may be empty. '''
+    return {
+        filename: entry['signals']['score']
+        for filename, entry in _readIndex(os.path.join(images_folder, INDEX_FILE))[0].items()
+    }
+
+def _readIndex(path: str) -> tuple:
+    ''' (entries by filename, number of lines) '''
+    entries = {}
+    num_lines = 0
+    if not os.path.exists(path):
+        return entries, num_lines
+    with open(path, 'r') as f:
+        for line in f:
+            num_lines += 1
+            try:
+                entry = json.loads(line)
+                entries[entry['file']] = entry
+            except (ValueError, KeyError):
+                continue # cut by a killed process
+    return entries, num_lines
+
+class UncertaintyIndex:
+    '''
+    Persistent uncertainty scores of a folder. Entries are appended as
+    JSON lines, later lines replace earlier ones, so scoring can be
+    stopped at any time and resumed. An entry is current while its key
+    (image, label, model and thresholds) is unchanged.
+
+    UncertaintyIndex(path)
+
+    Methods:
+    * isCurrent(filename, key) -> bool
+    * put(filename, key, signals) -> None
+    * flush() -> None
+    * getScores() -> Dict[str, float]
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        self._entries, num_lines = _readIndex(path)
+        self._buffer: List[str] = []
+        if num_lines > 2 * len(self._entries) + 64:
+            self._compact()
+
+    def _compact(self) -> None:
+        ''' Rewrite with one line per image. '''
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def isCurrent(self, filename: str, key: str) -> bool:
+        entry = self._entries.get(filename)
+        return entry is not None and entry['key'] == key
+
+    def put(self, filename: str, key: str, signals: Dict[str, float]) -> None:
+        entry = {'file': filename, 'key': key, 'signals': signals}
+        self._entries[filename] = entry
+        self._buffer.append(json.dumps(entry) + '\n')
+
+    def flush(self) -> None:
+        if len(self._buffer) == 0:
+            return
+        with open(self.path, 'a') as f:
+            f.writelines(self._buffer)
+        self._buffer = []
+
+    def getScores(self) -> Dict[str, float]:
+        return {filename: entry['signals']['score'] for filename, entry in self._entries.items()}
+
+def _entryKey(image_path: str, label_path: str, model_key: str) -> str:
+    stats = []
+    for path in [image_path, label_path]:
+        try:
+            stat = os.stat(path)
+            stats.append(f'{stat.st_mtime_ns} {stat.st_size}')
+        except OSError:
+            stats.append('-')
+    key = f'{stats} {model_key}'
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def scoreFolder(
+    images_folder: str,
+    labels_folder: str,
+    model: PoseModel,
+    stop: threading.Event = None,
+    on_progress: Callable[[int, int], None] = None,
+    flush_interval: int = 32
+) -> int:
+    '''
+    Score images of a folder that are not current in its index. Progress
+    is reported as (done, total) and saved every `flush_interval` images.
+    Candidates are not kept by the model, recent candidates of other
+    users of a shared model stay.
+
+    Returns:
+        Number of images scored.
+    '''
+    index = UncertaintyIndex(os.path.join(images_folder, INDEX_FILE))
+    # Thresholds of a shared model may change during scoring.
+    confidence_thresh, nms_thresh = model.confidence_thresh, model.nms_thresh
+    model_key = f'{model.model_hash} {model.img_size} {model.rect} {model.stride} ' \
+        f'{confidence_thresh} {nms_thresh} {model.class_aware_nms}'
+    filenames = sorted(imgproc.getImageFiles(images_folder))
+    on_progress = on_progress or (lambda done, total: None)
+
+    scored = 0
+    try:
+        for i, filename in enumerate(filenames):
+            if stop is not None and stop.is_set():
+                break
+            image_path = os.path.join(images_folder, filename)
+            label_path = imgproc.getLabelPath(filename, labels_folder)
+            key = _entryKey(image_path, label_path, model_key)
+            if index.isCurrent(filename, key):
+                continue
+
+            img = cv2.imread(image_path)
+            if img is None:
+                ui.logger.warning(f'Can not read image {filename}.')
+                continue
+            labels = None
+            if os.path.exists(label_path):
+                h, w = img.shape[:2]
+                labels = fmt.denormalizeLabels(fmt.loadLabel(label_path), w, h)
+
+            signals = uncertaintySignals(
+                model._forwardBatch([img])[0], labels,
+                confidence_thresh, nms_thresh, model.class_aware_nms
+            )
+            index.put(filename, key, signals)
+            scored += 1
+            if scored % flush_interval == 0:
+                index.flush()
+                on_progress(i + 1, len(filenames))
+    finally:
+        index.flush()
+    if stop is None or not stop.is_set():
+        on_progress(len(filenames), len(filenames))
+    return scored
+
+class UncertaintyScorer:
+    '''
+    Scores a folder in background with the model of a loader, which is
+    loaded first if needed. See `scoreFolder`.
+
+    UncertaintyScorer(images_folder, labels_folder, loader)
+
+    Methods:
+    * start() -> None
+    * stop() -> None
+    * isRunning() -> bool
+    '''
+    def __init__(self, images_folder: str, labels_folder: str, loader: ModelLoader):
+        self.images_folder = images_folder
+        self.labels_folder = labels_folder
+        self.loader = loader
+
+        self.done = 0
+        self.total = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def _onProgress(self, done: int, total: int) -> None:
+        self.done = done
+        self.total = total
+
+    def _run(self) -> None:
+        self.loader.load()
+        while not self.loader.isReady():
+            if self.loader.getState() == STATE_FAILED:
+                ui.logger.warning('Model load failed, images are not scored.')
+                return
+            if self._stop.wait(0.1):
+                return
+        scoreFolder(
+            self.images_folder, self.labels_folder, self.loader.get(),
+            stop=self._stop, on_progress=self._onProgress
+        )
+
+    def start(self) -> None:
+        if self.isRunning():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def isRunning(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,79 @@
+import time
+import unittest
+
+import numpy as np
+
+from src.tasks.armor_video.worker import InferenceWorker
+
+
+class TestInferenceWorker(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+        def infer(key, img):
+            self.started.append(key)
+            time.sleep(0.04)
+            return [key]
+        self.worker = InferenceWorker(infer)
+        self.addCleanup(self.worker.stop)
+
+    def _waitResult(self, timeout: float = 2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            result = self.worker.poll()
+            if result is not None:
+                return result
+            time.sleep(0.005)
+        return None
+
+    def test_stream(self):
+        # Requests at 60 fps, faster than inference.
+        img = np.zeros((4, 4, 3), np.uint8)
+        results = []
+        for frame_idx in range(60):
+            self.worker.request(frame_idx, img)
+            result = self.worker.poll()
+            if result is not None:
+                results.append(result)
+            time.sleep(1 / 60)
+        while results[-1:] == [] or results[-1][0] != 59:
+            result = self._waitResult()
+            self.assertIsNotNone(result)
+            results.append(result)
+
+        keys = [key for key, _, _ in results]
+        self.assertGreater(len(keys), 5)
+        self.assertEqual(keys, sorted(keys))
+        for key, _, labels in results:
+            self.assertEqual(labels, [key])
+        # Pending requests are replaced, the last one is labeled.
+        self.assertEqual(keys[-1], 59)
+        self.assertLess(len(self.started), 60)
+
+    def test_poll_once(self):
+        self.worker.request(0, np.zeros((4, 4, 3), np.uint8))
+        self.assertEqual(self._waitResult()[0], 0)
+        self.assertIsNone(self.worker.poll())
+
+    def test_cancel(self):
+        self.worker.request(0, np.zeros((4, 4, 3), np.uint8))
+        while len(self.started) == 0:
+            time.sleep(0.001)
+        # Running inference is dropped too.
+        self.worker.cancel()
+        self.assertIsNone(self._waitResult(0.2))
+
+    def test_error(self):
+        def infer(key, img):
+            if key == 0:
+                raise RuntimeError('backend failed')
+            return [key]
+        worker = InferenceWorker(infer)
+        self.addCleanup(worker.stop)
+        self.worker = worker
+
+        img = np.zeros((4, 4, 3), np.uint8)
+        worker.request(0, img)
+        self.assertEqual(self._waitResult(), (0, img, []))
+        # The worker is still running.
+        worker.request(1, img)
+        self.assertEqual(self._waitResult(), (1, img, [1]))
@@ -0,0 +1,25 @@
+import os
+import tempfile
+import unittest
+
+from src.tools.autolabel import collectTasks
+
+
+class TestAutolabel(unittest.TestCase):
+    def test_collectTasks(self):
+        with tempfile.TemporaryDirectory() as folder:
+            images = os.path.join(folder, 'images')
+            labels = os.path.join(folder, 'labels')
+            os.makedirs(images)
+            os.makedirs(labels)
+            for name in ['b.jpg', 'a.png', 'c.txt']:
+                open(os.path.join(images, name), 'w').close()
+            open(os.path.join(labels, 'b.txt'), 'w').close()
+
+            tasks = collectTasks(images, labels)
+            self.assertEqual(tasks, [
+                (os.path.join(images, 'a.png'), os.path.join(labels, 'a.txt'))
+            ])
+
+            tasks = collectTasks(images, labels, overwrite=True)
+            self.assertEqual([os.path.basename(t[0]) for t in tasks], ['a.png', 'b.jpg'])
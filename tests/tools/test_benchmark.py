@@ -0,0 +1,33 @@
+import json
+import unittest
+
+import numpy as np
+
+from src.tools.benchmark import STAGES, benchmark
+
+from ..utils.test_inference import _MODEL_PATH, _FixedShapeBackend, _output
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_benchmark(self):
+        rows = [
+            (3, 0.9, [100, 100, 100, 120, 120, 120, 120, 100]),
+            (3, 0.4, [200, 100, 200, 120, 220, 120, 220, 100]),
+        ]
+        backend = _FixedShapeBackend(_output(rows, 16, 4))
+        images = [np.zeros((234, 416, 3), np.uint8) for _ in range(2)]
+        result = benchmark(
+            _MODEL_PATH, images, 416, 1, [[0.2, 0.5], [0.5, 0.5]],
+            repeat=2, rect=True, backend=backend
+        )
+        result = json.loads(json.dumps(result))
+
+        # Rect input is rejected, stages are timed with the square fallback.
+        self.assertFalse(result['rect'])
+        self.assertEqual(backend.blobs[-1], (1, 3, 416, 416))
+        self.assertEqual(set(result['stages']), set(STAGES))
+        for stage in STAGES:
+            self.assertEqual(set(result['stages'][stage]), {'p50', 'p95', 'p99'})
+        self.assertEqual([th['detections'] for th in result['thresholds']], [[2, 2], [1, 1]])
+        for th in result['thresholds']:
+            self.assertEqual(set(th['nms_ms']), {'p50', 'p95', 'p99'})
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src.utils import backend
+from src.utils.backend import Backend, OnnxRuntimeBackend, OpenCVBackend, createBackend
+
+_SHAPE = (2, 3, 8, 8)
+
+def _varint(n: int) -> bytes:
+    out = b''
+    while True:
+        byte, n = n & 0x7f, n >> 7
+        if n == 0:
+            return out + bytes([byte])
+        out += bytes([byte | 0x80])
+
+def _field(num: int, value) -> bytes:
+    ''' Protobuf field, int as varint, str or bytes length delimited. '''
+    if isinstance(value, int):
+        return _varint(num << 3) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(num << 3 | 2) + _varint(len(value)) + value
+
+def _tensorInfo(name: str, shape) -> bytes:
+    dims = b''.join(_field(1, _field(1, dim)) for dim in shape)
+    return _field(1, name) + _field(2, _field(1, _field(1, 1) + _field(2, dims))) # float tensor
+
+def _writeModel(path: str) -> None:
+    ''' Onnx model of a single Sigmoid, written without the onnx package. '''
+    node = _field(1, 'images') + _field(2, 'output') + _field(4, 'Sigmoid')
+    graph = (
+        _field(1, node) + _field(2, 'sigmoid')
+        + _field(11, _tensorInfo('images', _SHAPE)) + _field(12, _tensorInfo('output', _SHAPE))
+    )
+    with open(path, 'wb') as f:
+        f.write(_field(1, 7) + _field(7, graph) + _field(8, _field(2, 11))) # ir 7, opset 11
+
+class TestBackend(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.model_path = os.path.join(folder.name, 'sigmoid.onnx')
+        _writeModel(self.model_path)
+        self.blob = np.random.default_rng(0).normal(size=_SHAPE).astype(np.float32)
+
+    def test_forward(self):
+        with self.assertRaises(NotImplementedError):
+            Backend().forward(self.blob)
+
+        output = createBackend('opencv', self.model_path).forward(self.blob)
+        self.assertTrue(np.allclose(output, 1 / (1 + np.exp(-self.blob)), atol=1e-5))
+
+    def test_fallback(self):
+        with mock.patch.object(backend, 'ort', None):
+            self.assertNotIn(OnnxRuntimeBackend.name, backend.availableBackends())
+            self.assertIsInstance(createBackend('onnxruntime', self.model_path), OpenCVBackend)
+            with self.assertRaises(ImportError):
+                OnnxRuntimeBackend(self.model_path)
+        self.assertIsInstance(createBackend('unknown', self.model_path), OpenCVBackend)
+
+    @unittest.skipIf(backend.ort is None, 'onnxruntime is not installed')
+    def test_parity(self):
+        opencv = createBackend('opencv', self.model_path)
+        onnxruntime = createBackend('onnxruntime', self.model_path)
+        self.assertIsInstance(onnxruntime, OnnxRuntimeBackend)
+        self.assertTrue(np.allclose(opencv.forward(self.blob), onnxruntime.forward(self.blob), atol=1e-5))
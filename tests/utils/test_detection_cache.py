@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from src.utils.detection_cache import DetectionCache
+from src.utils.lbformat import ArmorLabelIO, LabelIO
+
+
+def _labels():
+    return [
+        LabelIO(1, [(0.5, 1.25), (2.0, 3.0), (4.0, 5.0), (6.0, 7.0)]),
+        LabelIO(9, [(10.0, 11.0), (12.0, 13.0), (14.0, 15.0), (16.0, 17.0)])
+    ]
+
+
+class TestDetectionCache(unittest.TestCase):
+    def test_memory(self):
+        cache = DetectionCache(capacity=2)
+        self.assertIsNone(cache.get('a'))
+
+        cache.put('a', _labels())
+        cache.put('b', [])
+        cache.get('a') # 'a' becomes the most recently used
+        cache.put('c', [])
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), [])
+
+        labels = cache.get('a', ArmorLabelIO)
+        self.assertIsInstance(labels[0], ArmorLabelIO)
+        self.assertEqual(labels[1].cls_id, 9)
+        self.assertEqual(labels[0].kpts[0], (0.5, 1.25))
+
+    def test_returns_copies(self):
+        cache = DetectionCache()
+        cache.put('a', _labels())
+        cache.get('a')[0].kpts[0] = (100, 100)
+        self.assertEqual(cache.get('a')[0].kpts[0], (0.5, 1.25))
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'sub', 'video.cache')
+            cache = DetectionCache(path=path)
+            cache.put('a', _labels())
+            cache.put('b', [])
+            cache.close()
+
+            # A half written line is ignored.
+            with open(path, 'a') as f:
+                f.write('c\t1 0.1 0.2')
+
+            cache = DetectionCache(path=path)
+            self.assertEqual(len(cache.get('a')), 2)
+            self.assertEqual(cache.get('a')[1].kpts[3], (16.0, 17.0))
+            self.assertEqual(cache.get('b'), [])
+            self.assertIsNone(cache.get('c'))
+            cache.close()
+
+    def test_truncated_append(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'video.cache')
+            cache = DetectionCache(path=path)
+            cache.put('a', _labels())
+            cache.close()
+            with open(path, 'a') as f:
+                f.write('c\t1 0.1 0.2')
+
+            # Appended after the last complete line, not to the cut one.
+            cache = DetectionCache(path=path)
+            cache.put('d', _labels()[:1])
+            cache.close()
+            with open(path, 'a') as f:
+                f.write('e\tbroken\tline\n')
+
+            cache = DetectionCache(path=path)
+            self.assertEqual(len(cache.get('a')), 2)
+            self.assertEqual(cache.get('d')[0].kpts[0], (0.5, 1.25))
+            self.assertIsNone(cache.get('c'))
+            self.assertIsNone(cache.get('e'))
+            cache.close()
+            with open(path, 'r') as f:
+                self.assertEqual([line.split('\t')[0] for line in f], ['a', 'd', 'e'])
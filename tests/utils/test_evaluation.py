@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.utils.evaluation import (ERROR_INDEX_FILE, OKS_THRESHOLDS, Evaluator,
+                                  evaluateImage, oksMatrix, readErrors)
+
+
+def _plate(x: float, y: float = 20.0) -> list:
+    ''' 20x20 plate, lt, lb, rb, rt '''
+    return [(x, y), (x, y + 20), (x + 20, y + 20), (x + 20, y)]
+
+class TestEvaluation(unittest.TestCase):
+    def test_oksMatrix(self):
+        gt = np.array([_plate(0), _plate(100)])
+        oks = oksMatrix(np.array([_plate(0), _plate(1)]), gt)
+        self.assertEqual(oks.shape, (2, 2))
+        self.assertAlmostEqual(oks[0, 0], 1.0)
+        self.assertTrue(0.5 < oks[1, 0] < 1.0)
+        self.assertAlmostEqual(oks[0, 1], 0.0)
+
+    def test_evaluateImage(self):
+        result = evaluateImage(
+            pred_classes=[3, 3, 3, 5],
+            pred_scores=[0.9, 0.8, 0.1, 0.9],
+            pred_kpts=np.array([_plate(0), _plate(1), _plate(200), _plate(100)]),
+            gt_classes=[3, 3],
+            gt_kpts=np.array([_plate(0), _plate(100)]),
+            confidence_thresh=0.5
+        )
+        # Duplicate of the first plate and plate of another class are false positives.
+        self.assertEqual(np.asarray(result['tp'])[:, 0].tolist(), [True, False, False, False])
+        self.assertEqual(result['fp'], 2)
+        self.assertEqual(result['fn'], 1)
+        self.assertEqual(len(result['matches']), 1)
+        cls_id, error, oks = result['matches'][0]
+        self.assertEqual((cls_id, error), (3, 0.0))
+        self.assertAlmostEqual(result['error'], 3.0)
+
+        empty = evaluateImage([], [], np.zeros((0, 4, 2)), [], np.zeros((0, 4, 2)), 0.5)
+        self.assertEqual((empty['fp'], empty['fn'], empty['error']), (0, 0, 0.0))
+
+    def test_Evaluator(self):
+        evaluator = Evaluator(confidence_thresh=0.5)
+        for x in range(10):
+            evaluator.add(evaluateImage(
+                [3, 3], [0.9, 0.3], np.array([_plate(x), _plate(300)]),
+                [3], np.array([_plate(x)]), 0.5
+            ))
+        # A missed plate of another class.
+        evaluator.add(evaluateImage([], [], np.zeros((0, 4, 2)), [4], np.array([_plate(0)]), 0.5))
+
+        summary = evaluator.summary()
+        self.assertEqual(summary['images'], 11)
+        self.assertAlmostEqual(summary['classes'][3]['ap50'], 1.0)
+        self.assertAlmostEqual(summary['classes'][3]['ap'], 1.0)
+        self.assertAlmostEqual(summary['classes'][4]['ap'], 0.0)
+        self.assertAlmostEqual(summary['map'], 0.5)
+        self.assertAlmostEqual(summary['precision'], 1.0)
+        self.assertAlmostEqual(summary['recall'], 10 / 11)
+        self.assertAlmostEqual(summary['keypoint_error'], 0.0)
+        self.assertEqual(evaluator.tp_hist.shape, (16, len(OKS_THRESHOLDS), 1000))
+
+    def test_readErrors(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertEqual(readErrors(folder), {})
+            with open(os.path.join(folder, ERROR_INDEX_FILE), 'w') as f:
+                f.write(json.dumps({'file': 'a.jpg', 'error': 2.5}) + '\n')
+                f.write('{"file": "b.jp')
+            self.assertEqual(readErrors(folder), {'a.jpg': 2.5})
@@ -0,0 +1,129 @@
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils import imgproc
+from src.utils.lbformat import ArmorLabelIO
+from src.utils.model_loader import STATE_LOADING, STATE_UNLOADED
+from src.utils.model_registry import ModelRegistry
+
+from .test_inference import _FixedOutputBackend, _MODEL_PATH, _output
+
+
+class TestRelabel(unittest.TestCase):
+    def setUp(self):
+        # Plates at x 100 and 200 of a 416 x 416 image.
+        rows = [
+            (3, 0.9, [100, 100, 100, 120, 120, 120, 120, 100]),
+            (11, 0.9, [200, 100, 200, 120, 220, 120, 220, 100]),
+        ]
+        # The registry is process-wide, leave it as other tests found it.
+        self.registry = ModelRegistry()
+        self.registry.register(
+            'relabel_test', _MODEL_PATH,
+            img_size=(416, 416),
+            backend=_FixedOutputBackend(_output(rows, 16, 4))
+        )
+        self.addCleanup(self.registry.unregister, 'relabel_test')
+        self.addCleanup(self.registry.setActive, self.registry.getActive())
+        self.registry.setActive('relabel_test')
+
+    def test_relabel(self):
+        img = np.zeros((416, 416, 3), np.uint8)
+        # A manual label of the first plate, with another class.
+        manual = ArmorLabelIO(5, [(p[0] / 416, p[1] / 416) for p in [(102, 101), (102, 121), (122, 121), (122, 101)]])
+
+        # Not loaded, manual labels are kept. Loading only starts if asked.
+        labels = imgproc.relabel(img, [manual])
+        self.assertEqual([(lb.cls_id, lb.kpts) for lb in labels], [(5, manual.kpts)])
+        loader = self.registry.getActiveLoader()
+        self.assertEqual(loader.getState(), STATE_UNLOADED)
+
+        # Light bars of the classical detector only if asked.
+        img_bars = img.copy()
+        _drawBar(img_bars, (300, 200), (302, 240), (255, 80, 0))
+        _drawBar(img_bars, (360, 200), (362, 240), (255, 80, 0))
+        self.assertEqual(len(imgproc.relabel(img_bars, [manual])), 1)
+        self.assertEqual(len(imgproc.relabel(img_bars, [manual], fallback=True)), 2)
+
+        labels = imgproc.relabel(img, [manual], load_model=True)
+        self.assertEqual(len(labels), 1)
+        while loader.getState() == STATE_LOADING:
+            time.sleep(0.01)
+        self.assertTrue(loader.isReady())
+
+        labels = imgproc.relabel(img, [manual])
+        self.assertEqual([lb.cls_id for lb in labels], [5, 11])
+        self.assertEqual(labels[0].kpts, manual.kpts)
+        np.testing.assert_allclose(labels[1].kpts[0], (200 / 416, 100 / 416))
+
+        refined = imgproc.relabel(img, [manual], refine=True)
+        self.assertEqual(refined[0].cls_id, 5)
+        np.testing.assert_allclose(refined[0].kpts[0], (100 / 416, 100 / 416))
+
+
+def _drawBar(img: np.ndarray, top, bottom, color) -> None:
+    ''' Overexposed light bar with a colored halo. '''
+    cv2.line(img, top, bottom, color, 7)
+    cv2.line(img, top, bottom, (255, 255, 255), 3)
+
+class TestDetectArmors(unittest.TestCase):
+    def test_pairs(self):
+        img = np.zeros((416, 640, 3), np.uint8)
+        _drawBar(img, (100, 100), (102, 140), (255, 80, 0)) # blue plate
+        _drawBar(img, (200, 100), (202, 140), (255, 80, 0))
+        _drawBar(img, (400, 200), (400, 230), (0, 40, 255)) # red plate
+        _drawBar(img, (470, 200), (470, 232), (0, 40, 255))
+        _drawBar(img, (560, 50), (560, 150), (0, 40, 255))  # too long to pair
+
+        labels = sorted(imgproc.detectArmors(img), key=lambda lb: lb.kpts[0][0])
+        self.assertEqual([lb.cls_id for lb in labels], [0, 8])
+        np.testing.assert_allclose(labels[0].kpts, [(100, 100), (102, 140), (202, 140), (200, 100)], atol=2)
+        np.testing.assert_allclose(labels[1].kpts, [(400, 200), (400, 230), (470, 232), (470, 200)], atol=2)
+        self.assertEqual(imgproc.detectArmors(img, armor_type=3)[0].cls_id % 8, 3)
+
+    def test_bar_in_between(self):
+        img = np.zeros((416, 640, 3), np.uint8)
+        for x in [100, 160, 220]:
+            _drawBar(img, (x, 100), (x, 140), (255, 80, 0))
+        # Neighbors pair, the outer two do not.
+        labels = imgproc.detectArmors(img)
+        self.assertEqual(len(labels), 1)
+        self.assertLess(labels[0].kpts[3][0] - labels[0].kpts[0][0], 80)
+
+class TestCorrectLabels(unittest.TestCase):
+    def test_correctLabels(self):
+        img = np.zeros((1080, 1920, 3), np.uint8)
+        _drawBar(img, (100, 100), (102, 140), (255, 80, 0))
+        _drawBar(img, (200, 100), (202, 140), (255, 80, 0))
+        _drawBar(img, (1500, 800), (1500, 830), (0, 40, 255))
+        _drawBar(img, (1570, 800), (1570, 832), (0, 40, 255))
+        h, w = img.shape[:2]
+        pixels = [[(95, 97), (98, 145), (205, 143), (206, 96)], [(1490, 805), (1495, 835), (1575, 826), (1566, 790)]]
+        labels = [ArmorLabelIO(3, [(x / w, y / h) for x, y in kpts]) for kpts in pixels]
+
+        index = imgproc.ContourIndex(img)
+        corrected = imgproc.correctLabels(img, labels, index)
+        # Same as testing every contour of the whole image.
+        cnts = imgproc._getCnts(img)
+        for lb, kpts in zip(corrected, pixels):
+            expected = [imgproc._verifyPoint(pt, cnts) for pt in kpts]
+            np.testing.assert_allclose(np.array(lb.kpts) * [w, h], expected, atol=1e-3)
+        self.assertNotEqual(corrected[0].kpts, labels[0].kpts)
+
+        # Only regions around labels, extracted once.
+        self.assertEqual(len(index._regions), 2)
+        self.assertLess(sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in index._regions), w * h / 10)
+        imgproc.correctLabels(img, corrected, index)
+        self.assertEqual(len(index._regions), 2)
+
+    def test_getNearby(self):
+        img = np.zeros((200, 200, 3), np.uint8)
+        cv2.rectangle(img, (50, 50), (60, 60), (255, 255, 255), -1)
+        index = imgproc.ContourIndex(img, cell_size=16)
+        index.addRegion(0, 0, 200, 200)
+        self.assertEqual(len(index.getNearby((55, 55), 5)), 1)
+        self.assertEqual(len(index.getNearby((75, 55), 20)), 1)
+        self.assertEqual(len(index.getNearby((90, 55), 20)), 0)
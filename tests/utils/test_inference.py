@@ -0,0 +1,291 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils.backend import Backend
+from src.utils.detection_cache import DetectionCache
+from src.utils.inference import PoseModel, getTiles
+from src.utils.lbformat import ArmorLabelIO
+
+
+# Stands for an onnx file, only its hash is used with a given backend.
+_MODEL_PATH = __file__
+
+def _model(num_classes: int, num_keypoints: int) -> PoseModel:
+    return PoseModel(
+        _MODEL_PATH, (416, 416),
+        num_classes=num_classes,
+        num_keypoints=num_keypoints,
+        confidence_thresh=0.5,
+        nms_thresh=0.5,
+        candidate_capacity=0,
+        backend=Backend()
+    )
+
+def _output(rows: list, num_classes: int, num_keypoints: int) -> np.ndarray:
+    ''' rows: [(class_id, score, [x1, y1, ...]), ...] -> (1, C, N) '''
+    out = np.zeros((len(rows), 4 + num_classes + 2 * num_keypoints), np.float32)
+    for i, (cls_id, score, kpts) in enumerate(rows):
+        out[i, 4 + cls_id] = score
+        out[i, 4 + num_classes:] = kpts
+    return out.T[np.newaxis]
+
+class _FixedShapeBackend(Backend):
+    ''' Only accepts square input, like a model exported with fixed shape. '''
+    def __init__(self, output_buffer: np.ndarray):
+        self.output_buffer = output_buffer
+        self.blobs = []
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        self.blobs.append(blob.shape)
+        if blob.shape[2] != blob.shape[3]:
+            raise cv2.error('fixed input shape')
+        return self.output_buffer
+
+class _FixedOutputBackend(Backend):
+    ''' Returns a fixed output buffer and records the input blob. '''
+    def __init__(self, output_buffer: np.ndarray):
+        self.output_buffer = output_buffer
+        self.blob = None
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        self.blob = blob
+        return self.output_buffer
+
+class _PixelBackend(Backend):
+    ''' Finds one plate whose x is the top left pixel value of its input. '''
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        outputs = []
+        for value in blob[:, 0, 0, 0] * 255:
+            x = float(round(value))
+            outputs.append(_output([(3, 0.9, [x, 20, x, 40, x + 20, 40, x + 20, 20])], 16, 4))
+        return np.concatenate(outputs)
+
+
+class TestTiles(unittest.TestCase):
+    def test_getTiles(self):
+        self.assertEqual(getTiles(300, 200, 416, 0.2), [(0, 0, 300, 200)])
+
+        tiles = getTiles(1000, 416, 416, 0.25)
+        self.assertEqual(tiles, [(0, 0, 416, 416), (292, 0, 708, 416), (584, 0, 1000, 416)])
+
+        tiles = getTiles(3840, 2160, 640, 0.2)
+        xs = sorted(set(t[0] for t in tiles))
+        self.assertEqual(xs[0], 0)
+        self.assertEqual(max(t[2] for t in tiles), 3840)
+        self.assertEqual(max(t[3] for t in tiles), 2160)
+        self.assertTrue(all(b - a <= 512 for a, b in zip(xs, xs[1:])))
+
+
+class TestPoseModelDecode(unittest.TestCase):
+    def test_read_from_output_buffer(self):
+        rows = [
+            (3, 0.9, [1, 2, 1, 4, 3, 4, 3, 2]),
+            (5, 0.1, [0, 0, 0, 0, 0, 0, 0, 0]),
+            (15, 0.7, [10, 10, 10, 12, 16, 12, 16, 10]),
+        ]
+        model = _model(16, 4)
+        class_ids, scores, boxes, kpts = model._read_from_output_buffer(_output(rows, 16, 4), 2.0, 0.5)
+
+        self.assertEqual(class_ids.tolist(), [3, 15])
+        np.testing.assert_allclose(scores, [0.9, 0.7], rtol=1e-6)
+        np.testing.assert_allclose(boxes, [[2, 4, 4, 4], [20, 20, 12, 4]])
+        self.assertEqual(kpts.shape, (2, 4, 2))
+        np.testing.assert_allclose(kpts[0], [[2, 4], [2, 8], [6, 8], [6, 4]])
+
+    def test_read_five_keypoints(self):
+        rows = [(2, 0.8, [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])]
+        model = _model(4, 5)
+        class_ids, scores, boxes, kpts = model._read_from_output_buffer(_output(rows, 4, 5), 2.0, 0.5)
+
+        self.assertEqual(class_ids.tolist(), [2])
+        self.assertEqual(kpts.shape, (1, 5, 2))
+        np.testing.assert_allclose(boxes, [[2, 2, 8, 8]])
+
+    def test_read_empty(self):
+        rows = [(0, 0.1, [0] * 8)]
+        model = _model(16, 4)
+        class_ids, scores, boxes, kpts = model._read_from_output_buffer(_output(rows, 16, 4), 2.0, 0.5)
+
+        self.assertEqual(len(class_ids), 0)
+        self.assertEqual(boxes.shape, (0, 4))
+        self.assertEqual(kpts.shape, (0, 4, 2))
+
+    def test_clip_keypoints(self):
+        model = _model(16, 4)
+        kpts = np.array([[[-5, 3], [100, 200], [50, -1], [10, 10]]], np.float32)
+        clipped = model._clip_keypoints(kpts, 64, 48)
+        np.testing.assert_allclose(clipped[0], [[0, 3], [63, 47], [50, 0], [10, 10]])
+
+    def test_inference_batch(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        out = _output(rows, 16, 4)
+        model = _model(16, 4)
+        model.backend = _FixedOutputBackend(np.concatenate([out, out], axis=0))
+
+        images = [
+            np.zeros((832, 416, 3), np.uint8), # scale 2
+            np.zeros((100, 208, 3), np.uint8)  # scale 0.5
+        ]
+        results = model.inferenceBatch(images)
+
+        self.assertEqual(model.backend.blob.shape, (2, 3, 416, 416))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0].kpts[0], (20.0, 40.0))
+        self.assertEqual(results[1][0].kpts[0], (5.0, 10.0))
+        self.assertEqual(model.inferenceBatch([]), [])
+
+    def test_inference_cache(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+        model.cache = DetectionCache()
+
+        img = np.zeros((416, 416, 3), np.uint8)
+        first = model.inference(img)
+        model.backend = None # a cache hit must not touch the network
+        second = model.inference(img.copy())
+
+        self.assertEqual(len(second), 1)
+        self.assertEqual(second[0].kpts, first[0].kpts)
+        self.assertIsInstance(second[0], ArmorLabelIO)
+
+        image_key = model._imageKey(img)
+        key = model._cacheKey(image_key)
+        self.assertEqual(model._cacheKey(image_key), key)
+        model.confidence_thresh = 0.3
+        self.assertNotEqual(model._cacheKey(image_key), key)
+
+        # Letterbox mode changes results too.
+        model.rect = True
+        self.assertNotEqual(model._imageKey(img), image_key)
+        rect_key = model._imageKey(img)
+        model.stride = 64
+        self.assertNotEqual(model._imageKey(img), rect_key)
+
+    def test_per_call_thresholds(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20]), (5, 0.6, [100, 20, 100, 40, 130, 40, 130, 20])]
+        model = _model(16, 4)
+        model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+        cache = DetectionCache()
+        img = np.zeros((416, 416, 3), np.uint8)
+
+        # Thresholds and cache of a consumer do not change the shared model.
+        self.assertEqual(len(model.inference(img, confidence_thresh=0.7, cache=cache)), 1)
+        self.assertEqual(len(model.inference(img)), 2)
+        self.assertEqual(len(model.inferenceTiled(img, confidence_thresh=0.7)), 1)
+        self.assertEqual((model.confidence_thresh, model.cache), (0.5, None))
+
+        model.backend = None # cached per thresholds
+        self.assertEqual(len(model.inference(img, confidence_thresh=0.7, cache=cache)), 1)
+        self.assertIsNotNone(cache.get(model._cacheKey(model._imageKey(img), 0.7)))
+        self.assertIsNone(cache.get(model._cacheKey(model._imageKey(img))))
+
+    def test_apply_thresholds(self):
+        rows = [
+            (3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20]),
+            (3, 0.8, [11, 20, 11, 40, 31, 40, 31, 20]),
+            (1, 0.3, [100, 100, 100, 120, 130, 120, 130, 100]),
+        ]
+        model = _model(16, 4)
+        model.candidate_capacity = 4
+        model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+
+        img = np.zeros((416, 416, 3), np.uint8)
+        self.assertEqual(len(model.inference(img)), 1)
+
+        model.backend = None # candidates are kept, the network is not needed
+        candidates = model.getCandidates(img)
+        self.assertEqual(len(candidates.scores), 3)
+        self.assertEqual(len(model.applyThresholds(candidates, 0.2, 0.5)), 2)
+        self.assertEqual(len(model.applyThresholds(candidates, 0.2, 0.99)), 3)
+
+        model.setThresholds(0.2, 0.99)
+        self.assertEqual(len(model.inference(img)), 3)
+
+    def test_preprocess(self):
+        model = _model(16, 4)
+        img = np.zeros((100, 200, 3), np.uint8)
+        img[..., 0] = 255 # blue
+
+        blob, scales = model._preprocess([img, img], (416, 416))
+        self.assertEqual(blob.shape, (2, 3, 416, 416))
+        self.assertEqual(scales, [(200 / 416, 100 / 208)] * 2)
+        np.testing.assert_allclose(blob[1, :, 0, 0], [0, 0, 1]) # RGB
+        np.testing.assert_allclose(blob[0, :, 300, 0], [114 / 255] * 3, rtol=1e-6)
+
+        blob2, _ = model._preprocess([img, img], (416, 416))
+        self.assertIs(blob2, blob) # buffers are reused
+
+        # Buffers of a few recent shapes are kept, not one per shape.
+        for net_h in range(32, 416, 32):
+            model._preprocess([img], (416, net_h))
+        self.assertLessEqual(len(model._blob_buffers), 4)
+        self.assertLessEqual(len(model._input_buffers), 4)
+        self.assertIn((1, 3, 384, 416), model._blob_buffers)
+
+    def test_rect_letterbox(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.rect = True
+        model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+
+        img = np.zeros((100, 200, 3), np.uint8)
+        self.assertEqual(model._inputSize([img]), (416, 224))
+        results = model.inference(img)
+        self.assertEqual(model.backend.blob.shape, (1, 3, 224, 416))
+        np.testing.assert_allclose(results[0].kpts[0], (10 * 200 / 416, 20 * 100 / 208), rtol=1e-5)
+
+    def test_rect_fallback(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.rect = True
+        model.backend = _FixedShapeBackend(_output(rows, 16, 4))
+
+        results = model.inference(np.zeros((100, 200, 3), np.uint8))
+        self.assertFalse(model.rect)
+        self.assertEqual(model.backend.blobs, [(1, 3, 224, 416), (1, 3, 416, 416)])
+        self.assertEqual(len(results), 1)
+
+    def test_inference_tiled(self):
+        # Every tile finds the same plate at its top left.
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.nms_thresh = 0.5
+        model.backend = _FixedOutputBackend(np.repeat(_output(rows, 16, 4), 4, axis=0))
+
+        img = np.zeros((416, 1000, 3), np.uint8)
+        results = model.inferenceTiled(img, overlap=0.25)
+
+        self.assertEqual(model.backend.blob.shape[0], 4) # 3 tiles and full image
+        xs = sorted(lb.kpts[0][0] for lb in results)
+        # The full image one is scaled by 1000 / 416.
+        np.testing.assert_allclose(xs, [10, 10 * 1000 / 416, 302, 594], rtol=1e-5)
+
+    def test_inference_stream(self):
+        model = _model(16, 4)
+        model.backend = _PixelBackend()
+        frames = [np.full((416, 416, 3), i, np.uint8) for i in range(11)]
+
+        for batch_size in [1, 4]:
+            results = list(model.inferenceStream(iter(frames), batch_size=batch_size, queue_size=2))
+            self.assertEqual([i for i, _ in results], list(range(11)))
+            self.assertEqual([labels[0].kpts[0][0] for _, labels in results], list(range(11)))
+
+        # Stopped early, threads end.
+        stream = model.inferenceStream(iter(frames), queue_size=1)
+        self.assertEqual(next(stream)[0], 0)
+        stream.close()
+
+    def test_inference_stream_error(self):
+        def frames():
+            yield np.zeros((416, 416, 3), np.uint8)
+            raise IOError('broken video')
+
+        model = _model(16, 4)
+        model.backend = _PixelBackend()
+        stream = model.inferenceStream(frames())
+        self.assertEqual(next(stream)[0], 0)
+        with self.assertRaises(IOError):
+            next(stream)
@@ -0,0 +1,121 @@
+import threading
+import unittest
+
+import numpy as np
+
+from src.utils.backend import Backend
+from src.utils.inference import PoseModel
+from src.utils.inference_server import InferenceClient, InferenceServer
+
+from .test_inference import _MODEL_PATH, _PixelBackend
+
+
+class _CountingBackend(_PixelBackend):
+    ''' Records batch sizes of forward passes. '''
+    def __init__(self):
+        self.batch_sizes = []
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        self.batch_sizes.append(blob.shape[0])
+        return super().forward(blob)
+
+def _model(backend: Backend, **kwargs) -> PoseModel:
+    return PoseModel(
+        _MODEL_PATH, (416, 416),
+        confidence_thresh=0.5,
+        nms_thresh=0.5,
+        candidate_capacity=0,
+        backend=backend,
+        **kwargs
+    )
+
+def _image(value: int) -> np.ndarray:
+    return np.full((416, 416, 3), value, np.uint8)
+
+
+class TestInferenceServer(unittest.TestCase):
+    def setUp(self):
+        self.backend = _CountingBackend()
+        self.server = InferenceServer(_model(self.backend), '127.0.0.1:0', window=0.2, max_batch=8)
+        self.thread = threading.Thread(target=self.server.serveForever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+
+    def test_batching(self):
+        models = [_model(None, server=self.server.address) for _ in range(4)]
+        for model in models:
+            self.assertIsNotNone(model.client)
+            self.assertIsNone(model.backend)
+
+        results = [None] * 4
+        def run(i: int) -> None:
+            results[i] = models[i].inference(_image(10 * (i + 1)))
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i, labels in enumerate(results):
+            self.assertEqual(len(labels), 1)
+            self.assertEqual(labels[0].cls_id, 3)
+            self.assertAlmostEqual(labels[0].kpts[0][0], 10 * (i + 1))
+        self.assertLess(len(self.backend.batch_sizes), 4)
+        self.assertEqual(sum(self.backend.batch_sizes), 4)
+
+    def test_client_batch(self):
+        model = _model(None, server=self.server.address)
+        # Replies of a hung server time out, then the model runs locally.
+        self.assertIsNotNone(model.client._sock.gettimeout())
+
+        results = model.inferenceBatch([_image(10 * (i + 1)) for i in range(4)])
+        # One message, one forward pass, no window per image.
+        self.assertEqual(self.backend.batch_sizes, [4])
+        for i, labels in enumerate(results):
+            self.assertAlmostEqual(labels[0].kpts[0][0], 10 * (i + 1))
+
+    def test_labels(self):
+        client = InferenceClient(self.server.address)
+        try:
+            labels, = client.labels([_image(50)])
+            self.assertEqual(labels[0].cls_id, 3)
+            self.assertEqual(labels[0].kpts[0], (50.0, 20.0))
+            self.assertEqual(client.labels([_image(50)], confidence_thresh=0.95), [[]])
+            results = client.labels([_image(50), _image(60)])
+            self.assertEqual([labels[0].kpts[0] for labels in results], [(50.0, 20.0), (60.0, 20.0)])
+            self.assertEqual(client.labels([]), [])
+        finally:
+            client.close()
+
+    def test_other_model(self):
+        model = PoseModel(
+            _MODEL_PATH, (640, 640),
+            backend=_PixelBackend(),
+            server=self.server.address
+        )
+        self.assertIsNone(model.client)
+        self.assertIsNotNone(model.backend)
+
+        # Letterbox must match too.
+        model = _model(_PixelBackend(), rect=True, server=self.server.address)
+        self.assertIsNone(model.client)
+
+    def test_fallback(self):
+        local = _CountingBackend()
+        model = _model(local, server=self.server.address)
+        self.assertIsNotNone(model.client)
+
+        self.server.shutdown()
+        self.thread.join()
+        labels = model.inference(_image(30))
+        self.assertIsNone(model.client)
+        self.assertEqual(local.batch_sizes, [1])
+        self.assertAlmostEqual(labels[0].kpts[0][0], 30)
+
+    def test_no_server(self):
+        model = _model(_PixelBackend(), server='127.0.0.1:1')
+        self.assertIsNone(model.client)
+        self.assertEqual(len(model.inference(_image(30))), 1)
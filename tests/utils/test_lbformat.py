@@ -2,8 +2,9 @@ import os
 import tempfile
 import unittest
 
-from src.utils.lbformat import (ibxy2line, ixy2line, line2ibxy, line2ixy,
-                                loadLabel, saveLabel, xy2box)
+from src.utils.lbformat import (ArmorLabelIO, denormalizeLabels, ibxy2line,
+                                ixy2line, line2ibxy, line2ixy, loadLabel,
+                                normalizeLabels, saveLabel, xy2box)
 
 
 class TestLabelIOFunctions(unittest.TestCase):
@@ -71,3 +72,11 @@ class TestLabelIOFunctions(unittest.TestCase):
         self.assertEqual(content.strip(), '\n'.join(expected_lines))
 
         os.unlink(f.name)
+
+    def test_normalizeLabels(self):
+        labels = [ArmorLabelIO(3, [(50.0, 20.0), (100.0, 40.0)])]
+        normalized = normalizeLabels(labels, 200, 80)
+        self.assertIsInstance(normalized[0], ArmorLabelIO)
+        self.assertEqual(normalized[0].cls_id, 3)
+        self.assertEqual(normalized[0].kpts, [(0.25, 0.25), (0.5, 0.5)])
+        self.assertEqual(denormalizeLabels(normalized, 200, 80)[0].kpts, labels[0].kpts)
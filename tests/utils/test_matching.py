@@ -0,0 +1,42 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from src.utils.lbformat import ArmorLabelIO
+from src.utils.matching import keypointDistances, linearAssignment, matchLabels
+
+
+def _label(cls_id: int, x: float, y: float, size: float = 20) -> ArmorLabelIO:
+    return ArmorLabelIO(cls_id, [(x, y), (x, y + size), (x + size, y + size), (x + size, y)])
+
+class TestMatching(unittest.TestCase):
+    def test_linearAssignment(self):
+        rng = np.random.default_rng(0)
+        for n, m in [(1, 1), (4, 4), (3, 6), (6, 3), (7, 7)]:
+            cost = rng.uniform(0, 10, (n, m))
+            rows, cols = linearAssignment(cost)
+            self.assertEqual(len(rows), min(n, m))
+            self.assertEqual(len(set(cols)), min(n, m))
+
+            if n <= m:
+                best = min(cost[range(n), list(p)].sum() for p in itertools.permutations(range(m), n))
+            else:
+                best = min(cost[list(p), range(m)].sum() for p in itertools.permutations(range(n), m))
+            self.assertAlmostEqual(cost[rows, cols].sum(), best)
+
+        rows, cols = linearAssignment(np.zeros((0, 3)))
+        self.assertEqual(len(rows), 0)
+
+    def test_keypointDistances(self):
+        kpts = np.array([_label(0, 0, 0).kpts, _label(0, 3, 4).kpts])
+        np.testing.assert_allclose(keypointDistances(kpts, kpts[:1]), [[0], [5]])
+
+    def test_matchLabels(self):
+        labels = [_label(3, 100, 100), _label(3, 200, 100)]
+        predictions = [_label(3, 203, 100), _label(3, 500, 100), _label(11, 101, 101)]
+
+        self.assertEqual(matchLabels(predictions, labels), [(0, 1), (2, 0)])
+        self.assertEqual(matchLabels(predictions, labels, same_class=True), [(0, 1)])
+        self.assertEqual(matchLabels(predictions, labels, max_dist=0.1), [(2, 0)])
+        self.assertEqual(matchLabels([], labels), [])
@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from src.utils.model_loader import STATE_UNLOADED
+from src.utils.model_registry import ModelRegistry, setupModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        # The registry is process-wide, leave it as other tests found it.
+        registry = ModelRegistry()
+        state = (registry.capacity, dict(registry._models), dict(registry._defaults),
+                 registry._loaders.copy(), registry.getActive())
+        def restore():
+            with registry._lock:
+                (registry.capacity, registry._models, registry._defaults,
+                 registry._loaders, registry._active) = state
+        self.addCleanup(restore)
+
+    def test_lru(self):
+        registry = ModelRegistry()
+        registry.setCapacity(2)
+        registry.register('a', 'a.onnx')
+        registry.register('b', 'b.onnx')
+
+        loader_a = registry.getLoader('a')
+        self.assertIs(registry.getLoader('a'), loader_a)
+        self.assertEqual(loader_a.getState(), STATE_UNLOADED)
+        # Unregistered models are kept by path.
+        self.assertIs(registry.getLoader('c.onnx'), registry.getLoader(os.path.abspath('c.onnx')))
+
+        registry.setActive('a')
+        registry.getLoader('b')
+        registry.getLoader('c.onnx')
+        self.assertIs(registry.getActiveLoader(), loader_a) # active is never dropped
+
+        registry.register('a', 'a2.onnx')
+        self.assertIsNot(registry.getLoader('a'), loader_a)
+
+        registry.unregister('a')
+        self.assertNotIn('a', registry.getIds())
+        self.assertIsNone(registry.getActive())
+
+    def test_setup(self):
+        config = {
+            'model_cache_size': 3,
+            'inference_backend': 'opencv',
+            'inference_threads': None,
+            'inference_inter_op_threads': None,
+            'inference_server': None,
+            'models': {'armor24': 'armor24.onnx', 'armor25': {'model_path': 'armor25.onnx', 'img_size': [640, 640]}},
+            'active_model': 'armor25'
+        }
+        registry = setupModelRegistry(config)
+        self.assertIn('armor24', registry.getIds())
+        self.assertEqual(registry.getActive(), 'armor25')
+        self.assertEqual(registry.capacity, 3)
+        self.assertEqual(registry._arguments('armor25')['img_size'], (640, 640))
@@ -0,0 +1,46 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils.nms import boxIoU, nms, quadIoU
+
+
+class TestNMS(unittest.TestCase):
+    def test_boxIoU(self):
+        boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float64)
+        np.testing.assert_allclose(boxIoU(boxes[0], boxes), [1, 1 / 3, 0])
+
+    def test_quadIoU(self):
+        square = [(0, 0), (0, 10), (10, 10), (10, 0)]
+        shifted = [(5, 0), (15, 0), (15, 10), (5, 10)] # other point order
+        self.assertAlmostEqual(quadIoU(square, shifted), 1 / 3, places=5)
+        self.assertEqual(quadIoU(square, [(0, 0)] * 4), 0)
+
+    def test_same_as_opencv(self):
+        rng = np.random.default_rng(0)
+        boxes = np.concatenate([rng.uniform(0, 500, (300, 2)), rng.uniform(5, 80, (300, 2))], axis=1)
+        scores = rng.uniform(0, 1, 300).astype(np.float32)
+
+        expected = np.asarray(cv2.dnn.NMSBoxes(boxes, scores, 0.3, 0.4)).reshape(-1)
+        np.testing.assert_array_equal(nms(boxes, scores, 0.4, 0.3), expected)
+
+    def test_class_aware(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 0, 10, 10], [2, 0, 10, 10]], np.float64)
+        scores = np.array([0.9, 0.8, 0.7])
+        class_ids = np.array([0, 1, 0])
+
+        np.testing.assert_array_equal(nms(boxes, scores, 0.5), [0])
+        np.testing.assert_array_equal(nms(boxes, scores, 0.5, class_ids=class_ids), [0, 1])
+        np.testing.assert_array_equal(nms(boxes, scores, 0.5, 0.75, class_ids=class_ids), [0, 1])
+        np.testing.assert_array_equal(nms(boxes, scores, 0.5, top_k=0), [])
+
+    def test_quad(self):
+        # Thin diagonal strips, boxes overlap but quads do not.
+        strip = np.array([(0, 0), (10, 0), (100, 90), (90, 90)], np.float64)
+        keypoints = np.stack([strip, strip + (0, 30)])
+        boxes = np.array([[0, 0, 100, 90], [0, 30, 100, 90]], np.float64)
+        scores = np.array([0.9, 0.8])
+
+        np.testing.assert_array_equal(nms(boxes, scores, 0.3), [0])
+        np.testing.assert_array_equal(nms(boxes, scores, 0.3, keypoints=keypoints), [0, 1])
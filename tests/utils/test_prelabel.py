@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils import lbformat
+from src.utils.prelabel import Prelabeler
+
+
+def _infer(images):
+    ''' One plate at the image center. '''
+    results = []
+    for img in images:
+        h, w = img.shape[:2]
+        kpts = [(w/2 - 10, h/2 - 5), (w/2 - 10, h/2 + 5), (w/2 + 10, h/2 + 5), (w/2 + 10, h/2 - 5)]
+        results.append([lbformat.ArmorLabelIO(3, kpts)])
+    return results
+
+def _writeImage(path: str, value: int = 0) -> None:
+    cv2.imwrite(path, np.full((100, 200, 3), value, np.uint8))
+
+
+class TestPrelabeler(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.images = os.path.join(self._tmp.name, 'images')
+        self.labels = os.path.join(self._tmp.name, 'labels')
+        os.makedirs(self.images)
+        os.makedirs(self.labels)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _run(self, prelabeler: Prelabeler) -> None:
+        prelabeler.poll()
+        prelabeler.process(prelabeler.poll())
+
+    def test_settle(self):
+        _writeImage(os.path.join(self.images, 'a.png'))
+        prelabeler = Prelabeler(self.images, self.labels, _infer)
+        self.assertEqual(prelabeler.poll(), []) # first seen
+        self.assertEqual(prelabeler.poll(), ['a.png'])
+        self.assertEqual(prelabeler.process(['a.png']), 1)
+        self.assertEqual(prelabeler.poll(), [])
+
+        labels = lbformat.loadLabel(os.path.join(self.labels, 'a.txt'))
+        self.assertEqual(labels[0].cls_id, 3)
+        self.assertAlmostEqual(labels[0].kpts[0][0], 0.45)
+
+    def test_human_labels(self):
+        _writeImage(os.path.join(self.images, 'a.png'))
+        _writeImage(os.path.join(self.images, 'b.png'))
+        human = [lbformat.ArmorLabelIO(1, [(0.1, 0.1), (0.1, 0.2), (0.2, 0.2), (0.2, 0.1)])]
+        lbformat.saveLabel(os.path.join(self.labels, 'a.txt'), human)
+
+        prelabeler = Prelabeler(self.images, self.labels, _infer)
+        self._run(prelabeler)
+        self.assertEqual(prelabeler.labeled, 1)
+        self.assertEqual(prelabeler.skipped, 1)
+        self.assertEqual(lbformat.loadLabel(os.path.join(self.labels, 'a.txt'))[0].cls_id, 1)
+
+        # b.txt reviewed by an annotator, then the image changes.
+        lbformat.saveLabel(os.path.join(self.labels, 'b.txt'), human)
+        _writeImage(os.path.join(self.images, 'b.png'), 255)
+        self._run(prelabeler)
+        self.assertEqual(lbformat.loadLabel(os.path.join(self.labels, 'b.txt'))[0].cls_id, 1)
+
+    def test_saved_during_inference(self):
+        path = os.path.join(self.images, 'a.png')
+        _writeImage(path)
+        prelabeler = Prelabeler(self.images, self.labels, _infer)
+        self._run(prelabeler)
+
+        # Nothing found in the changed image, while an annotator saves a.txt.
+        human = [lbformat.ArmorLabelIO(1, [(0.1, 0.1), (0.1, 0.2), (0.2, 0.2), (0.2, 0.1)])]
+        def infer(images):
+            lbformat.saveLabel(os.path.join(self.labels, 'a.txt'), human)
+            return [[] for _ in images]
+        prelabeler.infer_batch = infer
+        _writeImage(path, 255)
+        self._run(prelabeler)
+        self.assertEqual(prelabeler.skipped, 1)
+        self.assertEqual(lbformat.loadLabel(os.path.join(self.labels, 'a.txt'))[0].cls_id, 1)
+
+    def test_changed_image(self):
+        path = os.path.join(self.images, 'a.png')
+        _writeImage(path)
+        prelabeler = Prelabeler(self.images, self.labels, _infer)
+        self._run(prelabeler)
+
+        # Our untouched labels are updated, state survives a restart.
+        cv2.imwrite(path, np.zeros((200, 200, 3), np.uint8))
+        prelabeler = Prelabeler(self.images, self.labels, _infer)
+        self._run(prelabeler)
+        self.assertEqual(prelabeler.labeled, 1)
+        labels = lbformat.loadLabel(os.path.join(self.labels, 'a.txt'))
+        self.assertAlmostEqual(labels[0].kpts[0][0], 0.45)
+        self.assertAlmostEqual(labels[0].kpts[0][1], 0.475)
+
+    def test_output_folder(self):
+        output = os.path.join(self._tmp.name, 'prelabels')
+        _writeImage(os.path.join(self.images, 'a.png'))
+        _writeImage(os.path.join(self.images, 'b.png'))
+        open(os.path.join(self.labels, 'a.txt'), 'w').close()
+
+        prelabeler = Prelabeler(self.images, self.labels, _infer, output_folder=output)
+        self._run(prelabeler)
+        self.assertEqual(sorted(os.listdir(self.labels)), ['a.txt'])
+        self.assertFalse(os.path.exists(os.path.join(output, 'a.txt')))
+        self.assertTrue(os.path.exists(os.path.join(output, 'b.txt')))
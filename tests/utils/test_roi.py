@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from src.utils.lbformat import ArmorLabelIO
+from src.utils.roi import ROIInference, getROIs, packRegions
+
+from .test_inference import _FixedOutputBackend, _model, _output
+
+
+def _label(x: float, y: float, size: float = 20) -> ArmorLabelIO:
+    return ArmorLabelIO(3, [(x, y), (x, y + size), (x + size, y + size), (x + size, y)])
+
+class TestROI(unittest.TestCase):
+    def test_getROIs(self):
+        rois = getROIs([_label(100, 100)], 1000, 500, scale=2.0, min_size=16)
+        self.assertEqual(rois, [(90, 90, 130, 130)])
+
+        # Moved inside image, at least min_size.
+        self.assertEqual(getROIs([_label(0, 490, 5)], 1000, 500, min_size=64), [(0, 436, 64, 500)])
+
+        # Overlapping regions are merged.
+        rois = getROIs([_label(100, 100), _label(120, 100), _label(500, 300)], 1000, 500, min_size=16)
+        self.assertEqual(rois, [(90, 90, 150, 130), (490, 290, 530, 330)])
+
+    def test_inference_regions(self):
+        # Found at (10, 20) of every region input, regions are not upscaled.
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.backend = _FixedOutputBackend(np.repeat(_output(rows, 16, 4), 2, axis=0))
+
+        img = np.zeros((1080, 1920, 3), np.uint8)
+        results = model.inferenceRegions(img, [(100, 200, 228, 328), (1000, 500, 1128, 628)])
+        self.assertEqual(model.backend.blob.shape, (2, 3, 416, 416))
+        self.assertEqual(sorted(lb.kpts[0] for lb in results), [(110, 220), (1010, 520)])
+
+        # Dynamic shape model gets an input as large as the regions.
+        model = _model(16, 4)
+        model.rect = True
+        model.backend = _FixedOutputBackend(np.repeat(_output(rows, 16, 4), 2, axis=0))
+        model.inferenceRegions(img, [(100, 200, 228, 328), (1000, 500, 1100, 600)])
+        self.assertEqual(model.backend.blob.shape, (2, 3, 128, 128))
+
+    def test_packRegions(self):
+        slots = packRegions([(100, 100), (128, 128), (500, 100), (300, 300)], 416, 416, gap=16)
+        # Tallest first, a full canvas starts another one, too large ones are not packed.
+        self.assertEqual(slots, [(1, 144, 0), (1, 0, 0), None, (0, 0, 0)])
+        # A full shelf starts another shelf.
+        self.assertEqual(packRegions([(200, 50), (200, 40), (200, 30)], 416, 416), [(0, 0, 0), (0, 216, 0), (0, 0, 66)])
+
+    def test_packed_regions(self):
+        # Plates inside both slots and one in the gap between them.
+        rows = [
+            (3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20]),
+            (3, 0.9, [154, 30, 154, 50, 174, 50, 174, 30]),
+            (3, 0.9, [130, 50, 130, 60, 140, 60, 140, 50]),
+        ]
+        img = np.zeros((1080, 1920, 3), np.uint8)
+        regions = [(100, 200, 228, 328), (1000, 500, 1100, 600)]
+        for rect, shape in [(False, (1, 3, 416, 416)), (True, (1, 3, 128, 256))]:
+            model = _model(16, 4)
+            model.rect = rect
+            model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+            labels = ROIInference(model).inferenceRegions(img, regions)
+            # All regions in one input, only as large as them in rect mode.
+            self.assertEqual(model.backend.blob.shape, shape)
+            self.assertEqual(sorted(lb.kpts[0] for lb in labels), [(110, 220), (1010, 530)])
+
+    def test_roi_inference(self):
+        rows = [(3, 0.9, [10, 20, 10, 40, 30, 40, 30, 20])]
+        model = _model(16, 4)
+        model.backend = _FixedOutputBackend(_output(rows, 16, 4))
+        roi = ROIInference(model, full_interval=3, min_size=64)
+
+        img = np.zeros((416, 416, 3), np.uint8)
+        roi.process(0, img)
+        labels = roi.process(1, img)
+        # Region (0, 0, 64, 64) around the plate, not resized.
+        self.assertEqual(model.backend.blob.shape, (1, 3, 416, 416))
+        self.assertEqual(labels[0].kpts[0], (10, 20))
+        roi.process(2, img)
+        roi.process(3, img)
+        self.assertEqual((roi.full_passes, roi.roi_passes, roi.fallbacks), (2, 2, 0))
+
+        model.backend = _FixedOutputBackend(_output([], 16, 4))
+        self.assertEqual(roi.process(4, img), [])
+        self.assertEqual((roi.full_passes, roi.fallbacks), (3, 1))
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from src.utils import imgproc
+from src.utils.snapping import PointGrid, SnapIndex
+
+from .test_imgproc import _drawBar
+
+
+class _RecordingDict(dict):
+    ''' Records keys looked up by `get`. '''
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.visited = []
+
+    def get(self, key, default=None):
+        self.visited.append(key)
+        return super().get(key, default)
+
+class TestSnapping(unittest.TestCase):
+    def test_PointGrid(self):
+        rng = np.random.default_rng(0)
+        points = rng.uniform(0, 4000, (2000, 2))
+        grid = PointGrid(points, cell_size=32)
+        self.assertEqual(len(grid), 2000)
+
+        for pt in rng.uniform(0, 4000, (200, 2)).tolist():
+            for radius in [10, 50]:
+                d = np.linalg.norm(points - pt, axis=1)
+                expected = tuple(points[np.argmin(d)]) if d.min() <= radius else None
+                self.assertEqual(grid.nearest(pt, radius), expected)
+
+        # Only cells within the radius are looked up, whatever the number of points.
+        grid._cells = _RecordingDict(grid._cells)
+        grid.nearest((2000, 2000), 12)
+        self.assertEqual(grid._cells.visited, [(62, 62)])
+        grid._cells.visited.clear()
+        grid.nearest((1984, 1984), 12) # on a cell corner
+        self.assertEqual(sorted(grid._cells.visited), [(61, 61), (61, 62), (62, 61), (62, 62)])
+
+    def test_SnapIndex(self):
+        img = np.zeros((416, 640, 3), np.uint8)
+        _drawBar(img, (100, 100), (102, 140), (255, 80, 0))
+        ends = imgproc.lightBarEndpoints(img)
+        self.assertEqual(ends.shape, (2, 2))
+
+        index = SnapIndex(img)
+        self.assertTrue(index.wait(5))
+        top = index.nearest((98, 96), 10)
+        self.assertIsNotNone(top)
+        self.assertLess(np.hypot(top[0] - 100, top[1] - 100), 3)
+        self.assertIsNone(index.nearest((300, 300), 10))
+
+        missing = SnapIndex('not_exists.png')
+        self.assertFalse(missing.wait(5))
+        self.assertIsNone(missing.nearest((98, 96), 10))
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils.lbformat import ArmorLabelIO
+from src.utils.tracking import KeypointTracker
+
+
+def _frame(dx: int, dy: int) -> np.ndarray:
+    ''' Smooth random texture shifted by (dx, dy). '''
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur(rng.integers(0, 255, (300, 400), np.uint8), (7, 7), 2)
+    shift = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.cvtColor(cv2.warpAffine(texture, shift, (400, 300), borderMode=cv2.BORDER_REFLECT), cv2.COLOR_GRAY2BGR)
+
+class TestKeypointTracker(unittest.TestCase):
+    def test_track(self):
+        labels = [ArmorLabelIO(3, [(100, 100), (100, 140), (160, 140), (160, 100)])]
+        calls = []
+        def infer(img):
+            calls.append(img)
+            return labels
+
+        tracker = KeypointTracker(keyframe_interval=3)
+        self.assertEqual(tracker.process(0, _frame(0, 0), infer)[0].kpts, labels[0].kpts)
+        tracked = tracker.process(1, _frame(3, 2), infer)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(tracked[0].cls_id, 3)
+        np.testing.assert_allclose(tracked[0].kpts, np.array(labels[0].kpts) + (3, 2), atol=0.5)
+
+        tracker.process(2, _frame(6, 4), infer)
+        tracker.process(3, _frame(9, 6), infer) # keyframe interval
+        self.assertEqual(len(calls), 2)
+        tracker.process(1, _frame(3, 2), infer) # seek backwards
+        self.assertEqual(len(calls), 3)
+        self.assertEqual((tracker.forwards, tracker.tracked, tracker.lost), (3, 2, 0))
+
+    def test_lost(self):
+        labels = [ArmorLabelIO(3, [(100, 100), (100, 140), (160, 140), (160, 100)])]
+        tracker = KeypointTracker()
+        tracker.setKeyframe(0, _frame(0, 0), labels)
+
+        noise = np.random.default_rng(1).integers(0, 255, (300, 400, 3), np.uint8)
+        self.assertIsNone(tracker.track(1, noise))
+        self.assertEqual(tracker.lost, 1)
+
+    def test_reset_during_inference(self):
+        labels = [ArmorLabelIO(3, [(100, 100), (100, 140), (160, 140), (160, 100)])]
+        tracker = KeypointTracker(keyframe_interval=3)
+        def infer(img):
+            tracker.reset() # e.g. a seek on the UI thread
+            return labels
+
+        tracker.process(0, _frame(0, 0), infer)
+        # The keyframe of before the reset is dropped.
+        self.assertTrue(tracker.needsKeyframe(1))
+        self.assertEqual(tracker.forwards, 1)
+
+        stop = threading.Event()
+        def resetLoop():
+            while not stop.is_set():
+                tracker.reset()
+        thread = threading.Thread(target=resetLoop)
+        thread.start()
+        try:
+            frames = [_frame(i, 0) for i in range(3)]
+            for i in range(100):
+                tracker.process(i, frames[i % 3], lambda img: labels)
+        finally:
+            stop.set()
+            thread.join()
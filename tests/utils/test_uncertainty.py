@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+from src.utils import lbformat
+from src.utils.inference import Candidates, PoseModel
+from src.utils.uncertainty import (INDEX_FILE, UncertaintyIndex, readScores,
+                                   scoreFolder, uncertaintySignals)
+
+from .test_inference import _MODEL_PATH, _PixelBackend
+
+
+def _candidates(rows: list) -> Candidates:
+    ''' rows: [(class_id, score, x), ...], 20 x 20 plates at y 20. '''
+    kpts = np.array([[(x, 20), (x, 40), (x + 20, 40), (x + 20, 20)] for _, _, x in rows], np.float32)
+    return Candidates(
+        np.array([r[0] for r in rows], np.int64),
+        np.array([r[1] for r in rows], np.float32),
+        np.array([[x + 10, 30, 20, 20] for _, _, x in rows], np.float64),
+        kpts.reshape(-1, 4, 2), 416, 416
+    )
+
+def _label(cls_id: int, x: float) -> lbformat.ArmorLabelIO:
+    return lbformat.ArmorLabelIO(cls_id, [(x, 20), (x, 40), (x + 20, 40), (x + 20, 20)])
+
+
+class TestUncertaintySignals(unittest.TestCase):
+    def test_signals(self):
+        candidates = _candidates([(3, 0.9, 0), (3, 0.25, 100), (3, 0.1, 200), (3, 0.01, 300)])
+        signals = uncertaintySignals(candidates, None, 0.2, 0.5)
+        self.assertEqual(signals['near'], 2)
+        self.assertAlmostEqual(signals['margin'], 1 - 0.05 / 0.15, places=5)
+        self.assertEqual(signals['disagreement'], 0)
+
+        # Plate at 100 is labeled but scores low, plate at 0 has another class.
+        signals = uncertaintySignals(candidates, [_label(4, 0), _label(3, 100)], 0.3, 0.5)
+        self.assertEqual(signals['disagreement'], 2)
+        self.assertAlmostEqual(signals['score'], signals['margin'] + signals['near'] + 2)
+
+    def test_confident(self):
+        candidates = _candidates([(3, 0.95, 0)])
+        signals = uncertaintySignals(candidates, [_label(3, 1)], 0.2, 0.5)
+        self.assertEqual(signals['score'], 0)
+        self.assertEqual(uncertaintySignals(_candidates([]), [], 0.2, 0.5)['score'], 0)
+
+
+class TestUncertaintyIndex(unittest.TestCase):
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, INDEX_FILE)
+            index = UncertaintyIndex(path)
+            index.put('a.jpg', 'k1', {'score': 1.0})
+            index.put('b.jpg', 'k1', {'score': 2.0})
+            index.put('a.jpg', 'k2', {'score': 3.0})
+            index.flush()
+            with open(path, 'a') as f:
+                f.write('{"file": "c.jpg", "ke') # cut by a killed process
+
+            index = UncertaintyIndex(path)
+            self.assertTrue(index.isCurrent('a.jpg', 'k2'))
+            self.assertFalse(index.isCurrent('a.jpg', 'k1'))
+            self.assertEqual(index.getScores(), {'a.jpg': 3.0, 'b.jpg': 2.0})
+
+
+class TestScoreFolder(unittest.TestCase):
+    def test_incremental(self):
+        model = PoseModel(_MODEL_PATH, (416, 416), confidence_thresh=0.5, backend=_PixelBackend())
+        with tempfile.TemporaryDirectory() as folder:
+            images = os.path.join(folder, 'images')
+            labels = os.path.join(folder, 'labels')
+            os.makedirs(images)
+            os.makedirs(labels)
+            for i, value in enumerate([10, 100, 200]):
+                cv2.imwrite(os.path.join(images, f'{i}.png'), np.full((416, 416, 3), value, np.uint8))
+            # Pixel backend finds a class 3 plate at x = 100 on 1.png.
+            lbformat.saveLabel(os.path.join(labels, '1.txt'), lbformat.normalizeLabels([_label(3, 100)], 416, 416))
+            lbformat.saveLabel(os.path.join(labels, '2.txt'), lbformat.normalizeLabels([_label(5, 200)], 416, 416))
+
+            self.assertEqual(scoreFolder(images, labels, model), 3)
+            scores = readScores(images)
+            self.assertEqual(scores['1.png'], 0)
+            self.assertEqual(scores['2.png'], 1) # misclassified
+
+            self.assertEqual(scoreFolder(images, labels, model), 0)
+            time.sleep(0.01)
+            lbformat.saveLabel(os.path.join(labels, '1.txt'), [])
+            self.assertEqual(scoreFolder(images, labels, model), 1)
+            self.assertEqual(readScores(images)['1.png'], 0)
+
+            # Recent candidates of a shared model are left alone.
+            self.assertEqual(len(model._candidates), 0)
+            # Another letterbox gives other scores.
+            model.rect = True
+            self.assertEqual(scoreFolder(images, labels, model), 3)